@@ -0,0 +1,6 @@
+"""Entry point for ``python -m src``."""
+
+from .main import main
+
+if __name__ == "__main__":
+    main()
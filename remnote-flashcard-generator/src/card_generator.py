@@ -6,11 +6,14 @@ using LLM-powered intelligence. It generates multiple card types per concept fol
 learning science principles.
 """
 
-from typing import List, Dict, Set, Optional
+from typing import List, Dict, Set, Optional, Callable
 from dataclasses import dataclass, field
 from enum import Enum
+import asyncio
 import logging
 import hashlib
+import json
+import re
 
 try:
     from .yaml_parser import Topic
@@ -22,10 +25,21 @@ except ImportError:
     from llm_client import LLMClient, LLMError
     from prompt_loader import PromptLoader
 
+try:
+    # Optional faster JSON parser for multi-output responses
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# A cloze deletion such as {{hidden term}}
+_CLOZE_RE = re.compile(r'\{\{[^}]+\}\}')
+# Multi-line delimiters that should not appear in single-line content
+_DANGEROUS_RE = re.compile(r':::|>>>|;;;')
+
 
 class CardType(Enum):
     """Enumeration of RemNote flashcard types with full RemNote support."""
@@ -48,7 +62,12 @@ class CardDirection(Enum):
     DISABLED = "disabled"       # No flashcard generation (>- syntax)
 
 
-@dataclass
+# Encoded enum values used when hashing cards, computed once per process
+_TYPE_BYTES = {card_type: card_type.value.encode('utf-8') for card_type in CardType}
+_DIR_BYTES = {direction: direction.value.encode('utf-8') for direction in CardDirection}
+
+
+@dataclass(slots=True)
 class Flashcard:
     """
     Represents a single flashcard with full RemNote formatting support.
@@ -66,6 +85,7 @@ class Flashcard:
         correct_choice_index: Index of correct choice for multiple choice
         extra_detail: Extra Card Detail power-up content
         is_multiline: Whether this card uses multi-line formatting
+        use_triple_delimiter: Render multi-line concepts with ::: instead of ::
     """
     card_type: CardType
     front: str
@@ -79,15 +99,119 @@ class Flashcard:
     correct_choice_index: int = 0
     extra_detail: Optional[str] = None
     is_multiline: bool = False
+    use_triple_delimiter: bool = False
     
     def __post_init__(self):
         """Generate source hash for duplicate detection."""
         if not self.source_hash:
             # Include more fields in hash for better duplicate detection
-            content = f"{self.front}||{self.back}||{self.card_type.value}||{self.direction.value}"
+            parts = [
+                self.front.encode('utf-8'),
+                self.back.encode('utf-8'),
+                _TYPE_BYTES[self.card_type],
+                _DIR_BYTES[self.direction]
+            ]
             if self.list_items:
-                content += f"||{','.join(self.list_items)}"
-            self.source_hash = hashlib.md5(content.encode()).hexdigest()[:8]
+                parts.append(','.join(self.list_items).encode('utf-8'))
+            self.source_hash = hashlib.blake2b(b'||'.join(parts), digest_size=4).hexdigest()
+    
+    def to_record(self) -> Dict:
+        """Convert the card to a JSON-serializable dict; see :meth:`from_record`."""
+        record = {name: getattr(self, name) for name in self.__slots__}
+        record['card_type'] = self.card_type.value
+        record['direction'] = self.direction.value
+        return record
+    
+    @classmethod
+    def from_record(cls, record: Dict) -> 'Flashcard':
+        """Rebuild a card from a dict produced by :meth:`to_record`."""
+        return cls(**{
+            **record,
+            'card_type': CardType(record['card_type']),
+            'direction': CardDirection(record['direction'])
+        })
+
+
+@dataclass(slots=True)
+class PromptRequest:
+    """
+    A fully formatted LLM request for one card type.
+    
+    Attributes:
+        card_type: Prompt name the request was built from
+        prompt: Complete prompt text
+        prefix: Static leading part of the prompt, shared across topics
+        temperature: Sampling temperature from the prompt configuration
+        response_format: Optional structured output hint for the provider
+    """
+    card_type: str
+    prompt: str
+    prefix: str
+    temperature: float
+    response_format: Optional[Dict] = None
+
+
+class HashFilter:
+    """
+    Membership filter for card source hashes.
+    
+    Small runs use an exact ``set``. Once ``exact_limit`` hashes have been
+    added, the filter switches to a 2^24-bit bitmap (2 MB) indexed by the low
+    24 bits of the 32-bit hash, so memory stays flat on very large runs at the
+    cost of rare false positives.
+    """
+    
+    BITMAP_BITS = 1 << 24
+    
+    def __init__(self, exact_limit: int = 10_000):
+        """
+        Initialize an empty filter.
+        
+        Args:
+            exact_limit: Number of hashes kept exactly before switching to the bitmap
+        """
+        self.exact_limit = exact_limit
+        self._exact: Optional[Set[str]] = set()
+        self._bits: Optional[bytearray] = None
+        self._count = 0
+    
+    def __contains__(self, source_hash: str) -> bool:
+        if self._exact is not None:
+            return source_hash in self._exact
+        index = int(source_hash, 16) & (self.BITMAP_BITS - 1)
+        return bool(self._bits[index >> 3] & (1 << (index & 7)))
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def add(self, source_hash: str) -> None:
+        """Record a hash as seen."""
+        if self._exact is not None:
+            if source_hash in self._exact:
+                return
+            self._exact.add(source_hash)
+            self._count += 1
+            if self._count > self.exact_limit:
+                self._switch_to_bitmap()
+            return
+        index = int(source_hash, 16) & (self.BITMAP_BITS - 1)
+        self._bits[index >> 3] |= 1 << (index & 7)
+        self._count += 1
+    
+    def clear(self) -> None:
+        """Forget all recorded hashes."""
+        self._exact = set()
+        self._bits = None
+        self._count = 0
+    
+    def _switch_to_bitmap(self) -> None:
+        """Move the exact hashes into the bitmap."""
+        self._bits = bytearray(self.BITMAP_BITS // 8)
+        mask = self.BITMAP_BITS - 1
+        for source_hash in self._exact:
+            index = int(source_hash, 16) & mask
+            self._bits[index >> 3] |= 1 << (index & 7)
+        self._exact = None
 
 
 class CardGenerator:
@@ -122,12 +246,22 @@ class CardGenerator:
         
         Args:
             llm_client: Configured LLM client for generation
-            config: Generation configuration dictionary
+            config: Generation configuration dictionary. Besides ``card_types``,
+                ``max_concurrency`` bounds in-flight LLM requests (request
+                rates are limited by the client's ``rpm``/``tpm``),
+                ``multi_output`` requests all LLM card types in one JSON call,
+                ``stream`` parses line-based card types as they stream in and
+                ``pack_size`` sets how many topics :meth:`generate_cards_packed`
+                sends per request.
         """
         self.llm = llm_client
         self.config = config or {}
         self.prompt_loader = PromptLoader()
-        self.generated_cards: Set[str] = set()  # For duplicate detection
+        self.prompt_loader.warm_up()
+        self.max_concurrency = self.config.get('max_concurrency') or 16
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.generated_cards = HashFilter()  # For duplicate detection
         self.generation_stats = {
             "total_cards": 0,
             "by_type": {card_type.value: 0 for card_type in CardType},
@@ -140,6 +274,9 @@ class CardGenerator:
         """
         Generate multiple flashcards for a topic.
         
+        Synchronous wrapper around :meth:`agenerate_cards` for callers that
+        are not running an event loop.
+        
         Args:
             topic: Topic object containing content to convert
             parent_context: Context from parent topic for better generation
@@ -150,303 +287,893 @@ class CardGenerator:
         Raises:
             LLMError: If card generation fails
         """
-        logger.info(f"Generating cards for topic: {topic.name}")
-        cards = []
+        return asyncio.run(self.agenerate_cards(topic, parent_context))
+    
+    async def agenerate_cards(self, topic: Topic, parent_context: Optional[str] = None) -> List[Flashcard]:
+        """
+        Generate multiple flashcards for a topic and all of its subtopics concurrently.
         
-        try:
-            # Generate concept card (main definition)
-            concept_card = self._generate_concept_card(topic, parent_context)
-            if concept_card and self._is_unique_card(concept_card):
-                cards.append(concept_card)
-                self._register_card(concept_card)
-            
-            # Generate basic cards for key points
-            basic_cards = self._generate_basic_cards(topic, parent_context)
-            for card in basic_cards:
-                if self._is_unique_card(card):
-                    cards.append(card)
-                    self._register_card(card)
-            
-            # Generate cloze cards for lists and details
-            if topic.key_concepts or topic.examples:
-                cloze_cards = self._generate_cloze_cards(topic, parent_context)
-                for card in cloze_cards:
-                    if self._is_unique_card(card):
-                        cards.append(card)
-                        self._register_card(card)
+        The topic tree is flattened into a worklist and every topic is
+        dispatched at once with ``asyncio.gather``, so wall-clock time is
+        bounded by ``max_concurrency`` rather than by the depth of the tree.
+        
+        Args:
+            topic: Topic object containing content to convert
+            parent_context: Context from parent topic for better generation
             
-            # Generate descriptor cards for attributes
-            if self.config.get('card_types', {}).get('descriptor', True):
-                descriptor_cards = self._generate_descriptor_cards(topic, parent_context)
-                for card in descriptor_cards:
-                    if self._is_unique_card(card):
-                        cards.append(card)
-                        self._register_card(card)
+        Returns:
+            List of generated flashcards, parents before their subtopics
             
-            # Generate multi-line cards for complex content
-            if self.config.get('card_types', {}).get('multiline', True):
-                multiline_cards = self._generate_multiline_cards(topic, parent_context)
-                for card in multiline_cards:
-                    if self._is_unique_card(card):
-                        cards.append(card)
-                        self._register_card(card)
+        Raises:
+            LLMError: If card generation fails
+        """
+        try:
+            collected = await self._acollect_tree(topic, parent_context)
+        except Exception as e:
+            logger.error("Failed to generate cards for %s: %s", topic.name, e)
+            raise LLMError(f"Card generation failed: {e}")
+        
+        cards = []
+        self._ingest_tree(collected, cards)
+        return cards
+    
+    def generate_cards_many(self, topics: List[Topic],
+                            on_topic_done: Optional[Callable[[Topic, Optional[Exception]], None]] = None,
+                            on_node_done: Optional[Callable[[Topic], None]] = None,
+                            on_topic_cards: Optional[Callable[[Topic, List[Flashcard]], None]] = None
+                            ) -> List[Flashcard]:
+        """
+        Generate flashcards for several root topics in a single event loop run.
+        
+        Synchronous wrapper around :meth:`agenerate_cards_many`.
+        
+        Args:
+            topics: Root topics; each is processed with its whole subtopic tree
+            on_topic_done: Optional callback invoked with each root topic and
+                the exception it failed with (None on success) as it finishes
+            on_node_done: Optional callback invoked with every topic or subtopic
+                as soon as its own cards are generated
+            on_topic_cards: Optional callback that receives each root topic's
+                unique cards in topic order instead of collecting them
             
-            # Generate list answer cards
-            if self.config.get('card_types', {}).get('list_answer', True):
-                list_cards = self._generate_list_answer_cards(topic, parent_context)
-                for card in list_cards:
-                    if self._is_unique_card(card):
-                        cards.append(card)
-                        self._register_card(card)
+        Returns:
+            List of generated flashcards in topic order (empty when
+            ``on_topic_cards`` is given)
+        """
+        return asyncio.run(self.agenerate_cards_many(topics, on_topic_done, on_node_done, on_topic_cards))
+    
+    async def agenerate_cards_many(self, topics: List[Topic],
+                                   on_topic_done: Optional[Callable[[Topic, Optional[Exception]], None]] = None,
+                                   on_node_done: Optional[Callable[[Topic], None]] = None,
+                                   on_topic_cards: Optional[Callable[[Topic, List[Flashcard]], None]] = None
+                                   ) -> List[Flashcard]:
+        """
+        Generate flashcards for several root topics concurrently.
+        
+        All topic trees are dispatched at once instead of one after another.
+        A failing root topic is logged, reported through ``on_topic_done``
+        and skipped, so the others still produce cards.
+        
+        Each root topic's cards are deduplicated and released as soon as it
+        and every topic before it have finished, so ``on_topic_cards`` can
+        write output while later topics are still generating, in the same
+        order as the collected result.
+        
+        Args:
+            topics: Root topics; each is processed with its whole subtopic tree
+            on_topic_done: Optional callback invoked with each root topic and
+                the exception it failed with (None on success) as it finishes
+            on_node_done: Optional callback invoked with every topic or subtopic
+                as soon as its own cards are generated
+            on_topic_cards: Optional callback that receives each root topic's
+                unique cards in topic order instead of collecting them
             
-            # Generate multiple choice cards
-            if self.config.get('card_types', {}).get('multiple_choice', True):
-                mc_cards = self._generate_multiple_choice_cards(topic, parent_context)
-                for card in mc_cards:
-                    if self._is_unique_card(card):
-                        cards.append(card)
-                        self._register_card(card)
+        Returns:
+            List of generated flashcards in topic order (empty when
+            ``on_topic_cards`` is given)
+        """
+        async def _collect(topic: Topic) -> list:
+            error = None
+            try:
+                return await self._acollect_tree(topic, on_node_done=on_node_done)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                if on_topic_done is not None:
+                    on_topic_done(topic, error)
+        
+        tasks = [asyncio.ensure_future(_collect(topic)) for topic in topics]
+        
+        cards = []
+        for topic, task in zip(topics, tasks):
+            try:
+                collected = await task
+            except Exception as e:
+                logger.error("Failed to generate cards for %s: %s", topic.name, e)
+                continue
+            if on_topic_cards is None:
+                self._ingest_tree(collected, cards)
+            else:
+                topic_cards = []
+                self._ingest_tree(collected, topic_cards)
+                on_topic_cards(topic, topic_cards)
+        return cards
+    
+    async def _acollect_tree(self, topic: Topic, parent_context: Optional[str] = None,
+                             on_node_done: Optional[Callable[[Topic], None]] = None) -> list:
+        """
+        Generate the raw cards for a topic tree, all topics at once.
+        
+        Returns:
+            ((topic, parent_context), cards) pairs in worklist order
+        """
+        async def _node(current: Topic, parent: Optional[str]) -> List[Flashcard]:
+            produced = await self._agenerate_topic_cards(current, parent)
+            if on_node_done is not None:
+                on_node_done(current)
+            return produced
+        
+        worklist = self._flatten_topics([topic], parent_context)
+        results = await asyncio.gather(*(_node(current, parent) for current, parent in worklist))
+        return list(zip(worklist, results))
+    
+    def _ingest_tree(self, collected: list, cards: List[Flashcard]) -> None:
+        """Register collected results in worklist order so duplicate detection is deterministic."""
+        for (current, _), produced in collected:
+            before = len(cards)
+            self._ingest(produced, cards)
+            self.generation_stats["topics_processed"] += 1
+            logger.info("Generated %d cards for %s", len(cards) - before, current.name)
+    
+    @staticmethod
+    def _flatten_topics(topics: List[Topic], parent_context: Optional[str] = None) -> List[tuple]:
+        """
+        Flatten topic trees into (topic, parent_context) pairs.
+        
+        Uses an iterative pre-order walk, giving the same order as recursing
+        into subtopics: each parent comes before its subtopics.
+        """
+        worklist = []
+        stack = [(topic, parent_context) for topic in reversed(topics)]
+        while stack:
+            current, parent = stack.pop()
+            worklist.append((current, parent))
+            stack.extend((subtopic, current.name) for subtopic in reversed(current.subtopics))
+        return worklist
+    
+    def generate_cards_batch(self, topics: List[Topic], poll_interval: float = 30.0) -> List[Flashcard]:
+        """
+        Generate cards for whole topic trees through the provider's Batch API.
+        
+        Every prompt for every topic is built up front and submitted as one
+        batch job, which is billed at a discount and is not subject to the
+        real-time rate limits. The call blocks until the job finishes, which
+        can take up to 24 hours.
+        
+        Args:
+            topics: Root topics to process, including all of their subtopics
+            poll_interval: Seconds between batch status checks
             
-            # Process subtopics recursively
-            for subtopic in topic.subtopics:
-                subtopic_cards = self.generate_cards(subtopic, topic.name)
-                cards.extend(subtopic_cards)
+        Returns:
+            List of generated flashcards, parents before their subtopics
             
+        Raises:
+            LLMError: If the batch cannot be submitted or does not complete
+        """
+        worklist = self._flatten_topics(topics)
+        multi_output = self.config.get('multi_output', False)
+        
+        # Materialize every request; custom ids must be unique and match [A-Za-z0-9_-]
+        # (Anthropic's constraint), so they are built from the worklist index
+        requests = []
+        kinds_by_topic = []
+        for index, (topic, parent) in enumerate(worklist):
+            kinds = ["all_types"] if multi_output else self._llm_card_kinds(topic)
+            built = []
+            for kind in kinds:
+                if kind == "all_types":
+                    request = self._build_all_types_prompt(topic, parent)
+                else:
+                    request = self._LLM_CARD_HANDLERS[kind][0](self, topic, parent)
+                if request is None:
+                    continue
+                requests.append({
+                    "custom_id": f"{index}-{kind}",
+                    "prompt": request.prompt,
+                    "temperature": request.temperature,
+                    "response_format": request.response_format,
+                    "cache_prefix": request.prefix
+                })
+                built.append(kind)
+            kinds_by_topic.append(built)
+        
+        logger.info("Submitting %d prompts for %d topics as a batch", len(requests), len(worklist))
+        responses = self.llm.run_batch(requests, poll_interval=poll_interval) if requests else {}
+        self.generation_stats["llm_calls"] += len(requests)
+        
+        cards = []
+        for index, (topic, parent) in enumerate(worklist):
+            produced = []
+            for kind in kinds_by_topic[index]:
+                response = responses.get(f"{index}-{kind}")
+                if response is None:
+                    logger.warning("No batch result for %s cards of %s", kind, topic.name)
+                    continue
+                try:
+                    if kind == "all_types":
+                        produced.extend(self._parse_multi_response(response, topic, parent))
+                    else:
+                        produced.extend(self._LLM_CARD_HANDLERS[kind][1](self, response, topic, parent))
+                except Exception as e:
+                    logger.warning("Failed to parse batch %s result for %s: %s", kind, topic.name, e)
+            produced.extend(self._generate_local_cards(topic, parent))
+            self._ingest(produced, cards)
             self.generation_stats["topics_processed"] += 1
-            logger.info(f"Generated {len(cards)} cards for {topic.name}")
-            
-        except Exception as e:
-            logger.error(f"Failed to generate cards for {topic.name}: {e}")
-            raise LLMError(f"Card generation failed: {e}")
         
         return cards
     
-    def _generate_concept_card(self, topic: Topic, parent_context: Optional[str] = None) -> Optional[Flashcard]:
-        """Generate a concept card (Term :: Definition) using YAML prompts."""
-        if not self.config.get('card_types', {}).get('concept', True):
-            return None
+    def generate_cards_packed(self, topics: List[Topic], pack_size: Optional[int] = None,
+                              on_node_done: Optional[Callable[[Topic], None]] = None) -> List[Flashcard]:
+        """
+        Generate flashcards with several topics packed into each LLM request.
         
-        try:
-            # Get prompt configuration from YAML
-            prompt_config = self.prompt_loader.get_config("concept")
-            
-            # Format prompt with topic data
-            context_info = f" (part of {parent_context})" if parent_context else ""
-            formatted_prompt = self.prompt_loader.format_prompt(
-                "concept",
-                context_info=context_info,
-                topic_name=topic.name,
-                content=topic.content[:500] + "..." if len(topic.content) > 500 else topic.content
-            )
+        Synchronous wrapper around :meth:`agenerate_cards_packed`.
+        
+        Args:
+            topics: Root topics to process, including all of their subtopics
+            pack_size: Topics per request; defaults to the ``pack_size`` setting
+            on_node_done: Optional callback invoked with every topic or subtopic
+                as soon as its own cards are generated
             
-            # Generate with LLM using configured temperature
-            response = self.llm.generate(
-                formatted_prompt, 
-                temperature=prompt_config.get('temperature', 0.3)
-            )
-            self.generation_stats["llm_calls"] += 1
+        Returns:
+            List of generated flashcards, parents before their subtopics
+        """
+        return asyncio.run(self.agenerate_cards_packed(topics, pack_size, on_node_done))
+    
+    async def agenerate_cards_packed(self, topics: List[Topic], pack_size: Optional[int] = None,
+                                     on_node_done: Optional[Callable[[Topic], None]] = None
+                                     ) -> List[Flashcard]:
+        """
+        Generate flashcards with several topics packed into each LLM request.
+        
+        The flattened topic trees are split into packs of ``pack_size`` and
+        each pack is sent as one JSON request, so the instructions and the
+        round trip are paid once per pack instead of once per topic. Packs
+        run concurrently. A pack whose response cannot be parsed falls back
+        to per-topic generation for its topics only.
+        
+        Args:
+            topics: Root topics to process, including all of their subtopics
+            pack_size: Topics per request; defaults to the ``pack_size`` setting
+            on_node_done: Optional callback invoked with every topic or subtopic
+                as soon as its own cards are generated
             
-            # Parse response using configured separator
-            separator = prompt_config.get('separator', '::')
-            if separator in response:
-                front, back = response.split(separator, 1)
-                card = Flashcard(
-                    card_type=CardType.CONCEPT,
-                    front=front.strip(),
-                    back=back.strip(),
-                    parent=parent_context,
-                    tags=[topic.name],
-                    difficulty=getattr(topic, 'difficulty', 'intermediate')
+        Returns:
+            List of generated flashcards, parents before their subtopics
+        """
+        pack_size = max(1, pack_size or self.config.get('pack_size') or 1)
+        worklist = self._flatten_topics(topics)
+        packs = [worklist[i:i + pack_size] for i in range(0, len(worklist), pack_size)]
+        
+        results = await asyncio.gather(*(self._agenerate_pack(pack, on_node_done) for pack in packs))
+        
+        cards = []
+        for pack, produced in zip(packs, results):
+            self._ingest_tree(list(zip(pack, produced)), cards)
+        return cards
+    
+    async def _agenerate_pack(self, pack: List[tuple],
+                              on_node_done: Optional[Callable[[Topic], None]] = None) -> List[List[Flashcard]]:
+        """
+        Generate the cards for one pack of (topic, parent_context) pairs.
+        
+        Returns:
+            One card list per pair, in pack order
+        """
+        results = {}
+        try:
+            request = self._build_packed_prompt(pack)
+            if request is not None:
+                response = await self._call_llm(
+                    request.prompt,
+                    temperature=request.temperature,
+                    response_format=request.response_format,
+                    cache_prefix=request.prefix
                 )
-                self.generation_stats["by_type"]["concept"] += 1
-                return card
-                
+                results = self._parse_packed_response(response, pack)
         except Exception as e:
-            logger.warning(f"Failed to generate concept card for {topic.name}: {e}")
+            logger.warning("Packed generation failed for %d topics, falling back to per-topic prompts: %s",
+                           len(pack), e)
         
-        return None
+        async def _node(index: int, topic: Topic, parent: Optional[str]) -> List[Flashcard]:
+            if index in results:
+                produced = results[index]
+            elif self._all_types_sections(topic):
+                # Missing from the packed response (or the pack failed): ask for this topic alone
+                produced = await self._generate_all_card_types(topic, parent)
+            else:
+                produced = []
+            produced.extend(self._generate_local_cards(topic, parent))
+            if on_node_done is not None:
+                on_node_done(topic)
+            return produced
+        
+        return await asyncio.gather(*(_node(index, topic, parent)
+                                      for index, (topic, parent) in enumerate(pack)))
     
-    def _generate_basic_cards(self, topic: Topic, parent_context: Optional[str] = None) -> List[Flashcard]:
-        """Generate basic Q&A cards using YAML prompts."""
-        if not self.config.get('card_types', {}).get('basic', True):
-            return []
+    def _build_packed_prompt(self, pack: List[tuple]) -> Optional[PromptRequest]:
+        """Build one JSON prompt covering every topic in the pack; ids are pack indices."""
+        sections = {}
+        entries = []
+        for index, (topic, parent) in enumerate(pack):
+            topic_sections = self._all_types_sections(topic)
+            if not topic_sections:
+                continue
+            sections.update(topic_sections)
+            entry = {"id": index, "topic": topic.name}
+            if parent:
+                entry["part_of"] = parent
+            entry.update(content=topic.content, key_concepts=topic.key_concepts,
+                         examples=topic.examples, card_types=list(topic_sections))
+            entries.append(entry)
         
-        cards = []
+        if not entries:
+            return None
         
-        try:
-            # Get prompt configuration from YAML
-            prompt_config = self.prompt_loader.get_config("basic")            # Format prompt with topic data
-            context_info = f" (part of {parent_context})" if parent_context else ""
-            
-            # Get number of cards to generate from config
-            num_cards = prompt_config.get('max_cards', 3)
-            
-            formatted_prompt = self.prompt_loader.format_prompt(
-                "basic",
-                context_info=context_info,
-                topic_name=topic.name,
-                content=topic.content,
-                num_cards=num_cards
-            )
-            
-            # Generate with LLM
-            response = self.llm.generate(
-                formatted_prompt, 
-                temperature=prompt_config.get('temperature', 0.4)
-            )
-            self.generation_stats["llm_calls"] += 1
+        request = self._build_request(
+            "packed", 0.3,
+            card_sections="\n".join(f"- {section}" for section in sections.values()),
+            topics_json=json.dumps(entries, ensure_ascii=False)
+        )
+        request.response_format = {"type": "json_object"}
+        return request
+    
+    def _parse_packed_response(self, response: str, pack: List[tuple]) -> Dict[int, List[Flashcard]]:
+        """
+        Build flashcards from a packed JSON response.
+        
+        Args:
+            response: Raw LLM response containing ``{"results": [...]}``
+            pack: The (topic, parent_context) pairs the prompt was built from
             
-            # Parse multiple cards using configured separator
-            separator = prompt_config.get('separator', '>>')
-            lines = [line.strip() for line in response.split('\n') if separator in line]
+        Returns:
+            Cards keyed by pack index; topics absent from the response are omitted
             
-            max_cards = prompt_config.get('max_cards', 3)
-            for line in lines[:max_cards]:
-                if separator in line:
-                    front, back = line.split(separator, 1)
-                    card = Flashcard(
-                        card_type=CardType.BASIC,
-                        front=front.strip(),
-                        back=back.strip(),
-                        parent=parent_context,
-                        tags=[topic.name],
-                        difficulty=getattr(topic, 'difficulty', 'intermediate')
-                    )
-                    cards.append(card)
-                    self.generation_stats["by_type"]["basic"] += 1
-                    
-        except Exception as e:
-            logger.warning(f"Failed to generate basic cards for {topic.name}: {e}")
+        Raises:
+            ValueError: If the response does not contain a results list
+        """
+        results = self._load_json_object(response).get('results')
+        if not isinstance(results, list):
+            raise ValueError("Response JSON has no results list")
         
+        cards = {}
+        for item in results:
+            if not isinstance(item, dict):
+                continue
+            index = item.get('id')
+            if not isinstance(index, int) or not 0 <= index < len(pack) or index in cards:
+                continue
+            topic, parent = pack[index]
+            cards[index] = self._multi_cards(item, topic, parent)
         return cards
     
-    def _generate_cloze_cards(self, topic: Topic, parent_context: Optional[str] = None) -> List[Flashcard]:
-        """Generate cloze deletion cards using YAML prompts."""
-        if not self.config.get('card_types', {}).get('cloze', True):
-            return []
+    async def _agenerate_topic_cards(self, topic: Topic, parent_context: Optional[str] = None) -> List[Flashcard]:
+        """Generate the cards for a single topic, without its subtopics."""
+        logger.info("Generating cards for topic: %s", topic.name)
+        
+        # Local cards are pure Python; build them before awaiting any LLM work
+        local_cards = self._generate_local_cards(topic, parent_context)
         
+        if self.config.get('multi_output', False):
+            tasks = [self._generate_all_card_types(topic, parent_context)]
+        else:
+            tasks = self._llm_card_tasks(topic, parent_context)
+        
+        cards = await self._gather_cards(topic, tasks)
+        cards.extend(local_cards)
+        return cards
+    
+    def _generate_local_cards(self, topic: Topic, parent_context: Optional[str] = None) -> List[Flashcard]:
+        """Build the card types in ``_LOCAL_CARD_METHODS``, which need no LLM call."""
+        card_types = self.config.get('card_types', {})
         cards = []
+        for flag, method in self._LOCAL_CARD_METHODS:
+            if card_types.get(flag, True):
+                cards.extend(method(self, topic, parent_context))
+        return cards
+    
+    def _llm_card_kinds(self, topic: Topic) -> List[str]:
+        """List the LLM-backed card types that apply to a topic, in dispatch order."""
+        card_types = self.config.get('card_types', {})
+        kinds = ["concept", "basic"]
         
+        # Generate cloze cards for lists and details
+        if topic.key_concepts or topic.examples:
+            kinds.append("cloze")
+        
+        # Generate descriptor cards for attributes
+        if card_types.get('descriptor', True):
+            kinds.append("descriptor")
+        
+        # Generate multiple choice cards
+        if card_types.get('multiple_choice', True):
+            kinds.append("multiple_choice")
+        
+        return kinds
+    
+    def _llm_card_tasks(self, topic: Topic, parent_context: Optional[str] = None) -> list:
+        """Build one coroutine per LLM-backed card type enabled for the topic."""
+        return [self._generate_llm_cards(kind, topic, parent_context)
+                for kind in self._llm_card_kinds(topic)]
+    
+    async def _gather_cards(self, topic: Topic, tasks: list) -> List[Flashcard]:
+        """Run card generation coroutines concurrently and flatten their results."""
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        cards = []
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.warning("Card generation task failed for %s: %s", topic.name, result)
+                continue
+            cards.extend(result)
+        return cards
+    
+    async def _generate_all_card_types(self, topic: Topic, parent_context: Optional[str] = None) -> List[Flashcard]:
+        """
+        Generate every LLM-backed card type for a topic with a single request.
+        
+        The topic context is sent once and the model answers with one JSON
+        object keyed by card type. If the response cannot be parsed, the
+        per-type prompts are used instead so the topic is never skipped.
+        """
         try:
-            # Get prompt configuration from YAML
-            prompt_config = self.prompt_loader.get_config("cloze")            # Format prompt with topic data
-            context_info = f" (part of {parent_context})" if parent_context else ""
-            
-            # Get number of cards to generate from config
-            num_cards = prompt_config.get('max_cards', 2)
-            
-            formatted_prompt = self.prompt_loader.format_prompt(
-                "cloze",
-                context_info=context_info,
-                topic_name=topic.name,
-                content=topic.content[:300] + "..." if len(topic.content) > 300 else topic.content,
-                num_cards=num_cards
+            request = self._build_all_types_prompt(topic, parent_context)
+            if request is None:
+                return []
+            response = await self._call_llm(
+                request.prompt,
+                temperature=request.temperature,
+                response_format=request.response_format,
+                cache_prefix=request.prefix,
+                cache_scope=self._cache_scope(request.card_type, parent_context)
             )
+            return self._parse_multi_response(response, topic, parent_context)
+        
+        except Exception as e:
+            logger.warning("Combined generation failed for %s, falling back to per-type prompts: %s", topic.name, e)
+            return await self._gather_cards(topic, self._llm_card_tasks(topic, parent_context))
+    
+    def _all_types_sections(self, topic: Topic) -> Dict[str, str]:
+        """Map each JSON card type key that applies to the topic to its output schema line."""
+        card_types = self.config.get('card_types', {})
+        sections = {}
+        if card_types.get('concept', True):
+            sections["concept"] = '"concept": {"term": "...", "definition": "..."}'
+        if card_types.get('basic', True):
+            max_cards = self.prompt_loader.get_config("basic").get('max_cards', 3)
+            sections["basic"] = f'"basic": list of up to {max_cards} {{"question": "...", "answer": "..."}} objects'
+        if card_types.get('cloze', True) and (topic.key_concepts or topic.examples):
+            max_cards = self.prompt_loader.get_config("cloze").get('max_cards', 2)
+            sections["cloze"] = f'"cloze": list of up to {max_cards} sentences with hidden terms in double curly braces'
+        if card_types.get('descriptor', True):
+            max_cards = self.prompt_loader.get_config("descriptor").get('max_cards', 3)
+            sections["descriptor"] = f'"descriptor": list of up to {max_cards} {{"attribute": "...", "value": "..."}} objects'
+        if card_types.get('multiple_choice', True) and topic.examples and len(topic.examples) >= 3:
+            sections["multiple_choice"] = '"multiple_choice": {"question": "...", "options": ["correct answer", "distractor", "distractor", "distractor"]}'
+        return sections
+    
+    def _build_all_types_prompt(self, topic: Topic, parent_context: Optional[str] = None) -> Optional[PromptRequest]:
+        """Build the combined JSON prompt listing only the sections that apply to the topic."""
+        sections = list(self._all_types_sections(topic).values())
+        if not sections:
+            return None
+        
+        context_info = f" (part of {parent_context})" if parent_context else ""
+        request = self._build_request(
+            "all_types", 0.3,
+            context_info=context_info,
+            topic_name=topic.name,
+            content=topic.content,
+            key_concepts=topic.key_concepts_joined,
+            examples=topic.examples_joined,
+            card_sections="\n".join(f"- {section}" for section in sections)
+        )
+        request.response_format = {"type": "json_object"}
+        return request
+    
+    def _parse_multi_response(self, response: str, topic: Topic, parent_context: Optional[str] = None) -> List[Flashcard]:
+        """
+        Build flashcards from a combined JSON response.
+        
+        Args:
+            response: Raw LLM response containing one JSON object
+            topic: Topic the cards were generated for
+            parent_context: Parent topic name for hierarchical organization
             
-            # Generate with LLM
-            response = self.llm.generate(
-                formatted_prompt, 
-                temperature=prompt_config.get('temperature', 0.3)
-            )
-            self.generation_stats["llm_calls"] += 1
-            
-            # Parse cloze cards (look for lines with cloze deletions)
-            lines = [line.strip() for line in response.split('\n') 
-                    if '{{' in line and '}}' in line]
+        Returns:
+            List of flashcards in concept, basic, cloze, descriptor, multiple choice order
             
-            max_cards = prompt_config.get('max_cards', 2)
+        Raises:
+            ValueError: If the response does not contain a JSON object
+        """
+        return self._multi_cards(self._load_json_object(response), topic, parent_context)
+    
+    @staticmethod
+    def _load_json_object(response: str) -> Dict:
+        """
+        Decode the JSON object in an LLM response.
+        
+        Raises:
+            ValueError: If the response does not contain a JSON object
+        """
+        # Tolerate markdown fences or stray text around the object
+        start, end = response.find('{'), response.rfind('}')
+        if start == -1 or end <= start:
+            raise ValueError("No JSON object found in response")
+        try:
+            data = _loads(response[start:end + 1].encode('utf-8'))
+        except ValueError as e:  # json and orjson decode errors both subclass ValueError
+            raise ValueError(f"Invalid JSON in response: {e}")
+        if not isinstance(data, dict):
+            raise ValueError("Response JSON is not an object")
+        return data
+    
+    def _multi_cards(self, data: Dict, topic: Topic, parent_context: Optional[str] = None) -> List[Flashcard]:
+        """Build flashcards from a decoded object keyed by card type."""
+        card_types = self.config.get('card_types', {})
+        difficulty = topic.difficulty
+        cards = []
+        
+        concept = data.get('concept')
+        if card_types.get('concept', True) and isinstance(concept, dict):
+            term, definition = concept.get('term'), concept.get('definition')
+            if term and definition:
+                cards.append(Flashcard(
+                    card_type=CardType.CONCEPT,
+                    front=str(term).strip(),
+                    back=str(definition).strip(),
+                    parent=parent_context,
+                    tags=[topic.name],
+                    difficulty=difficulty
+                ))
+                self.generation_stats["by_type"]["concept"] += 1
+        
+        if card_types.get('basic', True):
+            max_cards = self.prompt_loader.get_config("basic").get('max_cards', 3)
+            for item in (data.get('basic') or [])[:max_cards]:
+                if isinstance(item, dict) and item.get('question') and item.get('answer'):
+                    cards.append(Flashcard(
+                        card_type=CardType.BASIC,
+                        front=str(item['question']).strip(),
+                        back=str(item['answer']).strip(),
+                        parent=parent_context,
+                        tags=[topic.name],
+                        difficulty=difficulty
+                    ))
+                    self.generation_stats["by_type"]["basic"] += 1
+        
+        if card_types.get('cloze', True):
+            max_cards = self.prompt_loader.get_config("cloze").get('max_cards', 2)
+            lines = [line for line in map(str.strip, map(str, data.get('cloze') or []))
+                     if _CLOZE_RE.search(line)]
             for line in lines[:max_cards]:
-                card = Flashcard(
+                cards.append(Flashcard(
                     card_type=CardType.CLOZE,
                     front=line,
                     back="",  # Cloze cards don't have separate backs
                     parent=parent_context,
                     tags=[topic.name],
-                    difficulty=getattr(topic, 'difficulty', 'intermediate')
-                )
-                cards.append(card)
+                    difficulty=difficulty
+                ))
                 self.generation_stats["by_type"]["cloze"] += 1
-        except Exception as e:
-            logger.warning(f"Failed to generate cloze cards for {topic.name}: {e}")
         
-        return cards
-    
-    def _generate_descriptor_cards(self, topic: Topic, parent_context: Optional[str] = None) -> List[Flashcard]:
-        """Generate descriptor cards for attributes using YAML prompts."""
-        if not self.config.get('card_types', {}).get('descriptor', True):
-            return []
-        
-        cards = []
-        
-        try:
-            # Get prompt configuration from YAML
-            prompt_config = self.prompt_loader.get_config("descriptor")
-              # Format prompt with topic data
-            context_info = f" (part of {parent_context})" if parent_context else ""
-            
-            # Get number of cards to generate from config
-            num_cards = prompt_config.get('max_cards', 3)
-            
-            formatted_prompt = self.prompt_loader.format_prompt(
-                "descriptor",
-                context_info=context_info,
-                topic_name=topic.name,
-                content=topic.content[:300] + "..." if len(topic.content) > 300 else topic.content,
-                num_cards=num_cards
-            )
-            
-            # Generate with LLM
-            response = self.llm.generate(
-                formatted_prompt, 
-                temperature=prompt_config.get('temperature', 0.3)
-            )
-            self.generation_stats["llm_calls"] += 1
-            
-            # Parse descriptor cards using configured separator
-            separator = prompt_config.get('separator', ';;')
-            lines = [line.strip() for line in response.split('\n') if separator in line]
-            
-            max_cards = prompt_config.get('max_cards', 3)
-            for line in lines[:max_cards]:
-                if separator in line:
-                    front, back = line.split(separator, 1)
-                    card = Flashcard(
+        if card_types.get('descriptor', True):
+            max_cards = self.prompt_loader.get_config("descriptor").get('max_cards', 3)
+            for item in (data.get('descriptor') or [])[:max_cards]:
+                if isinstance(item, dict) and item.get('attribute') and item.get('value'):
+                    cards.append(Flashcard(
                         card_type=CardType.DESCRIPTOR,
-                        front=front.strip(),
-                        back=back.strip(),
+                        front=str(item['attribute']).strip(),
+                        back=str(item['value']).strip(),
                         parent=parent_context,
                         tags=[topic.name, "descriptor"],
-                        difficulty=getattr(topic, 'difficulty', 'intermediate'),
+                        difficulty=difficulty,
                         direction=CardDirection.BIDIRECTIONAL  # Use ;; syntax for descriptors
-                    )
-                    cards.append(card)
+                    ))
                     self.generation_stats["by_type"]["descriptor"] += 1
-                
-        except Exception as e:
-            logger.warning(f"Failed to generate descriptor cards for {topic.name}: {e}")
+        
+        choice = data.get('multiple_choice')
+        if card_types.get('multiple_choice', True) and isinstance(choice, dict):
+            options = [str(option).strip() for option in (choice.get('options') or []) if option]
+            if choice.get('question') and len(options) >= 3:
+                cards.append(Flashcard(
+                    card_type=CardType.MULTIPLE_CHOICE,
+                    front=str(choice['question']).strip(),
+                    back="",  # Will be formatted from list_items
+                    parent=parent_context,
+                    tags=[topic.name, "multiple_choice"],
+                    list_items=options[:4],
+                    correct_choice_index=0  # Prompt puts the correct option first
+                ))
+                self.generation_stats["by_type"]["multiple_choice"] += 1
         
         return cards
     
+    async def _generate_llm_cards(self, card_type: str, topic: Topic,
+                                  parent_context: Optional[str] = None) -> List[Flashcard]:
+        """
+        Generate cards of one LLM-backed type: build the prompt, call the LLM, parse.
+        
+        Args:
+            card_type: Prompt name (concept, basic, cloze, descriptor, multiple_choice)
+            topic: Topic to generate cards for
+            parent_context: Parent topic name for hierarchical organization
+            
+        Returns:
+            Parsed flashcards (empty if the type does not apply or generation fails)
+        """
+        builder, parser = self._LLM_CARD_HANDLERS[card_type]
+        try:
+            request = builder(self, topic, parent_context)
+            if request is None:
+                return []
+            if self.config.get('stream', False) and card_type in self._LINE_CARD_PARSERS:
+                return await self._stream_line_cards(request, topic, parent_context)
+            response = await self._call_llm(
+                request.prompt,
+                temperature=request.temperature,
+                response_format=request.response_format,
+                cache_prefix=request.prefix,
+                cache_scope=self._cache_scope(request.card_type, parent_context)
+            )
+            return parser(self, response, topic, parent_context)
+        except Exception as e:
+            logger.warning("Failed to generate %s cards for %s: %s", card_type, topic.name, e)
+            return []
+    
+    def _build_request(self, card_type: str, default_temperature: float, **kwargs) -> PromptRequest:
+        """
+        Format a prompt template into a request using its configured temperature.
+        
+        The template's system prompt and static instructions form the cacheable
+        prefix; only the per-topic remainder differs between requests.
+        """
+        prompt_config = self.prompt_loader.get_config(card_type)
+        _, prompt_suffix = self.prompt_loader.format_prompt_parts(card_type, **kwargs)
+        prompt_prefix = self.prompt_loader.get_cacheable_prefix(card_type)
+        return PromptRequest(
+            card_type=card_type,
+            prompt=prompt_prefix + prompt_suffix,
+            prefix=prompt_prefix,
+            temperature=prompt_config.get('temperature', default_temperature)
+        )
+    
+    def _build_concept_prompt(self, topic: Topic, parent_context: Optional[str] = None) -> Optional[PromptRequest]:
+        """Build the concept card (Term :: Definition) prompt."""
+        if not self.config.get('card_types', {}).get('concept', True):
+            return None
+        context_info = f" (part of {parent_context})" if parent_context else ""
+        return self._build_request(
+            "concept", 0.3,
+            context_info=context_info,
+            topic_name=topic.name,
+            content=topic.content_500
+        )
+    
+    def _parse_concept_response(self, response: str, topic: Topic,
+                                parent_context: Optional[str] = None) -> List[Flashcard]:
+        """Parse a concept card response using the configured separator."""
+        separator = self.prompt_loader.get_config("concept").get('separator', '::')
+        if separator not in response:
+            return []
+        front, back = response.split(separator, 1)
+        card = Flashcard(
+            card_type=CardType.CONCEPT,
+            front=front.strip(),
+            back=back.strip(),
+            parent=parent_context,
+            tags=[topic.name],
+            difficulty=topic.difficulty
+        )
+        self.generation_stats["by_type"]["concept"] += 1
+        return [card]
+    
+    def _build_basic_prompt(self, topic: Topic, parent_context: Optional[str] = None) -> Optional[PromptRequest]:
+        """Build the basic Q&A cards prompt."""
+        if not self.config.get('card_types', {}).get('basic', True):
+            return None
+        context_info = f" (part of {parent_context})" if parent_context else ""
+        return self._build_request(
+            "basic", 0.4,
+            context_info=context_info,
+            topic_name=topic.name,
+            content=topic.content,
+            num_cards=self.prompt_loader.get_config("basic").get('max_cards', 3)
+        )
+    
+    def _parse_basic_response(self, response: str, topic: Topic,
+                              parent_context: Optional[str] = None) -> List[Flashcard]:
+        """Parse basic Q&A cards, one per line, using the configured separator."""
+        prompt_config = self.prompt_loader.get_config("basic")
+        separator = prompt_config.get('separator', '>>')
+        lines = [line.strip() for line in response.split('\n') if separator in line]
+        return [self._basic_card_from_line(line, topic, parent_context, separator)
+                for line in lines[:prompt_config.get('max_cards', 3)]]
+    
+    def _basic_card_from_line(self, line: str, topic: Topic, parent_context: Optional[str] = None,
+                              separator: Optional[str] = None) -> Optional[Flashcard]:
+        """Build one basic Q&A card from a response line, or None if it has no separator."""
+        if separator is None:
+            separator = self.prompt_loader.get_config("basic").get('separator', '>>')
+        if separator not in line:
+            return None
+        front, back = line.strip().split(separator, 1)
+        self.generation_stats["by_type"]["basic"] += 1
+        return Flashcard(
+            card_type=CardType.BASIC,
+            front=front.strip(),
+            back=back.strip(),
+            parent=parent_context,
+            tags=[topic.name],
+            difficulty=topic.difficulty
+        )
+    
+    def _build_cloze_prompt(self, topic: Topic, parent_context: Optional[str] = None) -> Optional[PromptRequest]:
+        """Build the cloze deletion cards prompt."""
+        if not self.config.get('card_types', {}).get('cloze', True):
+            return None
+        context_info = f" (part of {parent_context})" if parent_context else ""
+        return self._build_request(
+            "cloze", 0.3,
+            context_info=context_info,
+            topic_name=topic.name,
+            content=topic.content_300,
+            num_cards=self.prompt_loader.get_config("cloze").get('max_cards', 2)
+        )
+    
+    def _parse_cloze_response(self, response: str, topic: Topic,
+                              parent_context: Optional[str] = None) -> List[Flashcard]:
+        """Parse cloze cards from lines containing cloze deletions."""
+        lines = [line for line in map(str.strip, response.split('\n'))
+                 if _CLOZE_RE.search(line)]
+        
+        return [self._cloze_card_from_line(line, topic, parent_context)
+                for line in lines[:self.prompt_loader.get_config("cloze").get('max_cards', 2)]]
+    
+    def _cloze_card_from_line(self, line: str, topic: Topic,
+                              parent_context: Optional[str] = None) -> Optional[Flashcard]:
+        """Build one cloze card from a response line, or None if it has no deletion."""
+        line = line.strip()
+        if not _CLOZE_RE.search(line):
+            return None
+        self.generation_stats["by_type"]["cloze"] += 1
+        return Flashcard(
+            card_type=CardType.CLOZE,
+            front=line,
+            back="",  # Cloze cards don't have separate backs
+            parent=parent_context,
+            tags=[topic.name],
+            difficulty=topic.difficulty
+        )
+    
+    def _build_descriptor_prompt(self, topic: Topic, parent_context: Optional[str] = None) -> Optional[PromptRequest]:
+        """Build the descriptor cards prompt."""
+        if not self.config.get('card_types', {}).get('descriptor', True):
+            return None
+        context_info = f" (part of {parent_context})" if parent_context else ""
+        return self._build_request(
+            "descriptor", 0.3,
+            context_info=context_info,
+            topic_name=topic.name,
+            content=topic.content_300,
+            num_cards=self.prompt_loader.get_config("descriptor").get('max_cards', 3)
+        )
+    
+    def _parse_descriptor_response(self, response: str, topic: Topic,
+                                   parent_context: Optional[str] = None) -> List[Flashcard]:
+        """Parse descriptor cards using the configured separator."""
+        prompt_config = self.prompt_loader.get_config("descriptor")
+        separator = prompt_config.get('separator', ';;')
+        lines = [line.strip() for line in response.split('\n') if separator in line]
+        return [self._descriptor_card_from_line(line, topic, parent_context, separator)
+                for line in lines[:prompt_config.get('max_cards', 3)]]
+    
+    def _descriptor_card_from_line(self, line: str, topic: Topic, parent_context: Optional[str] = None,
+                                   separator: Optional[str] = None) -> Optional[Flashcard]:
+        """Build one descriptor card from a response line, or None if it has no separator."""
+        if separator is None:
+            separator = self.prompt_loader.get_config("descriptor").get('separator', ';;')
+        if separator not in line:
+            return None
+        front, back = line.strip().split(separator, 1)
+        self.generation_stats["by_type"]["descriptor"] += 1
+        return Flashcard(
+            card_type=CardType.DESCRIPTOR,
+            front=front.strip(),
+            back=back.strip(),
+            parent=parent_context,
+            tags=[topic.name, "descriptor"],
+            difficulty=topic.difficulty,
+            direction=CardDirection.BIDIRECTIONAL  # Use ;; syntax for descriptors
+        )
+    
+    def _build_multiple_choice_prompt(self, topic: Topic,
+                                      parent_context: Optional[str] = None) -> Optional[PromptRequest]:
+        """Build the multiple choice prompt; requires at least three examples."""
+        if not topic.examples or len(topic.examples) < 3:
+            return None
+        context_info = f" (part of {parent_context})" if parent_context else ""
+        return self._build_request(
+            "multiple_choice", 0.4,
+            context_info=context_info,
+            topic_name=topic.name,
+            examples=topic.examples_bullets
+        )
+    
+    def _parse_multiple_choice_response(self, response: str, topic: Topic,
+                                        parent_context: Optional[str] = None) -> List[Flashcard]:
+        """Parse a question line followed by A) to D) options."""
+        lines = response.strip().split('\n')
+        if len(lines) < 5:  # Question + 4 options minimum
+            return []
+        question_line = lines[0]
+        if '>>' not in question_line:
+            return []
+        front, _ = question_line.split('>>', 1)
+        
+        # Extract options (A), B), C), D))
+        options = []
+        for line in lines[1:]:
+            line = line.strip()
+            if line and any(line.startswith(f"{letter})") for letter in ['A', 'B', 'C', 'D']):
+                # Remove the letter prefix
+                options.append(line[2:].strip())
+        
+        if len(options) < 3:
+            return []
+        card = Flashcard(
+            card_type=CardType.MULTIPLE_CHOICE,
+            front=front.strip(),
+            back="",  # Will be formatted from list_items
+            parent=parent_context,
+            tags=[topic.name, "multiple_choice"],
+            list_items=options,
+            correct_choice_index=0  # Assume first option is correct
+        )
+        self.generation_stats["by_type"]["multiple_choice"] += 1
+        return [card]
+    
+    # Prompt builder and response parser for each LLM-backed card type
+    _LLM_CARD_HANDLERS = {
+        "concept": (_build_concept_prompt, _parse_concept_response),
+        "basic": (_build_basic_prompt, _parse_basic_response),
+        "cloze": (_build_cloze_prompt, _parse_cloze_response),
+        "descriptor": (_build_descriptor_prompt, _parse_descriptor_response),
+        "multiple_choice": (_build_multiple_choice_prompt, _parse_multiple_choice_response),
+    }
+    
+    # Per-line card builder and default max_cards for the line-based types that can be streamed
+    _LINE_CARD_PARSERS = {
+        "basic": (_basic_card_from_line, 3),
+        "cloze": (_cloze_card_from_line, 2),
+        "descriptor": (_descriptor_card_from_line, 3),
+    }
+    
     def _generate_multiline_cards(self, topic: Topic, parent_context: Optional[str] = None) -> List[Flashcard]:
         """Generate multi-line cards for complex content."""
         cards = []
         
-        try:
-            # Generate multi-line concept card for complex definitions
-            if len(topic.content) > 200:  # Long content gets multi-line treatment
-                card = Flashcard(
-                    card_type=CardType.MULTILINE_CONCEPT,
-                    front=topic.name,
-                    back=topic.content,
-                    parent=parent_context,
-                    tags=[topic.name, "multiline"],
-                    is_multiline=True
-                )
-                cards.append(card)
-                self.generation_stats["by_type"]["multiline_concept"] += 1
-        
-        except Exception as e:
-            logger.warning(f"Failed to generate multiline cards for {topic.name}: {e}")
+        # Generate multi-line concept card for complex definitions
+        if len(topic.content) > 200:  # Long content gets multi-line treatment
+            cards.append(Flashcard(
+                card_type=CardType.MULTILINE_CONCEPT,
+                front=topic.name,
+                back=topic.content,
+                parent=parent_context,
+                tags=[topic.name, "multiline"],
+                is_multiline=True
+            ))
+            self.generation_stats["by_type"]["multiline_concept"] += 1
         
         return cards
     
@@ -454,97 +1181,143 @@ class CardGenerator:
         """Generate list-answer cards from key concepts or examples."""
         cards = []
         
-        try:
-            # Generate from key concepts if available
-            if topic.key_concepts and len(topic.key_concepts) > 1:
-                card = Flashcard(
-                    card_type=CardType.LIST_ANSWER,
-                    front=f"What are the key concepts of {topic.name}?",
-                    back="",  # Will be formatted from list_items
-                    parent=parent_context,
-                    tags=[topic.name, "list"],
-                    list_items=topic.key_concepts
-                )
-                cards.append(card)
-                self.generation_stats["by_type"]["list_answer"] += 1
-        except Exception as e:
-            logger.warning(f"Failed to generate list answer cards for {topic.name}: {e}")
+        # Generate from key concepts if available
+        if topic.key_concepts and len(topic.key_concepts) > 1:
+            cards.append(Flashcard(
+                card_type=CardType.LIST_ANSWER,
+                front=f"What are the key concepts of {topic.name}?",
+                back="",  # Will be formatted from list_items
+                parent=parent_context,
+                tags=[topic.name, "list"],
+                list_items=topic.key_concepts
+            ))
+            self.generation_stats["by_type"]["list_answer"] += 1
         
         return cards
     
-    def _generate_multiple_choice_cards(self, topic: Topic, parent_context: Optional[str] = None) -> List[Flashcard]:
-        """Generate multiple choice cards using LLM prompts."""
-        cards = []
+    # Config flag and builder for each card type generated locally without the LLM
+    _LOCAL_CARD_METHODS = (
+        ("multiline", _generate_multiline_cards),
+        ("list_answer", _generate_list_answer_cards),
+    )
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Return the concurrency semaphore for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            # asyncio primitives are bound to one loop; each asyncio.run() needs its own
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+    
+    async def _call_llm(self, prompt: str, temperature: float,
+                        response_format: Optional[Dict] = None,
+                        cache_prefix: Optional[str] = None,
+                        cache_scope: Optional[str] = None) -> str:
+        """
+        Issue a single LLM request within the concurrency and rate limits.
         
-        try:
-            # Only generate if we have enough examples
-            if not topic.examples or len(topic.examples) < 3:
-                return cards
-                
-            # Get prompt configuration from YAML
-            prompt_config = self.prompt_loader.get_config("multiple_choice")            # Format prompt with topic data
-            context_info = f" (part of {parent_context})" if parent_context else ""
-            examples_text = '\n'.join(f"- {example}" for example in topic.examples[:4]) if topic.examples else topic.content
-            
-            formatted_prompt = self.prompt_loader.format_prompt(
-                "multiple_choice",
-                context_info=context_info,
-                topic_name=topic.name,
-                examples=examples_text
-            )
-            
-            # Generate with LLM
-            response = self.llm.generate(
-                formatted_prompt, 
-                temperature=prompt_config.get('temperature', 0.4)
-            )
-            self.generation_stats["llm_calls"] += 1
+        Args:
+            prompt: Formatted prompt to send
+            temperature: Sampling temperature for this card type
+            response_format: Optional structured output hint for the provider
+            cache_prefix: Static leading part of the prompt for provider prompt caching
+            cache_scope: Semantic cache key separating card types and parent topics
             
-            # Parse response for multiple choice format
-            lines = response.strip().split('\n')
-            if len(lines) >= 5:  # Question + 4 options minimum
-                question_line = lines[0]
-                if '>>' in question_line:
-                    front, _ = question_line.split('>>', 1)
-                    
-                    # Extract options (A), B), C), D))
-                    options = []
-                    for line in lines[1:]:
-                        line = line.strip()
-                        if line and any(line.startswith(f"{letter})") for letter in ['A', 'B', 'C', 'D']):
-                            # Remove the letter prefix
-                            option = line[2:].strip()
-                            options.append(option)
-                    
-                    if len(options) >= 3:
-                        card = Flashcard(
-                            card_type=CardType.MULTIPLE_CHOICE,
-                            front=front.strip(),
-                            back="",  # Will be formatted from list_items
-                            parent=parent_context,
-                            tags=[topic.name, "multiple_choice"],
-                            list_items=options,
-                            correct_choice_index=0  # Assume first option is correct
-                        )
-                        cards.append(card)
-                        self.generation_stats["by_type"]["multiple_choice"] += 1
+        Returns:
+            Raw LLM response text
+        """
+        # Only pass optional arguments that are set, keeping simple clients compatible
+        kwargs = {'temperature': temperature}
+        if response_format is not None:
+            kwargs['response_format'] = response_format
+        if cache_prefix:
+            kwargs['cache_prefix'] = cache_prefix
+        if cache_scope:
+            kwargs['cache_scope'] = cache_scope
         
-        except Exception as e:
-            logger.warning(f"Failed to generate multiple choice cards for {topic.name}: {e}")
+        async with self._get_semaphore():
+            response = await self.llm.agenerate(prompt, **kwargs)
+        self.generation_stats["llm_calls"] += 1
+        return response
+    
+    @staticmethod
+    def _cache_scope(card_type: str, parent_context: Optional[str] = None) -> str:
+        """
+        Build the semantic cache scope for one request.
         
-        return cards
+        Same-named subtopics under different parents (e.g. two "Overview"
+        topics) must never be served each other's cards.
+        """
+        return f"{card_type}|{parent_context or ''}"
     
-    def _is_unique_card(self, card: Flashcard) -> bool:
-        """Check if card is unique (not a duplicate)."""
-        if card.source_hash in self.generated_cards:
-            self.generation_stats["duplicates_avoided"] += 1
-            return False
-        return True
+    async def _stream_line_cards(self, request: PromptRequest, topic: Topic,
+                                 parent_context: Optional[str] = None) -> List[Flashcard]:
+        """
+        Stream a line-based card type and build cards as each line completes.
+        
+        Parsing overlaps with generation, and the stream is closed as soon as
+        ``max_cards`` cards have been parsed instead of waiting for the model
+        to finish.
+        
+        Args:
+            request: Prompt request for a type in ``_LINE_CARD_PARSERS``
+            topic: Topic the cards belong to
+            parent_context: Parent topic name for hierarchical organization
+            
+        Returns:
+            Parsed flashcards, at most ``max_cards``
+        """
+        line_parser, default_max = self._LINE_CARD_PARSERS[request.card_type]
+        max_cards = self.prompt_loader.get_config(request.card_type).get('max_cards', default_max)
+        kwargs = {'temperature': request.temperature}
+        if request.prefix:
+            kwargs['cache_prefix'] = request.prefix
+        kwargs['cache_scope'] = self._cache_scope(request.card_type, parent_context)
+        
+        cards = []
+        buffer = ""
+        async with self._get_semaphore():
+            stream = self.llm.agenerate_stream(request.prompt, **kwargs)
+            try:
+                async for chunk in stream:
+                    buffer += chunk
+                    while '\n' in buffer:
+                        line, buffer = buffer.split('\n', 1)
+                        card = line_parser(self, line, topic, parent_context)
+                        if card is not None:
+                            cards.append(card)
+                            if len(cards) >= max_cards:
+                                return cards
+                if buffer:
+                    card = line_parser(self, buffer, topic, parent_context)
+                    if card is not None:
+                        cards.append(card)
+            finally:
+                await stream.aclose()
+                self.generation_stats["llm_calls"] += 1
+        return cards
     
-    def _register_card(self, card: Flashcard) -> None:
-        """Register card as generated to avoid duplicates."""
-        self.generated_cards.add(card.source_hash)
-        self.generation_stats["total_cards"] += 1
+    def _ingest(self, produced, out: List[Flashcard]) -> None:
+        """
+        Append unique cards to ``out`` and register them for duplicate detection.
+        
+        Args:
+            produced: Iterable of newly generated cards
+            out: List that receives the cards that are not duplicates
+        """
+        seen = self.generated_cards
+        add = seen.add
+        append = out.append
+        stats = self.generation_stats
+        for card in produced:
+            source_hash = card.source_hash
+            if source_hash in seen:
+                stats["duplicates_avoided"] += 1
+                continue
+            add(source_hash)
+            stats["total_cards"] += 1
+            append(card)
     
     def validate_card_format(self, card: Flashcard) -> bool:
         """
@@ -566,7 +1339,7 @@ class CardGenerator:
             
         # Validate cloze cards have proper format
         if card.card_type == CardType.CLOZE:
-            if not ('{{' in card.front and '}}' in card.front):
+            if not _CLOZE_RE.search(card.front):
                 return False
         
         # List cards should have list items
@@ -575,13 +1348,12 @@ class CardGenerator:
                 return False
                 
         # Check for unescaped delimiters (only flag if they appear to be unintentional)
-        dangerous_patterns = [':::', '>>>', ';;;']  # Multi-line delimiters in single-line content
-        for pattern in dangerous_patterns:
-            if pattern in card.front or pattern in card.back:
-                # Allow if this is actually a multi-line card
-                if not (card.is_multiline or 'multiline' in card.card_type.value.lower()):
-                    logger.warning(f"Potential delimiter conflict in card: {card.front[:50]}...")
-                    return False
+        # The NUL separator keeps a pattern from spanning front and back
+        if _DANGEROUS_RE.search(card.front + '\x00' + card.back):
+            # Allow if this is actually a multi-line card
+            if not (card.is_multiline or 'multiline' in card.card_type.value.lower()):
+                logger.warning("Potential delimiter conflict in card: %s...", card.front[:50])
+                return False
                 
         return True
         
@@ -623,4 +1395,5 @@ def main():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     main()
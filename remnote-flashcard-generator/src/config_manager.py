@@ -5,22 +5,156 @@ Handles loading, validation, and management of application configuration.
 Provides type-safe access to configuration values with validation.
 """
 
-import yaml
-import jsonschema
 from pathlib import Path
-from typing import Dict, Any, Optional, Union
-from dataclasses import dataclass, field
-from dotenv import load_dotenv
+from typing import Dict, Any, Optional, Union, Tuple
+from dataclasses import dataclass, field, fields, is_dataclass
+from functools import lru_cache
+import copy
+import json
 import os
 import logging
 
-# Load environment variables
-load_dotenv()
+# yaml, jsonschema, fastjsonschema and dotenv are imported on first use so that
+# importing this module (e.g. just for the dataclasses) stays cheap.
 
 logger = logging.getLogger(__name__)
 
+# Locations of the bundled configuration files, resolved once at import
+_MODULE_DIR = Path(__file__).resolve().parent
+_DEFAULT_SCHEMA_PATH = _MODULE_DIR.parent / "config" / "app_config_schema.yaml"
+_DEFAULT_CONFIG_PATH = _MODULE_DIR.parent / "config" / "config.yaml"
 
-@dataclass
+# Allowed floating point slack when checking that difficulty weights sum to 1.0
+_DIFFICULTY_TOLERANCE = 0.01
+
+_ENV_LOADED = False
+
+
+def _ensure_env_loaded() -> None:
+    """Load variables from a ``.env`` file the first time they are needed."""
+    global _ENV_LOADED
+    if not _ENV_LOADED:
+        if os.getenv("REMNOTE_SKIP_DOTENV") is None:
+            from dotenv import load_dotenv
+            load_dotenv()
+        _ENV_LOADED = True
+
+
+@lru_cache(maxsize=None)
+def _cached_env(name: str) -> Optional[str]:
+    """
+    Look up an environment variable once per process.
+    
+    Call ``reset_env_cache`` after changing the environment at runtime.
+    """
+    _ensure_env_loaded()
+    return os.environ.get(name)
+
+
+def reset_env_cache() -> None:
+    """Forget cached environment lookups so the next read sees current values."""
+    _cached_env.cache_clear()
+
+
+_BOOL = {'true': True, 'false': False}
+
+
+def _env_str(value: str) -> Union[str, bool]:
+    """Convert a string override, mapping 'true'/'false' to booleans."""
+    return _BOOL.get(value.lower(), value)
+
+
+# Environment variable, config path and converter for each supported override
+_ENV_TABLE = (
+    ('REMNOTE_LLM_PROVIDER', ('llm', 'provider'), _env_str),
+    ('REMNOTE_LLM_MODEL', ('llm', 'model'), _env_str),
+    ('REMNOTE_LLM_TEMPERATURE', ('llm', 'temperature'), float),
+    ('REMNOTE_LLM_MAX_TOKENS', ('llm', 'max_tokens'), int),
+    ('REMNOTE_LLM_RETRY_ATTEMPTS', ('llm', 'retry_attempts'), int),
+    ('REMNOTE_LLM_RETRY_DELAY', ('llm', 'retry_delay'), float),
+    ('REMNOTE_LLM_MAX_CONCURRENCY', ('llm', 'max_concurrency'), int),
+    ('REMNOTE_LLM_RPM', ('llm', 'rpm'), float),
+    ('REMNOTE_LLM_TPM', ('llm', 'tpm'), float),
+    ('REMNOTE_OUTPUT_FORMAT', ('output', 'format'), _env_str),
+)
+
+
+def _make_setter(path: Tuple[str, ...]):
+    """Return a function that stores a value at ``path`` in a nested config dict."""
+    *heads, tail = path
+    
+    def setter(root: Dict[str, Any], value: Any) -> None:
+        current = root
+        for key in heads:
+            current = current.setdefault(key, {})
+        current[tail] = value
+    
+    return setter
+
+
+# (variable, setter, converter) triples derived from _ENV_TABLE once at import
+_ENV_SETTERS = tuple((env_var, _make_setter(path), convert) for env_var, path, convert in _ENV_TABLE)
+
+
+# Environment variable holding the API key for each provider
+_API_KEY_ENV = {
+    'openai': 'OPENAI_API_KEY',
+    'anthropic': 'ANTHROPIC_API_KEY',
+}
+
+
+@lru_cache(maxsize=None)
+def _yaml_classes() -> Tuple[type, type]:
+    """
+    Return the YAML safe loader and dumper classes, importing PyYAML on first use.
+    
+    The libyaml-backed C classes are ~10x faster than the pure-Python ones
+    and are preferred when PyYAML was built against libyaml.
+    """
+    try:
+        from yaml import CSafeLoader as loader, CSafeDumper as dumper
+    except ImportError:
+        from yaml import SafeLoader as loader, SafeDumper as dumper
+    return loader, dumper
+
+
+@lru_cache(maxsize=32)
+def _read_yaml_cached(path: str, mtime_ns: int) -> Any:
+    """
+    Parse a YAML file, memoized on its path and modification time.
+    
+    Passing ``mtime_ns`` as part of the key means an edited file is parsed
+    again on the next call. The returned object is shared between callers
+    and must not be mutated; use ``_read_yaml`` for a private copy.
+    """
+    import yaml
+    
+    # Hand raw bytes to the loader so libyaml decodes UTF-8 in C
+    with open(path, 'rb') as f:
+        data = f.read()
+    return yaml.load(data, Loader=_yaml_classes()[0])
+
+
+def _read_yaml(path: Path, copy_result: bool = True) -> Any:
+    """
+    Read a YAML file through the parse cache.
+    
+    Args:
+        path: File to read
+        copy_result: Return a deep copy that the caller may modify
+        
+    Returns:
+        Parsed YAML content
+    """
+    data = _read_yaml_cached(str(path), os.stat(path).st_mtime_ns)
+    return copy.deepcopy(data) if copy_result else data
+
+
+# Memoized result of load_default_config, keyed by (path, mtime_ns)
+_DEFAULT_CONFIG: Optional[Tuple[Tuple[str, int], 'AppConfig']] = None
+
+
+@dataclass(slots=True, frozen=True)
 class LLMConfig:
     """Configuration for LLM client."""
     provider: str
@@ -29,23 +163,26 @@ class LLMConfig:
     max_tokens: int = 2000
     retry_attempts: int = 3
     retry_delay: float = 2.0
+    max_concurrency: int = 16
+    rpm: Optional[float] = None
+    tpm: Optional[float] = None
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class RemNoteConfig:
     """Configuration for RemNote integration."""
     default_folder: str = "ML System Design"
     include_hierarchy: bool = True
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class CardsPerConceptConfig:
     """Configuration for cards per concept generation."""
     min: int = 3
     max: int = 5
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class CardTypesConfig:
     """Configuration for enabled card types."""
     concept: bool = True
@@ -54,38 +191,56 @@ class CardTypesConfig:
     descriptor: bool = True
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class DifficultyDistributionConfig:
     """Configuration for difficulty distribution."""
     beginner: float = 0.3
     intermediate: float = 0.5
     advanced: float = 0.2
+    total: float = field(init=False, repr=False, compare=False)
     
     def __post_init__(self):
-        """Validate that distribution sums to 1.0."""
+        """Record the distribution total and warn if it does not sum to 1.0."""
         total = self.beginner + self.intermediate + self.advanced
-        if abs(total - 1.0) > 0.01:  # Allow small floating point differences
+        object.__setattr__(self, 'total', total)
+        if abs(total - 1.0) > _DIFFICULTY_TOLERANCE:
             logger.warning(f"Difficulty distribution sums to {total}, not 1.0")
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class GenerationConfig:
     """Configuration for card generation."""
     cards_per_concept: CardsPerConceptConfig = field(default_factory=CardsPerConceptConfig)
     card_types: CardTypesConfig = field(default_factory=CardTypesConfig)
     include_examples: bool = True
+    multi_output: bool = False
+    stream: bool = False
+    pack_size: int = 1
     difficulty_distribution: DifficultyDistributionConfig = field(default_factory=DifficultyDistributionConfig)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class OutputConfig:
     """Configuration for output formatting."""
     format: str = "remnote_text"
     include_stats: bool = True
     include_metadata: bool = False
+    durable_writes: bool = False
+
 
+@dataclass(slots=True, frozen=True)
+class CacheConfig:
+    """Configuration for the LLM response cache."""
+    enabled: bool = True
+    directory: Optional[str] = "~/.remnote_fc/cache"
+    ttl_seconds: Optional[float] = 604800
+    max_entries: int = 1024
+    always: bool = True
+    semantic: bool = False
+    semantic_threshold: float = 0.92
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class PromptsConfig:
     """Configuration for prompts."""
     system_prompt: str = """You are an expert in creating spaced repetition flashcards.
@@ -93,14 +248,206 @@ Generate cards that are atomic, clear, and testable.
 Focus on understanding over memorization."""
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class AppConfig:
     """Main application configuration."""
     llm: LLMConfig
     remnote: RemNoteConfig = field(default_factory=RemNoteConfig)
     generation: GenerationConfig = field(default_factory=GenerationConfig)
     output: OutputConfig = field(default_factory=OutputConfig)
+    cache: CacheConfig = field(default_factory=CacheConfig)
     prompts: PromptsConfig = field(default_factory=PromptsConfig)
+    # Set by load_config when the schema already enforced the per-field checks
+    _validated: bool = field(default=False, init=False, repr=False, compare=False)
+
+
+def _from_dict(cls, data: Optional[Dict[str, Any]]):
+    """
+    Build a config dataclass from a raw dictionary.
+    
+    Nested dataclass fields are built recursively (from an empty dict when
+    the section is missing). Missing scalar keys fall back to the field
+    defaults and unknown keys are ignored.
+    
+    Args:
+        cls: Config dataclass to build
+        data: Raw section from the YAML file, possibly None
+        
+    Returns:
+        Instance of ``cls``
+    """
+    data = data or {}
+    kwargs = {}
+    for f in fields(cls):
+        if not f.init:
+            continue
+        if is_dataclass(f.type):
+            kwargs[f.name] = _from_dict(f.type, data.get(f.name))
+        elif f.name in data:
+            kwargs[f.name] = data[f.name]
+    return cls(**kwargs)
+
+
+def _to_dict(config) -> Dict[str, Any]:
+    """
+    Convert a config dataclass back to the raw dictionary layout.
+    
+    Unlike ``dataclasses.asdict`` this skips derived (``init=False``)
+    fields, so the result round-trips through ``_from_dict``.
+    """
+    result = {}
+    for f in fields(config):
+        if f.init:
+            value = getattr(config, f.name)
+            result[f.name] = _to_dict(value) if is_dataclass(value) else value
+    return result
+
+
+def _template_lines(cls, path: Tuple[str, ...], depth: int, lines: list) -> None:
+    """Append the template lines for one config dataclass, recursing into sections."""
+    indent = "  " * depth
+    for f in fields(cls):
+        if not f.init:
+            continue
+        key = path + (f.name,)
+        if is_dataclass(f.type):
+            lines.append(f"{indent}{f.name}:")
+            _template_lines(f.type, key, depth + 1, lines)
+        else:
+            lines.append(f"{indent}{f.name}: {{{'__'.join(key)}}}")
+
+
+@lru_cache(maxsize=None)
+def _save_template() -> str:
+    """
+    Build the YAML text template used by ``save_config``, once per process.
+    
+    The layout follows the config dataclasses; each scalar becomes a
+    ``{section__field}`` placeholder filled in by ``_template_values``.
+    """
+    lines = []
+    _template_lines(AppConfig, (), 0, lines)
+    return "\n".join(lines) + "\n"
+
+
+def _yaml_scalar(value: Any) -> Optional[str]:
+    """Render a scalar as YAML, or return None if it needs the full emitter."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        text = repr(value)
+        # YAML 1.1 only resolves plain floats that contain a dot and no exponent
+        return text if '.' in text and 'e' not in text else None
+    if isinstance(value, str):
+        # A JSON string is a valid double-quoted YAML scalar
+        return json.dumps(value, ensure_ascii=False)
+    return None
+
+
+def _template_values(config_dict: Dict[str, Any], prefix: str = "",
+                     out: Optional[Dict[str, str]] = None) -> Optional[Dict[str, str]]:
+    """
+    Flatten a config dictionary into rendered placeholder values for ``_save_template``.
+    
+    Returns:
+        Mapping of placeholder name to YAML text, or None if any value
+        cannot be rendered as a simple scalar
+    """
+    if out is None:
+        out = {}
+    for key, value in config_dict.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            if _template_values(value, f"{name}__", out) is None:
+                return None
+        else:
+            rendered = _yaml_scalar(value)
+            if rendered is None:
+                return None
+            out[name] = rendered
+    return out
+
+
+def _compile_validator(schema: Optional[Dict[str, Any]]):
+    """
+    Check the schema once and build a reusable validator for it.
+    
+    ``jsonschema.validate`` re-checks the schema and creates a new
+    validator on every call; building it here keeps repeated loads cheap.
+    
+    Args:
+        schema: Loaded schema, or None when validation is disabled
+    
+    Returns:
+        Validator instance, or None if there is no usable schema
+    """
+    if not schema:
+        return None
+    
+    import jsonschema
+    validator_class = jsonschema.validators.validator_for(schema)
+    try:
+        validator_class.check_schema(schema)
+    except jsonschema.SchemaError as e:
+        logger.error(f"Invalid configuration schema, validation disabled: {e.message}")
+        return None
+    return validator_class(schema)
+
+
+def _compile_fast_validator(validator):
+    """
+    Compile the checked schema with fastjsonschema, if it is installed.
+    
+    Args:
+        validator: jsonschema validator built by ``_compile_validator``
+    
+    Returns:
+        Generated validation function, or None to use the jsonschema validator
+    """
+    if validator is None:
+        return None
+    try:
+        # Optional code-generating validator, several times faster than jsonschema
+        import fastjsonschema
+    except ImportError:
+        return None
+    try:
+        # use_default=False: validation must not fill schema defaults into the config
+        return fastjsonschema.compile(validator.schema, use_default=False)
+    except fastjsonschema.JsonSchemaDefinitionException as e:
+        logger.warning(f"fastjsonschema cannot compile the schema, using jsonschema: {e}")
+        return None
+
+
+@lru_cache(maxsize=8)
+def _load_schema_bundle(schema_path: str, mtime_ns: int) -> Tuple[Optional[Dict[str, Any]], Any, Any]:
+    """
+    Load a schema and compile its validators once per process.
+    
+    Keyed on the file's modification time like ``_read_yaml_cached``, so
+    every ConfigurationManager using the same schema shares one validator.
+    
+    Args:
+        schema_path: Schema file to load
+        mtime_ns: Modification time of the file, used as part of the cache key
+        
+    Returns:
+        Tuple of (schema, jsonschema validator, fastjsonschema function);
+        entries are None when unavailable
+    """
+    try:
+        # The schema is only read, so the cached object is shared
+        schema = _read_yaml_cached(schema_path, mtime_ns)
+    except Exception as e:
+        logger.error(f"Failed to load schema: {e}")
+        return None, None, None
+    
+    validator = _compile_validator(schema)
+    return schema, validator, _compile_fast_validator(validator)
 
 
 class ConfigurationManager:
@@ -127,8 +474,17 @@ class ConfigurationManager:
         Args:
             schema_path: Path to configuration schema file
         """
-        self.schema_path = schema_path or Path(__file__).parent.parent / "config" / "app_config_schema.yaml"
-        self.schema = self._load_schema()
+        _ensure_env_loaded()
+        self.schema_path = schema_path or _DEFAULT_SCHEMA_PATH
+        try:
+            mtime_ns = os.stat(self.schema_path).st_mtime_ns
+        except FileNotFoundError:
+            logger.warning(f"Schema file not found: {self.schema_path}")
+            self.schema, self._validator, self._fast_validator = None, None, None
+        else:
+            self.schema, self._validator, self._fast_validator = _load_schema_bundle(
+                str(self.schema_path), mtime_ns
+            )
     
     def load_config(self, config_path: Union[str, Path]) -> AppConfig:
         """
@@ -149,173 +505,80 @@ class ConfigurationManager:
             >>> print(config.llm.provider)
             'anthropic'
         """
-        config_path = Path(config_path)
+        import yaml
         
-        if not config_path.exists():
-            raise FileNotFoundError(f"Configuration file not found: {config_path}")
+        config_path = Path(config_path)
         
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                raw_config = yaml.safe_load(f)
+            # Copy, since environment overrides are applied in place below
+            raw_config = _read_yaml(config_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Configuration file not found: {config_path}")
         except yaml.YAMLError as e:
             raise ValueError(f"Invalid YAML in configuration file: {e}")
         
         # Validate against schema
-        if self.schema:
+        if self._fast_validator is not None:
+            import fastjsonschema
             try:
-                jsonschema.validate(raw_config, self.schema)
-            except jsonschema.ValidationError as e:
+                self._fast_validator(raw_config)
+            except fastjsonschema.JsonSchemaException as e:
                 raise ValueError(f"Configuration validation failed: {e.message}")
+        elif self._validator is not None:
+            import jsonschema
+            error = jsonschema.exceptions.best_match(self._validator.iter_errors(raw_config))
+            if error is not None:
+                raise ValueError(f"Configuration validation failed: {error.message}")
         
         # Apply environment variable overrides
-        self._apply_env_overrides(raw_config)
+        overrides = self._apply_env_overrides(raw_config)
         
         # Convert to typed configuration
-        return self._create_typed_config(raw_config)
-    
-    def _load_schema(self) -> Optional[Dict[str, Any]]:
-        """Load configuration schema for validation."""
-        if not self.schema_path.exists():
-            logger.warning(f"Schema file not found: {self.schema_path}")
-            return None
+        config = self._create_typed_config(raw_config)
         
-        try:
-            with open(self.schema_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
-        except Exception as e:
-            logger.error(f"Failed to load schema: {e}")
-            return None
+        # Overrides are applied after the schema check, so only untouched configs are trusted
+        if (self._fast_validator is not None or self._validator is not None) and not overrides:
+            object.__setattr__(config, '_validated', True)
+        return config
     
-    def _apply_env_overrides(self, config: Dict[str, Any]) -> None:
+    def _apply_env_overrides(self, config: Dict[str, Any]) -> int:
         """
         Apply environment variable overrides to configuration.
         
         Environment variables follow the pattern:
-        REMNOTE_LLM_PROVIDER, REMNOTE_LLM_MODEL, etc.
-        """
-        env_mappings = {
-            'REMNOTE_LLM_PROVIDER': ['llm', 'provider'],
-            'REMNOTE_LLM_MODEL': ['llm', 'model'],
-            'REMNOTE_LLM_TEMPERATURE': ['llm', 'temperature'],
-            'REMNOTE_LLM_MAX_TOKENS': ['llm', 'max_tokens'],
-            'REMNOTE_OUTPUT_FORMAT': ['output', 'format'],
-            'OPENAI_API_KEY': None,  # Special handling
-            'ANTHROPIC_API_KEY': None,  # Special handling
-        }
+        REMNOTE_LLM_PROVIDER, REMNOTE_LLM_MODEL, etc. (see ``_ENV_TABLE``).
         
-        for env_var, config_path in env_mappings.items():
-            value = os.getenv(env_var)
-            if value and config_path:
-                # Navigate to the nested config location
-                current = config
-                for key in config_path[:-1]:
-                    if key not in current:
-                        current[key] = {}
-                    current = current[key]
-                
-                # Convert value to appropriate type
-                converted_value = self._convert_env_value(value, config_path)
-                current[config_path[-1]] = converted_value
+        Returns:
+            Number of overrides applied
+        """
+        applied = 0
+        for env_var, setter, convert in _ENV_SETTERS:
+            value = _cached_env(env_var)
+            if value:
+                setter(config, convert(value))
+                applied += 1
                 
                 logger.info(f"Applied environment override: {env_var}")
-    
-    def _convert_env_value(self, value: str, config_path: list) -> Union[str, int, float, bool]:
-        """Convert environment variable string to appropriate type."""
-        # Type conversion based on configuration path
-        if 'temperature' in config_path:
-            return float(value)
-        elif 'max_tokens' in config_path or 'retry_attempts' in config_path:
-            return int(value)
-        elif 'retry_delay' in config_path:
-            return float(value)
-        elif value.lower() in ('true', 'false'):
-            return value.lower() == 'true'
-        else:
-            return value
+        return applied
     
     def _create_typed_config(self, raw_config: Dict[str, Any]) -> AppConfig:
         """Convert raw configuration dictionary to typed AppConfig object."""
         try:
-            # Extract LLM configuration
-            llm_data = raw_config.get('llm', {})
-            llm_config = LLMConfig(
-                provider=llm_data.get('provider', 'anthropic'),
-                model=llm_data.get('model'),
-                temperature=llm_data.get('temperature', 0.3),
-                max_tokens=llm_data.get('max_tokens', 2000),
-                retry_attempts=llm_data.get('retry_attempts', 3),
-                retry_delay=llm_data.get('retry_delay', 2.0)
-            )
-            
-            # Extract RemNote configuration
-            remnote_data = raw_config.get('remnote', {})
-            remnote_config = RemNoteConfig(
-                default_folder=remnote_data.get('default_folder', 'ML System Design'),
-                include_hierarchy=remnote_data.get('include_hierarchy', True)
-            )
-            
-            # Extract generation configuration
-            gen_data = raw_config.get('generation', {})
-            
-            cards_per_concept_data = gen_data.get('cards_per_concept', {})
-            cards_per_concept = CardsPerConceptConfig(
-                min=cards_per_concept_data.get('min', 3),
-                max=cards_per_concept_data.get('max', 5)
-            )
-            
-            card_types_data = gen_data.get('card_types', {})
-            card_types = CardTypesConfig(
-                concept=card_types_data.get('concept', True),
-                basic=card_types_data.get('basic', True),
-                cloze=card_types_data.get('cloze', True),
-                descriptor=card_types_data.get('descriptor', True)
-            )
-            
-            difficulty_data = gen_data.get('difficulty_distribution', {})
-            difficulty_distribution = DifficultyDistributionConfig(
-                beginner=difficulty_data.get('beginner', 0.3),
-                intermediate=difficulty_data.get('intermediate', 0.5),
-                advanced=difficulty_data.get('advanced', 0.2)
-            )
-            
-            generation_config = GenerationConfig(
-                cards_per_concept=cards_per_concept,
-                card_types=card_types,
-                include_examples=gen_data.get('include_examples', True),
-                difficulty_distribution=difficulty_distribution
-            )
-            
-            # Extract output configuration
-            output_data = raw_config.get('output', {})
-            output_config = OutputConfig(
-                format=output_data.get('format', 'remnote_text'),
-                include_stats=output_data.get('include_stats', True),
-                include_metadata=output_data.get('include_metadata', False)
-            )
-            
-            # Extract prompts configuration
-            prompts_data = raw_config.get('prompts', {})
-            prompts_config = PromptsConfig(
-                system_prompt=prompts_data.get('system_prompt', PromptsConfig.system_prompt)
-            )
-            
-            return AppConfig(
-                llm=llm_config,
-                remnote=remnote_config,
-                generation=generation_config,
-                output=output_config,
-                prompts=prompts_config
-            )
-            
+            return _from_dict(AppConfig, raw_config)
         except Exception as e:
             raise ValueError(f"Failed to create typed configuration: {e}")
     
-    def validate_config(self, config: AppConfig) -> bool:
+    def validate_config(self, config: AppConfig, all_errors: bool = False) -> bool:
         """
         Validate a configuration object for logical consistency.
         
+        Field ranges and enums already enforced by the schema are skipped for
+        configs returned by ``load_config``; cross-field invariants are
+        always checked.
+        
         Args:
             config: Configuration to validate
+            all_errors: Collect every error instead of stopping at the first
             
         Returns:
             True if configuration is valid
@@ -324,38 +587,41 @@ class ConfigurationManager:
             ValueError: If configuration is invalid
         """
         errors = []
+        for error in self._config_errors(config):
+            errors.append(error)
+            if not all_errors:
+                break
         
-        # Validate LLM configuration
-        if config.llm.provider not in ['openai', 'anthropic']:
-            errors.append(f"Invalid LLM provider: {config.llm.provider}")
-        
-        if config.llm.temperature < 0 or config.llm.temperature > 2:
-            errors.append(f"Invalid temperature: {config.llm.temperature}")
+        if errors:
+            raise ValueError("Configuration validation failed:\n" + "\n".join(f"- {error}" for error in errors))
         
-        if config.llm.max_tokens < 100 or config.llm.max_tokens > 8000:
-            errors.append(f"Invalid max_tokens: {config.llm.max_tokens}")
+        return True
+    
+    def _config_errors(self, config: AppConfig):
+        """Yield validation error messages for ``config`` in check order."""
+        if not config._validated:
+            # Validate LLM configuration
+            if config.llm.provider not in ['openai', 'anthropic']:
+                yield f"Invalid LLM provider: {config.llm.provider}"
+            
+            if config.llm.temperature < 0 or config.llm.temperature > 2:
+                yield f"Invalid temperature: {config.llm.temperature}"
+            
+            if config.llm.max_tokens < 100 or config.llm.max_tokens > 8000:
+                yield f"Invalid max_tokens: {config.llm.max_tokens}"
         
         # Validate generation configuration
         if config.generation.cards_per_concept.min > config.generation.cards_per_concept.max:
-            errors.append("Minimum cards per concept cannot exceed maximum")
+            yield "Minimum cards per concept cannot exceed maximum"
         
-        # Validate difficulty distribution
-        total_difficulty = (
-            config.generation.difficulty_distribution.beginner +
-            config.generation.difficulty_distribution.intermediate +
-            config.generation.difficulty_distribution.advanced
-        )
-        if abs(total_difficulty - 1.0) > 0.01:
-            errors.append(f"Difficulty distribution must sum to 1.0, got {total_difficulty}")
+        # Validate difficulty distribution (total is computed once at construction)
+        total_difficulty = config.generation.difficulty_distribution.total
+        if abs(total_difficulty - 1.0) > _DIFFICULTY_TOLERANCE:
+            yield f"Difficulty distribution must sum to 1.0, got {total_difficulty}"
         
         # Validate output format
-        if config.output.format not in ['remnote_text', 'remnote_api']:
-            errors.append(f"Invalid output format: {config.output.format}")
-        
-        if errors:
-            raise ValueError("Configuration validation failed:\n" + "\n".join(f"- {error}" for error in errors))
-        
-        return True
+        if not config._validated and config.output.format not in ['remnote_text', 'remnote_api']:
+            yield f"Invalid output format: {config.output.format}"
     
     def save_config(self, config: AppConfig, output_path: Union[str, Path]) -> None:
         """
@@ -367,53 +633,19 @@ class ConfigurationManager:
         """
         output_path = Path(output_path)
         
-        # Convert config to dictionary
-        config_dict = {
-            'llm': {
-                'provider': config.llm.provider,
-                'model': config.llm.model,
-                'temperature': config.llm.temperature,
-                'max_tokens': config.llm.max_tokens,
-                'retry_attempts': config.llm.retry_attempts,
-                'retry_delay': config.llm.retry_delay
-            },
-            'remnote': {
-                'default_folder': config.remnote.default_folder,
-                'include_hierarchy': config.remnote.include_hierarchy
-            },
-            'generation': {
-                'cards_per_concept': {
-                    'min': config.generation.cards_per_concept.min,
-                    'max': config.generation.cards_per_concept.max
-                },
-                'card_types': {
-                    'concept': config.generation.card_types.concept,
-                    'basic': config.generation.card_types.basic,
-                    'cloze': config.generation.card_types.cloze,
-                    'descriptor': config.generation.card_types.descriptor
-                },
-                'include_examples': config.generation.include_examples,
-                'difficulty_distribution': {
-                    'beginner': config.generation.difficulty_distribution.beginner,
-                    'intermediate': config.generation.difficulty_distribution.intermediate,
-                    'advanced': config.generation.difficulty_distribution.advanced
-                }
-            },
-            'output': {
-                'format': config.output.format,
-                'include_stats': config.output.include_stats,
-                'include_metadata': config.output.include_metadata
-            },
-            'prompts': {
-                'system_prompt': config.prompts.system_prompt
-            }
-        }
+        config_dict = _to_dict(config)
+        values = _template_values(config_dict)
         
         # Create directory if it doesn't exist
         output_path.parent.mkdir(parents=True, exist_ok=True)
         
         with open(output_path, 'w', encoding='utf-8') as f:
-            yaml.dump(config_dict, f, default_flow_style=False, allow_unicode=True)
+            if values is not None:
+                # Fixed layout: fill the precomputed template instead of running the YAML emitter
+                f.write(_save_template().format_map(values))
+            else:
+                import yaml
+                yaml.dump(config_dict, f, Dumper=_yaml_classes()[1], default_flow_style=False, allow_unicode=True)
         
         logger.info(f"Configuration saved to {output_path}")
 
@@ -422,12 +654,19 @@ def load_default_config() -> AppConfig:
     """
     Load default configuration from the default location.
     
+    The result is reused until the file's modification time changes; the
+    config dataclasses are frozen, so use ``dataclasses.replace`` to derive
+    a modified copy.
+    
     Returns:
         Default AppConfig object
     """
-    config_manager = ConfigurationManager()
-    default_config_path = Path(__file__).parent.parent / "config" / "config.yaml"
-    return config_manager.load_config(default_config_path)
+    global _DEFAULT_CONFIG
+    key = (str(_DEFAULT_CONFIG_PATH), os.stat(_DEFAULT_CONFIG_PATH).st_mtime_ns)
+    if _DEFAULT_CONFIG is None or _DEFAULT_CONFIG[0] != key:
+        config_manager = ConfigurationManager()
+        _DEFAULT_CONFIG = (key, config_manager.load_config(_DEFAULT_CONFIG_PATH))
+    return _DEFAULT_CONFIG[1]
 
 
 def get_api_key(provider: str) -> Optional[str]:
@@ -440,13 +679,11 @@ def get_api_key(provider: str) -> Optional[str]:
     Returns:
         API key string or None if not found
     """
-    if provider.lower() == 'openai':
-        return os.getenv('OPENAI_API_KEY')
-    elif provider.lower() == 'anthropic':
-        return os.getenv('ANTHROPIC_API_KEY')
-    else:
+    env_var = _API_KEY_ENV.get(provider.lower())
+    if env_var is None:
         logger.warning(f"Unknown provider for API key lookup: {provider}")
         return None
+    return _cached_env(env_var)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,304 @@
+"""
+Prompt Response Cache for LLM Clients
+
+This module provides an exact-match cache for LLM responses so that re-running
+the generator on unchanged content does not pay for byte-identical prompts again.
+Entries are keyed by a SHA-256 hash of the model, temperature and prompt, kept in
+an in-memory LRU and optionally persisted to a SQLite file on disk. An optional
+semantic layer serves paraphrased prompts by embedding similarity.
+"""
+
+from typing import Optional, Dict, Any, Tuple, Union
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PromptCache:
+    """
+    Two-level (memory + disk) cache for LLM responses.
+
+    Only the hash of the prompt is stored as the key, never the prompt text.
+    The cache is thread-safe so it can be shared by requests running in
+    worker threads.
+
+    Example:
+        >>> cache = PromptCache("~/.remnote_fc/cache", ttl_seconds=86400)
+        >>> key = PromptCache.make_key("gpt-4", 0.0, "Define caching")
+        >>> cache.set(key, "Caching :: Storing results for reuse")
+        >>> cache.get(key)
+        'Caching :: Storing results for reuse'
+    """
+
+    def __init__(self, directory: Optional[Union[str, Path]] = None, max_entries: int = 1024,
+                 ttl_seconds: Optional[float] = None, always: bool = False):
+        """
+        Initialize the cache.
+
+        Args:
+            directory: Directory for the on-disk store (memory only if None)
+            max_entries: Maximum number of entries kept in memory
+            ttl_seconds: Time-to-live for entries (no expiry if None)
+            always: Cache responses at any temperature, not just deterministic ones
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.always = always
+        self._memory: "OrderedDict[str, Tuple[Optional[float], str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        if directory is not None:
+            path = Path(directory).expanduser()
+            path.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path / "responses.sqlite3"), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, temperature: float, prompt: str,
+                 response_format: Optional[Dict[str, Any]] = None,
+                 system: Optional[str] = None) -> str:
+        """
+        Build the cache key for a request.
+
+        Args:
+            model: Model name
+            temperature: Sampling temperature
+            prompt: Full prompt text, matched exactly
+            response_format: Structured output hint, if any
+            system: System prompt sent with the request, if any
+
+        Returns:
+            Hex SHA-256 digest identifying the request
+        """
+        raw = f"{model}|{temperature}|{system}|{prompt}" if system else f"{model}|{temperature}|{prompt}"
+        if response_format:
+            raw += f"|{sorted(response_format.items())}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def should_cache(self, temperature: float) -> bool:
+        """Return True if responses at this temperature may be served from cache."""
+        return self.always or temperature == 0
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Key produced by :meth:`make_key`
+
+        Returns:
+            Cached response text, or None on a miss or expired entry
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+
+            if self._db is None:
+                return None
+
+            row = self._db.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+
+            self._remember(key, expires_at, value)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Store a response.
+
+        Args:
+            key: Key produced by :meth:`make_key`
+            value: Response text to cache
+        """
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._remember(key, expires_at, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at)
+                )
+                self._db.commit()
+
+    def clear(self) -> None:
+        """Remove all cached entries from memory and disk."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+        logger.info("LLM response cache cleared")
+
+    def close(self) -> None:
+        """Close the on-disk store."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: str, expires_at: Optional[float], value: str) -> None:
+        """Insert into the in-memory LRU, evicting the oldest entry if full."""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+class SemanticCache:
+    """
+    Embedding-similarity cache for paraphrased prompts.
+
+    Prompts are embedded with a local sentence-transformers model and stored in
+    an HNSW cosine index. A lookup is a hit when the nearest stored prompt has
+    similarity at or above ``threshold``, was made with the same model settings,
+    and names the same ``**Topic:**`` verbatim. The topic guard keeps
+    near-identical prompts about different subjects from sharing answers.
+
+    Requires the optional ``sentence-transformers`` and ``hnswlib`` packages.
+    Entries are kept in memory only.
+    """
+
+    DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+    _TOPIC_RE = re.compile(r"^\*\*Topic:\*\*\s*(.+?)\s*$", re.MULTILINE)
+
+    def __init__(self, threshold: float = 0.92, ttl_seconds: Optional[float] = None,
+                 model_name: str = DEFAULT_MODEL, max_entries: int = 10_000, always: bool = False):
+        """
+        Initialize the cache.
+
+        Args:
+            threshold: Minimum cosine similarity for a hit
+            ttl_seconds: Time-to-live for entries (no expiry if None)
+            model_name: sentence-transformers model used for embeddings
+            max_entries: Initial index capacity (grown on demand)
+            always: Cache responses at any temperature, not just deterministic ones
+
+        Raises:
+            ImportError: If sentence-transformers or hnswlib is not installed
+        """
+        try:
+            import hnswlib
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                f"Semantic cache requires sentence-transformers and hnswlib "
+                f"(pip install sentence-transformers hnswlib): {e}"
+            ) from e
+
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.always = always
+        self._hnswlib = hnswlib
+        self._model_name = model_name
+        self._encoder_cls = SentenceTransformer
+        self._encoder = None  # Loaded on first use; the model download is large
+        self._index = None
+        self._capacity = max_entries
+        self._entries: list = []  # label -> (namespace, topic, expires_at, response)
+        self._lock = threading.Lock()
+
+    def should_cache(self, temperature: float) -> bool:
+        """Return True if responses at this temperature may be served from cache."""
+        return self.always or temperature == 0
+
+    @classmethod
+    def topic_of(cls, prompt: str) -> Optional[str]:
+        """Extract the ``**Topic:**`` line from a prompt, if present."""
+        match = cls._TOPIC_RE.search(prompt)
+        return match.group(1) if match else None
+
+    def get(self, namespace: str, prompt: str) -> Optional[str]:
+        """
+        Look up a response for a semantically equivalent prompt.
+
+        Args:
+            namespace: Model settings the response must have been produced with
+            prompt: Prompt text to compare, without any static template prefix
+
+        Returns:
+            Cached response text, or None on a miss
+        """
+        topic = self.topic_of(prompt)
+        if topic is None:
+            return None
+
+        with self._lock:
+            if not self._entries:
+                return None
+            vector = self._embed(prompt)
+            k = min(5, len(self._entries))
+            labels, distances = self._index.knn_query(vector, k=k)
+            now = time.time()
+            for label, distance in zip(labels[0], distances[0]):
+                if 1.0 - float(distance) < self.threshold:
+                    break
+                entry_namespace, entry_topic, expires_at, response = self._entries[int(label)]
+                if entry_namespace != namespace or entry_topic != topic:
+                    continue
+                if expires_at is not None and expires_at <= now:
+                    continue
+                return response
+        return None
+
+    def set(self, namespace: str, prompt: str, value: str) -> None:
+        """
+        Store a response for later similarity lookups.
+
+        Args:
+            namespace: Model settings the response was produced with
+            prompt: Prompt text to compare, without any static template prefix
+            value: Response text to cache
+        """
+        topic = self.topic_of(prompt)
+        if topic is None:
+            return
+
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            vector = self._embed(prompt)
+            if self._index is None:
+                self._index = self._hnswlib.Index(space='cosine', dim=vector.shape[-1])
+                self._index.init_index(max_elements=self._capacity, ef_construction=200, M=16)
+            elif len(self._entries) >= self._capacity:
+                self._capacity *= 2
+                self._index.resize_index(self._capacity)
+            self._index.add_items(vector, [len(self._entries)])
+            self._entries.append((namespace, topic, expires_at, value))
+
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        with self._lock:
+            self._index = None
+            self._entries = []
+
+    def _embed(self, prompt: str):
+        """Embed a prompt as a normalized vector."""
+        if self._encoder is None:
+            self._encoder = self._encoder_cls(self._model_name)
+        return self._encoder.encode([prompt], normalize_embeddings=True)
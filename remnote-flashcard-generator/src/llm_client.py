@@ -5,22 +5,45 @@ This module provides a unified interface for different LLM providers (OpenAI and
 handling API calls, retry logic, token counting, and rate limiting.
 """
 
-from typing import List, Dict, Optional, Union, Any
+from typing import List, Dict, Optional, Union, Any, AsyncIterator, Iterator
 from abc import ABC, abstractmethod
 import os
+import json
 import time
+import hashlib
+import random
 import logging
+import threading
 from dataclasses import dataclass
 from enum import Enum
 import asyncio
+from functools import lru_cache
 from dotenv import load_dotenv
 from rich.console import Console
 
-# Load environment variables
-load_dotenv()
+try:
+    from .llm_cache import PromptCache, SemanticCache
+except ImportError:
+    # Fallback for standalone execution
+    from llm_cache import PromptCache, SemanticCache
+
+try:
+    # Optional faster JSON codec for batch files and packed responses
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:
+    _loads = json.loads
+    
+    def _dumps(obj: Any) -> bytes:
+        """Serialize to compact UTF-8 JSON, matching ``orjson.dumps``."""
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+# Load environment variables unless the caller manages them
+if os.getenv("REMNOTE_SKIP_DOTENV") is None:
+    load_dotenv()
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 console = Console()
 
@@ -42,6 +65,8 @@ class LLMConfig:
     retry_attempts: int = 3
     retry_delay: float = 2.0
     timeout: float = 30.0
+    rpm: Optional[float] = None
+    tpm: Optional[float] = None
 
 
 class LLMError(Exception):
@@ -49,9 +74,40 @@ class LLMError(Exception):
     pass
 
 
+# Environment variable holding each provider's API key, and the name used in errors
+_API_KEY_ENV = {
+    LLMProvider.OPENAI: ("OPENAI_API_KEY", "OpenAI"),
+    LLMProvider.ANTHROPIC: ("ANTHROPIC_API_KEY", "Anthropic"),
+}
+
+
+@lru_cache(maxsize=None)
+def _api_key(provider: LLMProvider) -> str:
+    """
+    Resolve a provider's API key from the environment once per process.
+    
+    Args:
+        provider: LLM provider
+        
+    Returns:
+        The API key
+        
+    Raises:
+        LLMError: If the key is not set (failures are not cached)
+    """
+    env_var, name = _API_KEY_ENV[provider]
+    api_key = os.getenv(env_var)
+    if not api_key:
+        raise LLMError(f"{name} API key not found in environment or kwargs")
+    return api_key
+
+
 class RateLimitError(LLMError):
     """Raised when rate limit is exceeded."""
-    pass
+    
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 
 class TokenLimitError(LLMError):
@@ -59,6 +115,204 @@ class TokenLimitError(LLMError):
     pass
 
 
+SYSTEM_PROMPT = "You are a helpful assistant that generates high-quality educational flashcards."
+
+# Tokens held back from the completion budget for chat-format message overhead
+_BUDGET_MARGIN = 8
+
+def _rate_limits(config: LLMConfig) -> tuple:
+    """
+    Resolve the requests and tokens per minute budget for a client.
+    
+    Limits apply only when configured; provider limits depend on the account
+    tier, so no default is assumed. None or 0 disables a limit.
+    
+    Returns:
+        Tuple of (requests per minute, tokens per minute), either may be None
+    """
+    return config.rpm or None, config.tpm or None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """
+    Read the server's requested wait from an SDK error's response headers.
+    
+    Args:
+        error: Exception raised by the provider SDK
+        
+    Returns:
+        Seconds to wait, or None if the response carries no usable hint
+    """
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        if headers.get('retry-after-ms') is not None:
+            return float(headers['retry-after-ms']) / 1000.0
+        if headers.get('retry-after') is not None:
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        # HTTP-date values are rare for these APIs; fall back to backoff
+        pass
+    return None
+
+
+# Upper bound on a single retry backoff, in seconds
+_MAX_BACKOFF = 60.0
+
+# Keep-alive pool shared by every request of one client
+_HTTP_LIMITS = {"max_keepalive_connections": 32, "max_connections": 64}
+
+
+def _build_http_client(timeout: float, asynchronous: bool = False) -> Optional[Any]:
+    """
+    Build a pooled ``httpx`` client to hand to the provider SDK.
+    
+    HTTP/2 is enabled when the optional ``h2`` package is installed.
+    
+    Args:
+        timeout: Default request timeout in seconds
+        asynchronous: Build an ``httpx.AsyncClient`` instead of ``httpx.Client``
+        
+    Returns:
+        The HTTP client, or None when httpx is unavailable (the SDK default is used)
+    """
+    try:
+        import httpx
+    except ImportError:
+        return None
+    
+    client_class = httpx.AsyncClient if asynchronous else httpx.Client
+    limits = httpx.Limits(**_HTTP_LIMITS)
+    try:
+        return client_class(limits=limits, http2=True, timeout=timeout)
+    except ImportError:
+        # http2=True needs the h2 package
+        return client_class(limits=limits, timeout=timeout)
+
+
+@lru_cache(maxsize=16)
+def _get_encoding(model: str):
+    """
+    Load the tiktoken encoding for a model once per process.
+    
+    Args:
+        model: OpenAI model name
+        
+    Returns:
+        The model's encoding, or ``cl100k_base`` when tiktoken does not know it
+    """
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        logger.warning("No tokenizer found for %s, using cl100k_base", model)
+        return tiktoken.get_encoding("cl100k_base")
+
+
+@lru_cache(maxsize=4096)
+def _count_tokens(text: str, model: str) -> int:
+    """
+    Token count of ``text`` under ``model``'s encoding, memoized.
+    
+    Templated prompts and retries re-count identical strings; keying on the
+    text itself (whose hash Python caches) makes repeats a dict lookup.
+    """
+    return len(_get_encoding(model).encode(text))
+
+
+def _pack_prompts(prompts: List[str]) -> str:
+    """Combine prompts into one numbered request for a JSON list of answers."""
+    parts = [
+        f"Complete each of the following {len(prompts)} requests independently. "
+        f"Respond with a single JSON object {{\"responses\": [...]}} holding exactly "
+        f"{len(prompts)} strings, where item i is the complete answer to request i."
+    ]
+    for number, prompt in enumerate(prompts, 1):
+        parts.append(f"### Request {number}\n{prompt}")
+    return "\n\n".join(parts)
+
+
+def _unpack_responses(response: str, count: int) -> Optional[List[str]]:
+    """Extract the answers list from a packed response, or None if it is malformed."""
+    try:
+        data = _loads(response)
+    except ValueError:  # json and orjson decode errors both subclass ValueError
+        return None
+    responses = data.get("responses") if isinstance(data, dict) else data
+    if (not isinstance(responses, list) or len(responses) != count
+            or not all(isinstance(item, str) for item in responses)):
+        return None
+    return responses
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter for LLM requests.
+
+    Tokens refill continuously at ``rate_per_minute / 60`` per second up to
+    ``capacity``. Each acquisition reserves its tokens immediately (the balance
+    may go negative) and then sleeps until the reservation is covered, so
+    concurrent callers are spaced out in arrival order without holding a lock
+    while they wait.
+
+    Example:
+        >>> limiter = RateLimiter(rate_per_minute=500)
+        >>> await limiter.acquire()
+    """
+
+    def __init__(self, rate_per_minute: Optional[float] = None, capacity: Optional[float] = None):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            rate_per_minute: Sustained request rate; None or 0 disables limiting
+            capacity: Maximum burst size (defaults to one second of refill)
+        """
+        self.rate_per_minute = rate_per_minute
+        self._rate = rate_per_minute / 60.0 if rate_per_minute else 0.0
+        self.capacity = capacity if capacity is not None else max(1.0, self._rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, cost: float = 1.0) -> float:
+        """Reserve tokens and return how long the caller must wait for them."""
+        if not self._rate:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            self._tokens -= cost
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self._rate
+
+    async def acquire(self, cost: float = 1.0) -> None:
+        """
+        Wait until ``cost`` tokens are available.
+
+        Args:
+            cost: Number of tokens consumed by the request
+        """
+        delay = self._reserve(cost)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def wait(self, cost: float = 1.0) -> None:
+        """
+        Blocking variant of :meth:`acquire` for synchronous callers.
+
+        Args:
+            cost: Number of tokens consumed by the request
+        """
+        delay = self._reserve(cost)
+        if delay > 0:
+            time.sleep(delay)
+
+
 class LLMClient(ABC):
     """
     Abstract base class for LLM clients.
@@ -67,26 +321,88 @@ class LLMClient(ABC):
     abstracting away provider-specific implementation details.
     """
     
-    def __init__(self, config: LLMConfig):
+    def __init__(self, config: LLMConfig, cache: Optional[PromptCache] = None,
+                 semantic_cache: Optional[SemanticCache] = None):
         """
         Initialize the LLM client with configuration.
         
         Args:
             config: LLM configuration object
+            cache: Optional response cache for repeated prompts
+            semantic_cache: Optional similarity cache consulted after an exact miss
         """
         self.config = config
+        self.cache = cache
+        self.semantic_cache = semantic_cache
         self.total_tokens_used = 0
+        self.cached_tokens = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
         self.request_count = 0
         self.last_request_time = 0.0
+        # Buckets hold a full minute of budget, matching how providers meter limits
+        rpm, tpm = _rate_limits(config)
+        self._rpm_bucket = RateLimiter(rpm, capacity=rpm)
+        self._tpm_bucket = RateLimiter(tpm, capacity=tpm)
+        self._async_client = None
+        self._async_client_loop = None
+        self._http = None
+        self._system_prompt_tokens = 0
+    
+    def _completion_budget(self, prompt_tokens: int) -> int:
+        """
+        Tokens left for the completion after the prompt and system message.
+        
+        Args:
+            prompt_tokens: Token count of the user prompt
+            
+        Returns:
+            Value to send as ``max_tokens``
+        """
+        return self.config.max_tokens - prompt_tokens - self._system_prompt_tokens - _BUDGET_MARGIN
+    
+    def _http_kwargs(self, asynchronous: bool = False) -> Dict[str, Any]:
+        """
+        SDK constructor arguments that route requests through a pooled HTTP client.
+        
+        The synchronous client is kept on ``self._http`` so ``close()`` can release it.
+        """
+        http_client = _build_http_client(self.config.timeout, asynchronous)
+        if http_client is None:
+            return {}
+        if not asynchronous:
+            self._http = http_client
+        return {"http_client": http_client}
+    
+    def close(self) -> None:
+        """Close the pooled HTTP connections held by this client."""
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+    
+    def __enter__(self) -> "LLMClient":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
     
     @abstractmethod
-    def generate(self, prompt: str, temperature: Optional[float] = None) -> str:
+    def generate(self, prompt: str, temperature: Optional[float] = None,
+                 response_format: Optional[Dict[str, Any]] = None,
+                 cache_prefix: Optional[str] = None,
+                 cache_scope: Optional[str] = None) -> str:
         """
         Generate response from prompt.
         
         Args:
             prompt: Input prompt for generation
             temperature: Sampling temperature (overrides config if provided)
+            response_format: Structured output hint, e.g. ``{"type": "json_object"}``.
+                Providers without native support rely on the prompt instead.
+            cache_prefix: Leading part of ``prompt`` that is identical across
+                requests and may be marked for provider-side prompt caching
+            cache_scope: Extra key, such as card type and parent topic, that keeps
+                otherwise similar requests apart in the semantic cache
             
         Returns:
             Generated response text
@@ -97,7 +413,176 @@ class LLMClient(ABC):
             TokenLimitError: If token limit exceeded
         """
         pass
-    
+
+    async def agenerate(self, prompt: str, temperature: Optional[float] = None,
+                        response_format: Optional[Dict[str, Any]] = None,
+                        cache_prefix: Optional[str] = None,
+                        cache_scope: Optional[str] = None) -> str:
+        """
+        Generate response from prompt without blocking the event loop.
+
+        The default implementation runs the synchronous ``generate`` in a
+        worker thread so that many requests can be in flight concurrently.
+
+        Args:
+            prompt: Input prompt for generation
+            temperature: Sampling temperature (overrides config if provided)
+            response_format: Structured output hint passed through to ``generate``
+            cache_prefix: Cacheable prompt prefix passed through to ``generate``
+            cache_scope: Semantic cache key passed through to ``generate``
+
+        Returns:
+            Generated response text
+        """
+        return await asyncio.to_thread(self.generate, prompt, temperature, response_format, cache_prefix, cache_scope)
+
+    async def agenerate_many(self, prompts: List[str], temperature: Optional[float] = None,
+                             max_concurrency: int = 8) -> List[str]:
+        """
+        Generate responses for many independent prompts concurrently.
+
+        Args:
+            prompts: Prompts to send
+            temperature: Sampling temperature for every prompt (overrides config if provided)
+            max_concurrency: Maximum number of requests in flight at once
+
+        Returns:
+            Responses in the same order as ``prompts``
+
+        Raises:
+            TokenLimitError: If any prompt is too long (checked before sending)
+            LLMError: If any request fails
+        """
+        # Pre-flight budget check so an oversized prompt fails before tokens are spent
+        for prompt_tokens in self.count_tokens_many(prompts):
+            if prompt_tokens > self.config.max_tokens * 0.8:
+                raise TokenLimitError(f"Prompt too long: {prompt_tokens} tokens")
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def _bounded(prompt: str) -> str:
+            async with semaphore:
+                return await self.agenerate(prompt, temperature)
+
+        return list(await asyncio.gather(*(_bounded(prompt) for prompt in prompts)))
+
+    def generate_many(self, prompts: List[str], temperature: Optional[float] = None,
+                      max_concurrency: int = 8) -> List[str]:
+        """
+        Synchronous wrapper around :meth:`agenerate_many` for callers without an event loop.
+
+        Args:
+            prompts: Prompts to send
+            temperature: Sampling temperature for every prompt (overrides config if provided)
+            max_concurrency: Maximum number of requests in flight at once
+
+        Returns:
+            Responses in the same order as ``prompts``
+        """
+        return asyncio.run(self.agenerate_many(prompts, temperature, max_concurrency))
+
+    async def agenerate_multi(self, prompts: List[str], temperature: Optional[float] = None) -> List[str]:
+        """
+        Answer several prompts with a single request.
+
+        The prompts are packed as numbered items into one message that asks for
+        a JSON object ``{"responses": [...]}``, so N prompts cost one round trip
+        and one unit of the requests-per-minute budget. If the reply does not
+        hold exactly one string per prompt, the prompts are sent individually.
+
+        Args:
+            prompts: Independent prompts to answer
+            temperature: Sampling temperature (overrides config if provided)
+
+        Returns:
+            Responses in the same order as ``prompts``
+
+        Raises:
+            LLMError: If generation fails
+        """
+        if len(prompts) < 2:
+            return await self.agenerate_many(prompts, temperature)
+
+        response = await self.agenerate(_pack_prompts(prompts), temperature,
+                                        response_format={"type": "json_object"})
+        responses = _unpack_responses(response, len(prompts))
+        if responses is None:
+            logger.warning("Packed response did not contain %d answers, retrying prompts individually", len(prompts))
+            return await self.agenerate_many(prompts, temperature)
+        return responses
+
+    def generate_multi(self, prompts: List[str], temperature: Optional[float] = None) -> List[str]:
+        """
+        Synchronous wrapper around :meth:`agenerate_multi` for callers without an event loop.
+
+        Args:
+            prompts: Independent prompts to answer
+            temperature: Sampling temperature (overrides config if provided)
+
+        Returns:
+            Responses in the same order as ``prompts``
+        """
+        return asyncio.run(self.agenerate_multi(prompts, temperature))
+
+    async def agenerate_stream(self, prompt: str, temperature: Optional[float] = None,
+                               cache_prefix: Optional[str] = None,
+                               cache_scope: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream a response as text chunks while it is being generated.
+
+        The default implementation yields the complete ``agenerate`` result
+        as a single chunk; providers override this with native streaming.
+        Callers may stop iterating early, which ends the request.
+
+        Args:
+            prompt: Input prompt for generation
+            temperature: Sampling temperature (overrides config if provided)
+            cache_prefix: Cacheable prompt prefix passed through to the provider
+            cache_scope: Semantic cache key passed through to the provider
+
+        Yields:
+            Response text chunks in order
+        """
+        yield await self.agenerate(prompt, temperature, cache_prefix=cache_prefix, cache_scope=cache_scope)
+
+    def generate_stream(self, prompt: str, temperature: Optional[float] = None,
+                        cache_prefix: Optional[str] = None,
+                        cache_scope: Optional[str] = None) -> Iterator[str]:
+        """
+        Synchronous counterpart of :meth:`agenerate_stream`.
+
+        The default implementation yields the complete ``generate`` result as
+        a single chunk; providers override this with native streaming.
+
+        Args:
+            prompt: Input prompt for generation
+            temperature: Sampling temperature (overrides config if provided)
+            cache_prefix: Cacheable prompt prefix passed through to the provider
+            cache_scope: Semantic cache key passed through to the provider
+
+        Yields:
+            Response text chunks in order
+        """
+        yield self.generate(prompt, temperature, cache_prefix=cache_prefix, cache_scope=cache_scope)
+
+    def _get_async_client(self):
+        """
+        Return the provider's async SDK client for the running event loop.
+
+        Async SDK clients hold connections bound to the loop they were first
+        used on, and ``CardGenerator.generate_cards`` starts a fresh loop per
+        call, so the client is recreated whenever the loop changes.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._async_client = self._create_async_client()
+            self._async_client_loop = loop
+        return self._async_client
+
+    def _create_async_client(self):
+        """Create the provider's async SDK client."""
+        raise LLMError(f"Streaming is not supported for {self.config.provider.value}")
+
     @abstractmethod
     def count_tokens(self, text: str) -> int:
         """
@@ -111,6 +596,18 @@ class LLMClient(ABC):
         """
         pass
     
+    def count_tokens_many(self, texts: List[str]) -> List[int]:
+        """
+        Count tokens for several texts.
+        
+        Args:
+            texts: Texts to count
+            
+        Returns:
+            Token counts in the same order as ``texts``
+        """
+        return [self.count_tokens(text) for text in texts]
+    
     @abstractmethod
     def get_model_info(self) -> Dict[str, Any]:
         """
@@ -121,22 +618,207 @@ class LLMClient(ABC):
         """
         pass
     
-    def _handle_rate_limiting(self) -> None:
+    def run_batch(self, requests: List[Dict[str, Any]], poll_interval: float = 30.0) -> Dict[str, str]:
+        """
+        Run many prompts through the provider's asynchronous Batch API.
+        
+        Submits the batch, waits for it to finish and downloads the results.
+        
+        Args:
+            requests: Dicts with ``custom_id``, ``prompt``, ``temperature`` and
+                optional ``response_format`` and ``cache_prefix`` keys. Custom
+                ids should match ``[A-Za-z0-9_-]{1,64}``.
+            poll_interval: Seconds between batch status checks
+            
+        Returns:
+            Mapping of ``custom_id`` to response text for successful requests
+            
+        Raises:
+            LLMError: If the provider has no batch support or the batch fails
+        """
+        batch_id = self.submit_batch(requests)
+        self.poll_batch(batch_id, poll_interval)
+        return self.fetch_batch_results(batch_id)
+    
+    def submit_batch(self, requests: List[Dict[str, Any]]) -> str:
+        """
+        Submit prompts as one Batch API job without waiting for it.
+        
+        Args:
+            requests: Request dicts as described in ``run_batch``
+            
+        Returns:
+            Provider batch id
+            
+        Raises:
+            LLMError: If the provider has no batch support or submission fails
+        """
+        raise LLMError(f"Batch generation is not supported for {self.config.provider.value}")
+    
+    def poll_batch(self, batch_id: str, interval: float = 30.0) -> str:
+        """
+        Block until a batch job stops processing.
+        
+        Args:
+            batch_id: Id returned by ``submit_batch``
+            interval: Seconds between status checks
+            
+        Returns:
+            Final batch status
+            
+        Raises:
+            LLMError: If the batch did not complete successfully
+        """
+        raise LLMError(f"Batch generation is not supported for {self.config.provider.value}")
+    
+    def fetch_batch_results(self, batch_id: str) -> Dict[str, str]:
+        """
+        Download the results of a finished batch job.
+        
+        Args:
+            batch_id: Id returned by ``submit_batch``
+            
+        Returns:
+            Mapping of ``custom_id`` to response text for successful requests
+            
+        Raises:
+            LLMError: If the results cannot be retrieved
+        """
+        raise LLMError(f"Batch generation is not supported for {self.config.provider.value}")
+    
+    def _cache_key(self, prompt: str, temperature: float,
+                   response_format: Optional[Dict[str, Any]] = None) -> Optional[str]:
         """
-        Handle rate limiting between requests.
+        Return the cache key for a request, or None if it must not be cached.
+        
+        Only deterministic (temperature 0) requests are cached unless the
+        cache was configured with ``always=True``.
+        """
+        if self.cache is None or not self.cache.should_cache(temperature):
+            return None
+        return PromptCache.make_key(f"{self.config.provider.value}:{self.config.model}", temperature,
+                                    prompt, response_format, SYSTEM_PROMPT)
+    
+    def _semantic_namespace(self, temperature: float,
+                            response_format: Optional[Dict[str, Any]] = None,
+                            cache_prefix: Optional[str] = None,
+                            cache_scope: Optional[str] = None) -> Optional[str]:
+        """
+        Return the semantic cache namespace for a request, or None if not applicable.
+        
+        Only requests in the same namespace can share a response: same model
+        settings, same prompt template (identified by its static prefix) and
+        same caller-supplied scope, such as card type and parent topic.
+        """
+        if self.semantic_cache is None or not self.semantic_cache.should_cache(temperature):
+            return None
+        template = hashlib.sha1(cache_prefix.encode('utf-8')).hexdigest()[:16] if cache_prefix else ''
+        return f"{self.config.model}|{temperature}|{response_format or ''}|{template}|{cache_scope or ''}"
+    
+    @staticmethod
+    def _semantic_text(prompt: str, cache_prefix: Optional[str] = None) -> str:
         """
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
+        Return the per-request part of a prompt for semantic comparison.
         
-        # Minimum delay between requests (adjust based on provider limits)
-        min_delay = 0.1  # 100ms minimum
+        The static template prefix is the same for every topic and longer than
+        the embedding model's input window, so embedding the whole prompt would
+        never see the topic itself.
+        """
+        if cache_prefix and prompt.startswith(cache_prefix):
+            return prompt[len(cache_prefix):]
+        return prompt
+    
+    def _cached_response(self, prompt: str, temperature: float,
+                         response_format: Optional[Dict[str, Any]] = None,
+                         cache_prefix: Optional[str] = None,
+                         cache_scope: Optional[str] = None) -> Optional[str]:
+        """Return a cached response from the exact or semantic cache, if any."""
+        cache_key = self._cache_key(prompt, temperature, response_format)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.debug("Serving response from prompt cache")
+                self.cache_hits += 1
+                return cached
+        
+        namespace = self._semantic_namespace(temperature, response_format, cache_prefix, cache_scope)
+        if namespace is not None:
+            cached = self.semantic_cache.get(namespace, self._semantic_text(prompt, cache_prefix))
+            if cached is not None:
+                logger.debug("Serving response from semantic cache")
+                self.cache_hits += 1
+                return cached
+        
+        if cache_key is not None or namespace is not None:
+            self.cache_misses += 1
+        return None
+    
+    def _store_response(self, prompt: str, temperature: float, response: str,
+                        response_format: Optional[Dict[str, Any]] = None,
+                        cache_prefix: Optional[str] = None,
+                        cache_scope: Optional[str] = None) -> None:
+        """Record a fresh response in the configured caches."""
+        cache_key = self._cache_key(prompt, temperature, response_format)
+        if cache_key is not None:
+            self.cache.set(cache_key, response)
+        namespace = self._semantic_namespace(temperature, response_format, cache_prefix, cache_scope)
+        if namespace is not None:
+            self.semantic_cache.set(namespace, self._semantic_text(prompt, cache_prefix), response)
+    
+    async def _acached_response(self, prompt: str, temperature: float,
+                                response_format: Optional[Dict[str, Any]] = None,
+                                cache_prefix: Optional[str] = None,
+                                cache_scope: Optional[str] = None) -> Optional[str]:
+        """Async ``_cached_response``; semantic lookups embed text, so they run in a thread."""
+        args = (prompt, temperature, response_format, cache_prefix, cache_scope)
+        if self.semantic_cache is not None:
+            return await asyncio.to_thread(self._cached_response, *args)
+        return self._cached_response(*args)
+    
+    async def _astore_response(self, prompt: str, temperature: float, response: str,
+                               response_format: Optional[Dict[str, Any]] = None,
+                               cache_prefix: Optional[str] = None,
+                               cache_scope: Optional[str] = None) -> None:
+        """Async ``_store_response``; semantic inserts embed text, so they run in a thread."""
+        args = (prompt, temperature, response, response_format, cache_prefix, cache_scope)
+        if self.semantic_cache is not None:
+            await asyncio.to_thread(self._store_response, *args)
+        else:
+            self._store_response(*args)
+    
+    def _handle_rate_limiting(self, prompt_tokens: int = 0) -> None:
+        """
+        Block until the request and token budgets allow another request.
         
-        if time_since_last_request < min_delay:
-            sleep_time = min_delay - time_since_last_request
-            time.sleep(sleep_time)
+        A request is charged its prompt plus the full completion budget, which
+        is how providers count it against tokens-per-minute limits.
         
+        Args:
+            prompt_tokens: Token count of the user prompt
+        """
+        self._rpm_bucket.wait(1)
+        self._tpm_bucket.wait(prompt_tokens + self._completion_budget(prompt_tokens))
         self.last_request_time = time.time()
     
+    async def _ahandle_rate_limiting(self, prompt_tokens: int = 0) -> None:
+        """Async ``_handle_rate_limiting`` that sleeps without blocking the event loop."""
+        await self._rpm_bucket.acquire(1)
+        await self._tpm_bucket.acquire(prompt_tokens + self._completion_budget(prompt_tokens))
+        self.last_request_time = time.time()
+    
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        """
+        Seconds to wait before retrying a failed request.
+        
+        Uses full jitter: a uniform draw below an exponentially growing ceiling
+        (capped at ``_MAX_BACKOFF``), so concurrent requests that failed together
+        do not retry in lockstep. A server-provided Retry-After is a lower bound.
+        """
+        delay = random.uniform(0, min(_MAX_BACKOFF, self.config.retry_delay * (2 ** attempt)))
+        if isinstance(error, RateLimitError) and error.retry_after is not None:
+            return max(error.retry_after, delay)
+        return delay
+    
     def _retry_with_backoff(self, func, *args, **kwargs):
         """
         Execute function with exponential backoff retry logic.
@@ -160,21 +842,63 @@ class LLMClient(ABC):
             except RateLimitError as e:
                 last_exception = e
                 if attempt < self.config.retry_attempts - 1:
-                    delay = self.config.retry_delay * (2 ** attempt)  # Exponential backoff
-                    logger.warning(f"Rate limit hit, retrying in {delay}s (attempt {attempt + 1})")
+                    delay = self._backoff_delay(attempt, e)
+                    logger.warning("Rate limit hit, retrying in %.2fs (attempt %d)", delay, attempt + 1)
                     time.sleep(delay)
                 else:
                     raise
             except Exception as e:
                 last_exception = e
                 if attempt < self.config.retry_attempts - 1:
-                    delay = self.config.retry_delay * (2 ** attempt)
-                    logger.warning(f"Request failed, retrying in {delay}s: {e}")
+                    delay = self._backoff_delay(attempt, e)
+                    logger.warning("Request failed, retrying in %.2fs: %s", delay, e)
                     time.sleep(delay)
                 else:
                     raise LLMError(f"All retry attempts failed: {e}") from e
         
         raise LLMError(f"All retry attempts failed: {last_exception}") from last_exception
+    
+    async def _aretry_with_backoff(self, func, *args, **kwargs):
+        """
+        Await a coroutine function with exponential backoff retry logic.
+        
+        Same policy as ``_retry_with_backoff``, but waits with ``asyncio.sleep``
+        so other requests keep running during the backoff.
+        
+        Args:
+            func: Coroutine function to execute
+            *args: Function arguments
+            **kwargs: Function keyword arguments
+            
+        Returns:
+            Function result
+            
+        Raises:
+            LLMError: If all retry attempts fail
+        """
+        last_exception = None
+        
+        for attempt in range(self.config.retry_attempts):
+            try:
+                return await func(*args, **kwargs)
+            except RateLimitError as e:
+                last_exception = e
+                if attempt < self.config.retry_attempts - 1:
+                    delay = self._backoff_delay(attempt, e)
+                    logger.warning("Rate limit hit, retrying in %.2fs (attempt %d)", delay, attempt + 1)
+                    await asyncio.sleep(delay)
+                else:
+                    raise
+            except Exception as e:
+                last_exception = e
+                if attempt < self.config.retry_attempts - 1:
+                    delay = self._backoff_delay(attempt, e)
+                    logger.warning("Request failed, retrying in %.2fs: %s", delay, e)
+                    await asyncio.sleep(delay)
+                else:
+                    raise LLMError(f"All retry attempts failed: {e}") from e
+        
+        raise LLMError(f"All retry attempts failed: {last_exception}") from last_exception
 
 
 class OpenAIClient(LLMClient):
@@ -191,9 +915,10 @@ class OpenAIClient(LLMClient):
         >>> print(response)
     """
     
-    def __init__(self, config: LLMConfig):
+    def __init__(self, config: LLMConfig, cache: Optional[PromptCache] = None,
+                 semantic_cache: Optional[SemanticCache] = None):
         """Initialize OpenAI client."""
-        super().__init__(config)
+        super().__init__(config, cache, semantic_cache)
         
         try:
             import openai
@@ -204,66 +929,358 @@ class OpenAIClient(LLMClient):
             raise LLMError(f"OpenAI dependencies not installed: {e}")
         
         # Initialize OpenAI client
-        self.client = openai.OpenAI(api_key=config.api_key)
+        self.client = openai.OpenAI(api_key=config.api_key, **self._http_kwargs())
         
-        # Initialize tokenizer for the model
-        try:
-            self.encoding = tiktoken.encoding_for_model(config.model)
-        except KeyError:
-            # Fallback to a default encoding
-            logger.warning(f"No tokenizer found for {config.model}, using cl100k_base")
-            self.encoding = tiktoken.get_encoding("cl100k_base")
+        # Tokenizer tables are shared by every client for the same model
+        self.encoding = _get_encoding(config.model)
+        self._system_prompt_tokens = self.count_tokens(SYSTEM_PROMPT)
     
-    def generate(self, prompt: str, temperature: Optional[float] = None) -> str:
+    def generate(self, prompt: str, temperature: Optional[float] = None,
+                 response_format: Optional[Dict[str, Any]] = None,
+                 cache_prefix: Optional[str] = None,
+                 cache_scope: Optional[str] = None) -> str:
         """
         Generate response using OpenAI API.
         
         Args:
             prompt: Input prompt
             temperature: Sampling temperature
+            response_format: Optional OpenAI ``response_format`` (e.g. JSON mode)
+            cache_prefix: Static leading part of the prompt; it already leads the
+                user message, where OpenAI's automatic prefix cache matches it
+            cache_scope: Semantic cache key; see :meth:`LLMClient.generate`
             
         Returns:
             Generated response
         """
         temp = temperature if temperature is not None else self.config.temperature
         
+        cached = self._cached_response(prompt, temp, response_format, cache_prefix, cache_scope)
+        if cached is not None:
+            return cached
+        
         # Check token count
         prompt_tokens = self.count_tokens(prompt)
         if prompt_tokens > self.config.max_tokens * 0.8:  # Leave room for response
             raise TokenLimitError(f"Prompt too long: {prompt_tokens} tokens")
         
+        request_kwargs = {}
+        if response_format is not None:
+            request_kwargs['response_format'] = response_format
+        
         def _make_request():
-            self._handle_rate_limiting()
+            self._handle_rate_limiting(prompt_tokens)
             
             try:
                 response = self.client.chat.completions.create(
                     model=self.config.model,
-                    messages=[
-                        {"role": "system", "content": "You are a helpful assistant that generates high-quality educational flashcards."},
-                        {"role": "user", "content": prompt}
-                    ],
+                    messages=self._messages(prompt),
                     temperature=temp,
-                    max_tokens=self.config.max_tokens - prompt_tokens,
-                    timeout=self.config.timeout
+                    max_tokens=self._completion_budget(prompt_tokens),
+                    timeout=self.config.timeout,
+                    **request_kwargs
                 )
                 
                 # Update usage statistics
                 if hasattr(response, 'usage') and response.usage:
-                    self.total_tokens_used += response.usage.total_tokens
+                    self._record_usage(response.usage)
                 
                 self.request_count += 1
                 
                 return response.choices[0].message.content
                 
             except Exception as e:
-                if "rate_limit" in str(e).lower():
-                    raise RateLimitError(f"OpenAI rate limit exceeded: {e}")
-                elif "timeout" in str(e).lower():
-                    raise LLMError(f"OpenAI request timeout: {e}")
-                else:
-                    raise LLMError(f"OpenAI API error: {e}")
+                raise self._translate_error(e) from e
+        
+        response_text = self._retry_with_backoff(_make_request)
+        self._store_response(prompt, temp, response_text, response_format, cache_prefix, cache_scope)
+        return response_text
+    
+    def _create_async_client(self):
+        """Create an ``AsyncOpenAI`` client for async and streaming requests."""
+        return self.openai.AsyncOpenAI(api_key=self.config.api_key, **self._http_kwargs(asynchronous=True))
+    
+    async def agenerate(self, prompt: str, temperature: Optional[float] = None,
+                        response_format: Optional[Dict[str, Any]] = None,
+                        cache_prefix: Optional[str] = None,
+                        cache_scope: Optional[str] = None) -> str:
+        """
+        Generate response using the async OpenAI SDK, without a worker thread.
+        
+        Args:
+            prompt: Input prompt
+            temperature: Sampling temperature
+            response_format: Optional OpenAI ``response_format`` (e.g. JSON mode)
+            cache_prefix: Static leading part of the prompt; it already leads the
+                user message, where OpenAI's automatic prefix cache matches it
+            cache_scope: Semantic cache key; see :meth:`LLMClient.generate`
+            
+        Returns:
+            Generated response
+        """
+        temp = temperature if temperature is not None else self.config.temperature
+        
+        cached = await self._acached_response(prompt, temp, response_format, cache_prefix, cache_scope)
+        if cached is not None:
+            return cached
+        
+        prompt_tokens = self.count_tokens(prompt)
+        if prompt_tokens > self.config.max_tokens * 0.8:
+            raise TokenLimitError(f"Prompt too long: {prompt_tokens} tokens")
         
-        return self._retry_with_backoff(_make_request)
+        request_kwargs = {}
+        if response_format is not None:
+            request_kwargs['response_format'] = response_format
+        client = self._get_async_client()
+        
+        async def _make_request():
+            await self._ahandle_rate_limiting(prompt_tokens)
+            
+            try:
+                response = await client.chat.completions.create(
+                    model=self.config.model,
+                    messages=self._messages(prompt),
+                    temperature=temp,
+                    max_tokens=self._completion_budget(prompt_tokens),
+                    timeout=self.config.timeout,
+                    **request_kwargs
+                )
+                
+                if hasattr(response, 'usage') and response.usage:
+                    self._record_usage(response.usage)
+                
+                self.request_count += 1
+                
+                return response.choices[0].message.content
+                
+            except Exception as e:
+                raise self._translate_error(e) from e
+        
+        response_text = await self._aretry_with_backoff(_make_request)
+        await self._astore_response(prompt, temp, response_text, response_format, cache_prefix, cache_scope)
+        return response_text
+    
+    async def agenerate_stream(self, prompt: str, temperature: Optional[float] = None,
+                               cache_prefix: Optional[str] = None,
+                               cache_scope: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream a response from the OpenAI API (``stream=True``).
+        
+        Streamed requests are not retried, since chunks may already have been
+        consumed; the full text is cached only if the stream was read to the end.
+        
+        Args:
+            prompt: Input prompt
+            temperature: Sampling temperature
+            cache_prefix: Static leading part of the prompt; it already leads the
+                user message, where OpenAI's automatic prefix cache matches it
+            cache_scope: Semantic cache key; see :meth:`LLMClient.generate`
+            
+        Yields:
+            Response text chunks
+        """
+        temp = temperature if temperature is not None else self.config.temperature
+        
+        cached = await self._acached_response(prompt, temp, cache_prefix=cache_prefix, cache_scope=cache_scope)
+        if cached is not None:
+            yield cached
+            return
+        
+        prompt_tokens = self.count_tokens(prompt)
+        if prompt_tokens > self.config.max_tokens * 0.8:
+            raise TokenLimitError(f"Prompt too long: {prompt_tokens} tokens")
+        
+        await self._ahandle_rate_limiting(prompt_tokens)
+        client = self._get_async_client()
+        parts = []
+        stream = None
+        try:
+            stream = await client.chat.completions.create(
+                model=self.config.model,
+                messages=self._messages(prompt),
+                temperature=temp,
+                max_tokens=self._completion_budget(prompt_tokens),
+                timeout=self.config.timeout,
+                stream=True
+            )
+            self.request_count += 1
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    text = chunk.choices[0].delta.content
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            raise self._translate_error(e, "streaming") from e
+        finally:
+            # Also runs when the caller closes the generator early
+            if stream is not None:
+                await stream.close()
+        
+        await self._astore_response(prompt, temp, "".join(parts), cache_prefix=cache_prefix, cache_scope=cache_scope)
+    
+    def generate_stream(self, prompt: str, temperature: Optional[float] = None,
+                        cache_prefix: Optional[str] = None,
+                        cache_scope: Optional[str] = None) -> Iterator[str]:
+        """Synchronous ``agenerate_stream`` over the blocking OpenAI client."""
+        temp = temperature if temperature is not None else self.config.temperature
+        
+        cached = self._cached_response(prompt, temp, cache_prefix=cache_prefix, cache_scope=cache_scope)
+        if cached is not None:
+            yield cached
+            return
+        
+        prompt_tokens = self.count_tokens(prompt)
+        if prompt_tokens > self.config.max_tokens * 0.8:
+            raise TokenLimitError(f"Prompt too long: {prompt_tokens} tokens")
+        
+        self._handle_rate_limiting(prompt_tokens)
+        parts = []
+        stream = None
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.config.model,
+                messages=self._messages(prompt),
+                temperature=temp,
+                max_tokens=self._completion_budget(prompt_tokens),
+                timeout=self.config.timeout,
+                stream=True
+            )
+            self.request_count += 1
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    text = chunk.choices[0].delta.content
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            raise self._translate_error(e, "streaming") from e
+        finally:
+            if stream is not None:
+                stream.close()
+        
+        self._store_response(prompt, temp, "".join(parts), cache_prefix=cache_prefix, cache_scope=cache_scope)
+    
+    def submit_batch(self, requests: List[Dict[str, Any]]) -> str:
+        """
+        Upload prompts as JSONL and start an OpenAI batch (24h window, discounted).
+        
+        Args:
+            requests: Dicts with ``custom_id``, ``prompt``, ``temperature`` and
+                optional ``response_format`` keys
+            
+        Returns:
+            OpenAI batch id
+            
+        Raises:
+            LLMError: If the batch cannot be submitted
+        """
+        lines = []
+        for request in requests:
+            prompt = request['prompt']
+            body = {
+                "model": self.config.model,
+                "messages": self._messages(prompt),
+                "temperature": request.get('temperature', self.config.temperature),
+                "max_tokens": self._completion_budget(self.count_tokens(prompt))
+            }
+            if request.get('response_format'):
+                body['response_format'] = request['response_format']
+            lines.append(_dumps({
+                "custom_id": request['custom_id'],
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body
+            }))
+        
+        try:
+            batch_file = self.client.files.create(
+                file=("flashcard_batch.jsonl", b"\n".join(lines)),
+                purpose="batch"
+            )
+            batch = self.client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+        except Exception as e:
+            raise LLMError(f"OpenAI batch error: {e}")
+        
+        logger.info("Submitted OpenAI batch %s with %d requests", batch.id, len(lines))
+        return batch.id
+    
+    def poll_batch(self, batch_id: str, interval: float = 30.0) -> str:
+        """Wait for an OpenAI batch to reach a terminal status; see ``LLMClient.poll_batch``."""
+        try:
+            batch = self.client.batches.retrieve(batch_id)
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                time.sleep(interval)
+                batch = self.client.batches.retrieve(batch_id)
+                logger.debug("Batch %s status: %s", batch_id, batch.status)
+        except Exception as e:
+            raise LLMError(f"OpenAI batch error: {e}")
+        
+        if batch.status != "completed":
+            raise LLMError(f"OpenAI batch {batch_id} ended with status '{batch.status}'")
+        return batch.status
+    
+    def fetch_batch_results(self, batch_id: str) -> Dict[str, str]:
+        """Download and parse the output file of a completed OpenAI batch."""
+        try:
+            batch = self.client.batches.retrieve(batch_id)
+            if not batch.output_file_id:
+                raise LLMError(f"OpenAI batch {batch_id} has no output file (status '{batch.status}')")
+            output = self.client.files.content(batch.output_file_id).text
+        except LLMError:
+            raise
+        except Exception as e:
+            raise LLMError(f"OpenAI batch error: {e}")
+        
+        results = {}
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            record = _loads(line)
+            response = record.get('response') or {}
+            if response.get('status_code') != 200:
+                logger.warning("Batch request %s failed: %s", record.get('custom_id'), record.get('error'))
+                continue
+            body = response['body']
+            usage = body.get('usage') or {}
+            self.total_tokens_used += usage.get('total_tokens', 0)
+            self.cached_tokens += (usage.get('prompt_tokens_details') or {}).get('cached_tokens') or 0
+            results[record['custom_id']] = body['choices'][0]['message']['content']
+        
+        self.request_count += 1
+        return results
+    
+    def _translate_error(self, error: Exception, kind: str = "API") -> LLMError:
+        """Map an OpenAI SDK exception onto this module's error types."""
+        if isinstance(error, self.openai.RateLimitError):
+            return RateLimitError(f"OpenAI rate limit exceeded: {error}", retry_after=_retry_after(error))
+        if isinstance(error, self.openai.APITimeoutError):
+            return LLMError(f"OpenAI request timeout: {error}")
+        return LLMError(f"OpenAI {kind} error: {error}")
+    
+    @staticmethod
+    def _messages(prompt: str) -> List[Dict[str, str]]:
+        """
+        Build chat messages with every invariant part ahead of the per-topic input.
+        
+        OpenAI caches the longest previously seen prefix of the request; the
+        system prompt comes first and templates put the topic placeholders after
+        their static instructions, so one user message is enough.
+        """
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _record_usage(self, usage: Any) -> None:
+        """Add a response's token usage, including automatically cached prompt tokens."""
+        self.total_tokens_used += usage.total_tokens
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = getattr(details, 'cached_tokens', None)
+        if isinstance(cached, int):
+            self.cached_tokens += cached
     
     def count_tokens(self, text: str) -> int:
         """
@@ -276,12 +1293,31 @@ class OpenAIClient(LLMClient):
             Number of tokens
         """
         try:
-            return len(self.encoding.encode(text))
+            return _count_tokens(text, self.config.model)
         except Exception as e:
-            logger.warning(f"Token counting failed, using estimate: {e}")
+            logger.warning("Token counting failed, using estimate: %s", e)
             # Rough estimate: ~4 characters per token
             return len(text) // 4
     
+    def count_tokens_many(self, texts: List[str]) -> List[int]:
+        """
+        Count tokens for several texts with tiktoken's multithreaded ``encode_batch``.
+        
+        Args:
+            texts: Texts to count
+            
+        Returns:
+            Token counts in the same order as ``texts``
+        """
+        if len(texts) < 2:
+            return super().count_tokens_many(texts)
+        try:
+            encoded = self.encoding.encode_batch(texts, num_threads=min(8, os.cpu_count() or 1))
+        except Exception as e:
+            logger.warning("Batch token counting failed, counting individually: %s", e)
+            return super().count_tokens_many(texts)
+        return [len(tokens) for tokens in encoded]
+    
     def get_model_info(self) -> Dict[str, Any]:
         """Get OpenAI model information."""
         return {
@@ -290,6 +1326,9 @@ class OpenAIClient(LLMClient):
             "max_tokens": self.config.max_tokens,
             "temperature": self.config.temperature,
             "total_tokens_used": self.total_tokens_used,
+            "cached_tokens": self.cached_tokens,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
             "request_count": self.request_count
         }
 
@@ -307,9 +1346,10 @@ class AnthropicClient(LLMClient):
         >>> print(response)
     """
     
-    def __init__(self, config: LLMConfig):
+    def __init__(self, config: LLMConfig, cache: Optional[PromptCache] = None,
+                 semantic_cache: Optional[SemanticCache] = None):
         """Initialize Anthropic client."""
-        super().__init__(config)
+        super().__init__(config, cache, semantic_cache)
         
         try:
             import anthropic
@@ -318,57 +1358,322 @@ class AnthropicClient(LLMClient):
             raise LLMError(f"Anthropic dependencies not installed: {e}")
         
         # Initialize Anthropic client
-        self.client = anthropic.Anthropic(api_key=config.api_key)
+        self.client = anthropic.Anthropic(api_key=config.api_key, **self._http_kwargs())
+        self._system_prompt_tokens = self.count_tokens(SYSTEM_PROMPT)
     
-    def generate(self, prompt: str, temperature: Optional[float] = None) -> str:
+    def generate(self, prompt: str, temperature: Optional[float] = None,
+                 response_format: Optional[Dict[str, Any]] = None,
+                 cache_prefix: Optional[str] = None,
+                 cache_scope: Optional[str] = None) -> str:
         """
         Generate response using Anthropic API.
         
         Args:
             prompt: Input prompt
             temperature: Sampling temperature
+            response_format: Accepted for interface compatibility; Claude has no
+                JSON mode, so structured output is requested through the prompt
+            cache_prefix: Leading part of the prompt sent as a separate block
+                with ``cache_control`` so Anthropic can reuse it across requests
+            cache_scope: Semantic cache key; see :meth:`LLMClient.generate`
             
         Returns:
             Generated response
         """
         temp = temperature if temperature is not None else self.config.temperature
         
+        cached = self._cached_response(prompt, temp, response_format, cache_prefix, cache_scope)
+        if cached is not None:
+            return cached
+        
         # Check token count (rough estimate for Claude)
         prompt_tokens = self.count_tokens(prompt)
         if prompt_tokens > self.config.max_tokens * 0.8:
             raise TokenLimitError(f"Prompt too long: {prompt_tokens} tokens")
         
+        content = self._message_content(prompt, cache_prefix)
+        
         def _make_request():
-            self._handle_rate_limiting()
+            self._handle_rate_limiting(prompt_tokens)
             
             try:
                 response = self.client.messages.create(
                     model=self.config.model,
-                    max_tokens=self.config.max_tokens - prompt_tokens,
+                    max_tokens=self._completion_budget(prompt_tokens),
                     temperature=temp,
-                    system="You are a helpful assistant that generates high-quality educational flashcards.",
+                    system=SYSTEM_PROMPT,
                     messages=[
-                        {"role": "user", "content": prompt}
+                        {"role": "user", "content": content}
                     ]
                 )
                 
                 # Update usage statistics
                 if hasattr(response, 'usage') and response.usage:
-                    self.total_tokens_used += response.usage.input_tokens + response.usage.output_tokens
+                    self._record_usage(response.usage)
                 
                 self.request_count += 1
                 
                 return response.content[0].text
                 
             except Exception as e:
-                if "rate_limit" in str(e).lower():
-                    raise RateLimitError(f"Anthropic rate limit exceeded: {e}")
-                elif "timeout" in str(e).lower():
-                    raise LLMError(f"Anthropic request timeout: {e}")
-                else:
-                    raise LLMError(f"Anthropic API error: {e}")
+                raise self._translate_error(e) from e
         
-        return self._retry_with_backoff(_make_request)
+        response_text = self._retry_with_backoff(_make_request)
+        self._store_response(prompt, temp, response_text, response_format, cache_prefix, cache_scope)
+        return response_text
+    
+    def _create_async_client(self):
+        """Create an ``AsyncAnthropic`` client for async and streaming requests."""
+        return self.anthropic.AsyncAnthropic(api_key=self.config.api_key, **self._http_kwargs(asynchronous=True))
+    
+    def _translate_error(self, error: Exception, kind: str = "API") -> LLMError:
+        """Map an Anthropic SDK exception onto this module's error types."""
+        if isinstance(error, self.anthropic.RateLimitError):
+            return RateLimitError(f"Anthropic rate limit exceeded: {error}", retry_after=_retry_after(error))
+        if isinstance(error, self.anthropic.APITimeoutError):
+            return LLMError(f"Anthropic request timeout: {error}")
+        return LLMError(f"Anthropic {kind} error: {error}")
+    
+    def _message_content(self, prompt: str, cache_prefix: Optional[str] = None) -> Union[str, List[Dict[str, Any]]]:
+        """Return the user message content, splitting off ``cache_prefix`` as a cacheable block."""
+        if cache_prefix and prompt.startswith(cache_prefix) and len(cache_prefix) < len(prompt):
+            return [
+                {"type": "text", "text": cache_prefix, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": prompt[len(cache_prefix):]}
+            ]
+        return prompt
+    
+    async def agenerate(self, prompt: str, temperature: Optional[float] = None,
+                        response_format: Optional[Dict[str, Any]] = None,
+                        cache_prefix: Optional[str] = None,
+                        cache_scope: Optional[str] = None) -> str:
+        """
+        Generate response using the async Anthropic SDK, without a worker thread.
+        
+        Args:
+            prompt: Input prompt
+            temperature: Sampling temperature
+            response_format: Accepted for interface compatibility; see ``generate``
+            cache_prefix: Leading part of the prompt marked with ``cache_control``
+            cache_scope: Semantic cache key; see :meth:`LLMClient.generate`
+            
+        Returns:
+            Generated response
+        """
+        temp = temperature if temperature is not None else self.config.temperature
+        
+        cached = await self._acached_response(prompt, temp, response_format, cache_prefix, cache_scope)
+        if cached is not None:
+            return cached
+        
+        prompt_tokens = self.count_tokens(prompt)
+        if prompt_tokens > self.config.max_tokens * 0.8:
+            raise TokenLimitError(f"Prompt too long: {prompt_tokens} tokens")
+        
+        content = self._message_content(prompt, cache_prefix)
+        client = self._get_async_client()
+        
+        async def _make_request():
+            await self._ahandle_rate_limiting(prompt_tokens)
+            
+            try:
+                response = await client.messages.create(
+                    model=self.config.model,
+                    max_tokens=self._completion_budget(prompt_tokens),
+                    temperature=temp,
+                    system=SYSTEM_PROMPT,
+                    messages=[
+                        {"role": "user", "content": content}
+                    ]
+                )
+                
+                if hasattr(response, 'usage') and response.usage:
+                    self._record_usage(response.usage)
+                
+                self.request_count += 1
+                
+                return response.content[0].text
+                
+            except Exception as e:
+                raise self._translate_error(e) from e
+        
+        response_text = await self._aretry_with_backoff(_make_request)
+        await self._astore_response(prompt, temp, response_text, response_format, cache_prefix, cache_scope)
+        return response_text
+    
+    async def agenerate_stream(self, prompt: str, temperature: Optional[float] = None,
+                               cache_prefix: Optional[str] = None,
+                               cache_scope: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream a response from the Anthropic Messages API (server-sent events).
+        
+        Streamed requests are not retried, since chunks may already have been
+        consumed; the full text is cached only if the stream was read to the end.
+        
+        Args:
+            prompt: Input prompt
+            temperature: Sampling temperature
+            cache_prefix: Leading part of the prompt marked with ``cache_control``
+            cache_scope: Semantic cache key; see :meth:`LLMClient.generate`
+            
+        Yields:
+            Response text chunks
+        """
+        temp = temperature if temperature is not None else self.config.temperature
+        
+        cached = await self._acached_response(prompt, temp, cache_prefix=cache_prefix, cache_scope=cache_scope)
+        if cached is not None:
+            yield cached
+            return
+        
+        prompt_tokens = self.count_tokens(prompt)
+        if prompt_tokens > self.config.max_tokens * 0.8:
+            raise TokenLimitError(f"Prompt too long: {prompt_tokens} tokens")
+        
+        content = self._message_content(prompt, cache_prefix)
+        
+        await self._ahandle_rate_limiting(prompt_tokens)
+        client = self._get_async_client()
+        parts = []
+        try:
+            async with client.messages.stream(
+                model=self.config.model,
+                max_tokens=self._completion_budget(prompt_tokens),
+                temperature=temp,
+                system=SYSTEM_PROMPT,
+                messages=[
+                    {"role": "user", "content": content}
+                ]
+            ) as stream:
+                self.request_count += 1
+                async for text in stream.text_stream:
+                    parts.append(text)
+                    yield text
+                
+                message = await stream.get_final_message()
+                if message.usage:
+                    self._record_usage(message.usage)
+        except Exception as e:
+            raise self._translate_error(e, "streaming") from e
+        
+        await self._astore_response(prompt, temp, "".join(parts), cache_prefix=cache_prefix, cache_scope=cache_scope)
+    
+    def generate_stream(self, prompt: str, temperature: Optional[float] = None,
+                        cache_prefix: Optional[str] = None,
+                        cache_scope: Optional[str] = None) -> Iterator[str]:
+        """Synchronous ``agenerate_stream`` over the blocking Anthropic client."""
+        temp = temperature if temperature is not None else self.config.temperature
+        
+        cached = self._cached_response(prompt, temp, cache_prefix=cache_prefix, cache_scope=cache_scope)
+        if cached is not None:
+            yield cached
+            return
+        
+        prompt_tokens = self.count_tokens(prompt)
+        if prompt_tokens > self.config.max_tokens * 0.8:
+            raise TokenLimitError(f"Prompt too long: {prompt_tokens} tokens")
+        
+        content = self._message_content(prompt, cache_prefix)
+        
+        self._handle_rate_limiting(prompt_tokens)
+        parts = []
+        try:
+            with self.client.messages.stream(
+                model=self.config.model,
+                max_tokens=self._completion_budget(prompt_tokens),
+                temperature=temp,
+                system=SYSTEM_PROMPT,
+                messages=[
+                    {"role": "user", "content": content}
+                ]
+            ) as stream:
+                self.request_count += 1
+                for text in stream.text_stream:
+                    parts.append(text)
+                    yield text
+                
+                message = stream.get_final_message()
+                if message.usage:
+                    self._record_usage(message.usage)
+        except Exception as e:
+            raise self._translate_error(e, "streaming") from e
+        
+        self._store_response(prompt, temp, "".join(parts), cache_prefix=cache_prefix, cache_scope=cache_scope)
+    
+    def submit_batch(self, requests: List[Dict[str, Any]]) -> str:
+        """
+        Start an Anthropic Message Batch (discounted, processed within 24h).
+        
+        Args:
+            requests: Dicts with ``custom_id``, ``prompt``, ``temperature`` and
+                optional ``cache_prefix`` keys; ``response_format`` is ignored
+            
+        Returns:
+            Anthropic message batch id
+            
+        Raises:
+            LLMError: If the batch cannot be submitted
+        """
+        batch_requests = []
+        for request in requests:
+            prompt = request['prompt']
+            batch_requests.append({
+                "custom_id": request['custom_id'],
+                "params": {
+                    "model": self.config.model,
+                    "max_tokens": self._completion_budget(self.count_tokens(prompt)),
+                    "temperature": request.get('temperature', self.config.temperature),
+                    "system": SYSTEM_PROMPT,
+                    "messages": [
+                        {"role": "user", "content": self._message_content(prompt, request.get('cache_prefix'))}
+                    ]
+                }
+            })
+        
+        try:
+            batch = self.client.messages.batches.create(requests=batch_requests)
+        except Exception as e:
+            raise LLMError(f"Anthropic batch error: {e}")
+        
+        logger.info("Submitted Anthropic batch %s with %d requests", batch.id, len(batch_requests))
+        return batch.id
+    
+    def poll_batch(self, batch_id: str, interval: float = 30.0) -> str:
+        """Wait for an Anthropic batch to finish processing; see ``LLMClient.poll_batch``."""
+        try:
+            batch = self.client.messages.batches.retrieve(batch_id)
+            while batch.processing_status != "ended":
+                time.sleep(interval)
+                batch = self.client.messages.batches.retrieve(batch_id)
+                logger.debug("Batch %s status: %s", batch_id, batch.processing_status)
+        except Exception as e:
+            raise LLMError(f"Anthropic batch error: {e}")
+        return batch.processing_status
+    
+    def fetch_batch_results(self, batch_id: str) -> Dict[str, str]:
+        """Stream the results of an ended Anthropic batch, keeping successful requests."""
+        results = {}
+        try:
+            for entry in self.client.messages.batches.results(batch_id):
+                if entry.result.type != "succeeded":
+                    logger.warning("Batch request %s did not succeed: %s", entry.custom_id, entry.result.type)
+                    continue
+                message = entry.result.message
+                if message.usage:
+                    self._record_usage(message.usage)
+                results[entry.custom_id] = message.content[0].text
+        except Exception as e:
+            raise LLMError(f"Anthropic batch error: {e}")
+        
+        self.request_count += 1
+        return results
+    
+    def _record_usage(self, usage: Any) -> None:
+        """Add a response's token usage, including prompt tokens read from the cache."""
+        self.total_tokens_used += usage.input_tokens + usage.output_tokens
+        cached = getattr(usage, 'cache_read_input_tokens', None)
+        if isinstance(cached, int):
+            self.cached_tokens += cached
     
     def count_tokens(self, text: str) -> int:
         """
@@ -385,7 +1690,7 @@ class AnthropicClient(LLMClient):
             # Based on Anthropic's documentation: ~3.5 characters per token
             return int(len(text) / 3.5)
         except Exception as e:
-            logger.warning(f"Token counting failed, using estimate: {e}")
+            logger.warning("Token counting failed, using estimate: %s", e)
             return len(text) // 4
     
     def get_model_info(self) -> Dict[str, Any]:
@@ -396,6 +1701,9 @@ class AnthropicClient(LLMClient):
             "max_tokens": self.config.max_tokens,
             "temperature": self.config.temperature,
             "total_tokens_used": self.total_tokens_used,
+            "cached_tokens": self.cached_tokens,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
             "request_count": self.request_count
         }
 
@@ -407,7 +1715,9 @@ def create_llm_client(provider: str = "anthropic", model: Optional[str] = None,
     Args:
         provider: LLM provider ("openai" or "anthropic")
         model: Model name (uses defaults if not provided)
-        **kwargs: Additional configuration parameters
+        **kwargs: Additional configuration parameters; ``cache`` may be a
+            :class:`PromptCache` and ``semantic_cache`` a :class:`SemanticCache`
+            shared by the client
         
     Returns:
         Configured LLM client instance
@@ -417,24 +1727,19 @@ def create_llm_client(provider: str = "anthropic", model: Optional[str] = None,
         LLMError: If configuration is invalid
         
     Example:
-        >>> client = create_llm_client("openai", model="gpt-4")
-        >>> response = client.generate("Hello, world!")
+        >>> with create_llm_client("openai", model="gpt-4") as client:
+        ...     response = client.generate("Hello, world!")
     """
     provider_enum = LLMProvider(provider.lower())
     
-    # Get API key from environment or kwargs
+    # Get API key from kwargs or the (cached) environment
     if provider_enum == LLMProvider.OPENAI:
-        api_key = kwargs.get('api_key') or os.getenv('OPENAI_API_KEY')
         default_model = model or "gpt-4"
-        if not api_key:
-            raise LLMError("OpenAI API key not found in environment or kwargs")
     elif provider_enum == LLMProvider.ANTHROPIC:
-        api_key = kwargs.get('api_key') or os.getenv('ANTHROPIC_API_KEY')
         default_model = model or "claude-3-sonnet-20240229"
-        if not api_key:
-            raise LLMError("Anthropic API key not found in environment or kwargs")
     else:
         raise ValueError(f"Unsupported provider: {provider}")
+    api_key = kwargs.get('api_key') or _api_key(provider_enum)
     
     # Create configuration
     config = LLMConfig(
@@ -445,14 +1750,18 @@ def create_llm_client(provider: str = "anthropic", model: Optional[str] = None,
         max_tokens=kwargs.get('max_tokens', 2000),
         retry_attempts=kwargs.get('retry_attempts', 3),
         retry_delay=kwargs.get('retry_delay', 2.0),
-        timeout=kwargs.get('timeout', 30.0)
+        timeout=kwargs.get('timeout', 30.0),
+        rpm=kwargs.get('rpm'),
+        tpm=kwargs.get('tpm')
     )
     
     # Create appropriate client
+    cache = kwargs.get('cache')
+    semantic_cache = kwargs.get('semantic_cache')
     if provider_enum == LLMProvider.OPENAI:
-        return OpenAIClient(config)
+        return OpenAIClient(config, cache, semantic_cache)
     elif provider_enum == LLMProvider.ANTHROPIC:
-        return AnthropicClient(config)
+        return AnthropicClient(config, cache, semantic_cache)
     else:
         raise ValueError(f"Unsupported provider: {provider}")
 
@@ -471,7 +1780,7 @@ def test_llm_connection(client: LLMClient) -> bool:
         response = client.generate("Hello, please respond with 'Connection successful!'")
         return "connection successful" in response.lower()
     except Exception as e:
-        logger.error(f"Connection test failed: {e}")
+        logger.error("Connection test failed: %s", e)
         return False
 
 
@@ -503,4 +1812,5 @@ def main():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     main()
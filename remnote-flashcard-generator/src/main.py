@@ -7,43 +7,75 @@ to transform ML system design content into optimal RemNote flashcards.
 
 import click
 import yaml
+import hashlib
+import io
+import json
 import logging
+import os
+import shutil
+import sys
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple, Union, TYPE_CHECKING
 from rich.console import Console
-from rich.progress import Progress
 from rich.panel import Panel
-from rich.table import Table
+from rich.text import Text
 import time
+from contextlib import nullcontext
+from functools import lru_cache
 
-# Import our components
 try:
-    from .yaml_parser import YAMLParser
-    from .llm_client import create_llm_client
-    from .card_generator import CardGenerator, Flashcard
-    from .remnote_formatter import RemNoteFormatter, FormattingStats
+    # libyaml-backed parser, several times faster than the pure-Python one
+    from yaml import CSafeLoader as SafeLoader
 except ImportError:
-    # Fallback for direct execution
-    from yaml_parser import YAMLParser
-    from llm_client import create_llm_client
-    from card_generator import CardGenerator, Flashcard
-    from remnote_formatter import RemNoteFormatter, FormattingStats
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('flashcard_generator.log'),
-        logging.StreamHandler()
-    ]
-)
+    from yaml import SafeLoader
+
+# Direct execution (python src/main.py) has no package; import siblings through `src`
+if not __package__:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    __package__ = "src"
+
+# Import our components; generation modules are imported on first use so that
+# --help, --validate-only and --dry-run do not pay for them
+from .yaml_parser import YAMLParser, Topic
+
+if TYPE_CHECKING:
+    from .remnote_formatter import FormattingStats
+
 logger = logging.getLogger(__name__)
 
+
+def configure_logging(verbose: bool = False) -> None:
+    """
+    Install the CLI's log handlers; library modules only create loggers.
+    
+    Args:
+        verbose: Log at DEBUG instead of INFO
+    """
+    logging.basicConfig(
+        level=logging.DEBUG if verbose else logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('flashcard_generator.log'),
+            logging.StreamHandler()
+        ]
+    )
+
 # Initialize console for rich output
 console = Console()
 
 
+def status(message: str, live: bool = True):
+    """
+    Show a spinner while a step runs.
+    
+    Args:
+        message: Spinner text
+        live: Render the spinner; when False (non-terminal output or verbose
+            logging) nothing is drawn and no render thread is started
+    """
+    return console.status(message) if live else nullcontext()
+
+
 def load_config(config_path: Path) -> Dict[str, Any]:
     """
     Load configuration from YAML file.
@@ -60,7 +92,7 @@ def load_config(config_path: Path) -> Dict[str, Any]:
     """
     try:
         with open(config_path, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
+            config = yaml.load(f, Loader=SafeLoader)
         
         # Validate essential configuration sections
         required_sections = ['llm', 'generation', 'output']
@@ -83,14 +115,17 @@ def load_config(config_path: Path) -> Dict[str, Any]:
         raise ValueError(f"Error loading configuration: {e}")
 
 
-def save_output(output_path: Path, content: str, stats: FormattingStats) -> None:
+def save_output(output_path: Path, content: Union[str, Path], stats: "FormattingStats",
+                durable: bool = False) -> None:
     """
     Save formatted output to file with comprehensive metadata.
     
     Args:
         output_path: Path where to save the output
-        content: Formatted RemNote content
+        content: Formatted RemNote content, or the path of a file holding it;
+            such a file is copied in after the header and then removed
         stats: Formatting statistics
+        durable: Flush the file to disk with fsync before it replaces the old one
     """
     try:
         # Ensure output directory exists
@@ -98,10 +133,12 @@ def save_output(output_path: Path, content: str, stats: FormattingStats) -> None
         
         # Create comprehensive output with metadata
         timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-        header = f"""# RemNote Flashcard Import
+        card_types = ', '.join(f"{k}: {v}" for k, v in stats.cards_by_type.items())
+        buffer = io.StringIO()
+        buffer.write(f"""# RemNote Flashcard Import
 # Generated on: {timestamp}
 # Total cards: {stats.total_cards}
-# Card types: {', '.join(f"{k}: {v}" for k, v in stats.cards_by_type.items())}
+# Card types: {card_types}
 # Hierarchical levels: {stats.hierarchical_levels}
 # Special characters escaped: {stats.special_chars_escaped}
 #
@@ -112,12 +149,29 @@ def save_output(output_path: Path, content: str, stats: FormattingStats) -> None
 #
 # ========================================
 
-"""
+""")
+        if isinstance(content, str):
+            buffer.write(content)
+        data = memoryview(buffer.getvalue().encode('utf-8'))
         
-        full_content = header + content
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(full_content)
+        # Write a sibling temp file and swap it in so a failed run never leaves a partial file
+        tmp_path = output_path.with_suffix(output_path.suffix + '.tmp')
+        try:
+            # Unbuffered: the encoded payload goes to the kernel in as few write() calls as it allows
+            with open(tmp_path, 'wb', buffering=0) as f:
+                while data:
+                    data = data[f.write(data):]
+                if isinstance(content, Path):
+                    with open(content, 'rb') as body:
+                        shutil.copyfileobj(body, f)
+                if durable:
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        if isinstance(content, Path):
+            content.unlink()
             
         logger.info(f"Output saved to {output_path}")
         
@@ -125,7 +179,13 @@ def save_output(output_path: Path, content: str, stats: FormattingStats) -> None
         raise RuntimeError(f"Failed to save output: {e}")
 
 
-def show_statistics(stats: FormattingStats, llm_info: Dict[str, Any]) -> None:
+@lru_cache(maxsize=None)
+def _row_label(key: str) -> str:
+    """Indented title-case label for a card type or direction; the key set is small and closed."""
+    return f"  {key.title()}"
+
+
+def show_statistics(stats: "FormattingStats", llm_info: Dict[str, Any]) -> None:
     """
     Display comprehensive generation statistics.
     
@@ -133,41 +193,113 @@ def show_statistics(stats: FormattingStats, llm_info: Dict[str, Any]) -> None:
         stats: Formatting statistics
         llm_info: LLM usage information
     """
+    from rich.table import Table
+    
     # Create statistics table
     table = Table(title="Generation Statistics", show_header=True, header_style="bold blue")
     table.add_column("Metric", style="cyan", no_wrap=True)
     table.add_column("Value", style="green")
     
-    # Add formatting stats
-    table.add_row("Total Cards Generated", str(stats.total_cards))
-    table.add_row("Hierarchical Levels", str(stats.hierarchical_levels))
-    table.add_row("Special Characters Escaped", str(stats.special_chars_escaped))
+    separator = ("", "")
+    rows = [
+        ("Total Cards Generated", str(stats.total_cards)),
+        ("Hierarchical Levels", str(stats.hierarchical_levels)),
+        ("Special Characters Escaped", str(stats.special_chars_escaped)),
+    ]
     
     # Add card type breakdown
     if stats.cards_by_type:
-        table.add_row("", "")  # Separator
-        table.add_row("[bold]Card Types[/bold]", "")
-        for card_type, count in stats.cards_by_type.items():
-            table.add_row(f"  {card_type.title()}", str(count))
+        rows.append(separator)
+        rows.append((Text("Card Types", style="bold"), ""))
+        rows.extend((_row_label(card_type), str(count)) for card_type, count in stats.cards_by_type.items())
     
     # Add direction breakdown if available
     if stats.cards_by_direction:
-        table.add_row("", "")  # Separator
-        table.add_row("[bold]Card Directions[/bold]", "")
-        for direction, count in stats.cards_by_direction.items():
-            table.add_row(f"  {direction.title()}", str(count))
+        rows.append(separator)
+        rows.append((Text("Card Directions", style="bold"), ""))
+        rows.extend((_row_label(direction), str(count)) for direction, count in stats.cards_by_direction.items())
     
     # Add LLM usage stats
-    table.add_row("", "")  # Separator
-    table.add_row("[bold]LLM Usage[/bold]", "")
-    table.add_row("Provider", llm_info.get('provider', 'Unknown'))
-    table.add_row("Model", llm_info.get('model', 'Unknown'))
-    table.add_row("Total Tokens Used", str(llm_info.get('total_tokens_used', 0)))
-    table.add_row("API Requests", str(llm_info.get('request_count', 0)))
+    rows += [
+        separator,
+        (Text("LLM Usage", style="bold"), ""),
+        ("Provider", llm_info.get('provider', 'Unknown')),
+        ("Model", llm_info.get('model', 'Unknown')),
+        ("Total Tokens Used", str(llm_info.get('total_tokens_used', 0))),
+        ("Cached Prompt Tokens", str(llm_info.get('cached_tokens', 0))),
+        ("API Requests", str(llm_info.get('request_count', 0))),
+        ("Response Cache Hits", str(llm_info.get('cache_hits', 0))),
+        ("Response Cache Misses", str(llm_info.get('cache_misses', 0))),
+    ]
+    
+    for metric, value in rows:
+        table.add_row(metric, value)
     
     console.print(table)
 
 
+def checkpoint_path(input_path: Path, output_path: Path) -> Path:
+    """Location of the resume checkpoint for an input file, next to the output."""
+    return output_path.parent / f".{input_path.stem}.checkpoint.jsonl"
+
+
+def topic_checkpoint_id(input_path: Path, index: int, topic: Topic) -> str:
+    """
+    Stable identifier of a root topic within an input file.
+    
+    Root topics may share a name, so the identifier also covers the topic's
+    position and content; an edited or moved topic is generated again.
+    """
+    key = f"{input_path.name}|{index}|{topic.name}|{topic.content}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+
+def load_checkpoint(path: Path) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Read the root topics completed by an earlier run.
+    
+    Args:
+        path: Checkpoint file written one JSON line per finished topic
+        
+    Returns:
+        Card records keyed by topic id; empty if there is no checkpoint.
+        A line cut short by an interrupted write is skipped.
+    """
+    done = {}
+    try:
+        f = open(path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return done
+    with f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                done[entry['tid']] = entry['cards']
+            except (ValueError, KeyError, TypeError):
+                logger.warning("Skipping unreadable checkpoint line in %s", path)
+    return done
+
+
+def outline_topics(topics: List[Topic]) -> Tuple[int, List[str]]:
+    """
+    Count topics and build a numbered outline in a single pre-order walk.
+    
+    Args:
+        topics: Root topics
+        
+    Returns:
+        Tuple of (number of topics and subtopics at any depth, outline lines)
+    """
+    lines = []
+    stack = [(topic, str(i), 0) for i, topic in reversed(list(enumerate(topics, 1)))]
+    while stack:
+        topic, number, depth = stack.pop()
+        lines.append(f"{'   ' * depth}{number}. {topic.name}")
+        stack.extend((subtopic, f"{number}.{j}", depth + 1)
+                     for j, subtopic in reversed(list(enumerate(topic.subtopics, 1))))
+    return len(lines), lines
+
+
 def validate_environment(skip_api_keys: bool = False) -> bool:
     """
     Validate that the environment is properly configured.
@@ -182,14 +314,15 @@ def validate_environment(skip_api_keys: bool = False) -> bool:
     
     # Check for API keys (unless skipped)
     if not skip_api_keys:
-        import os
-        if not os.getenv('OPENAI_API_KEY') and not os.getenv('ANTHROPIC_API_KEY'):
+        env = os.environ
+        if not (env.get('OPENAI_API_KEY') or env.get('ANTHROPIC_API_KEY')):
             issues.append("No API keys found. Set either OPENAI_API_KEY or ANTHROPIC_API_KEY in your .env file")
     
-    # Check required directories
-    required_dirs = ['config', 'content', 'output']
-    for dir_name in required_dirs:
-        if not Path(dir_name).exists():
+    # Check required directories with one directory read instead of a stat per name
+    with os.scandir('.') as entries:
+        present = {entry.name for entry in entries if entry.is_dir()}
+    for dir_name in ('config', 'content', 'output'):
+        if dir_name not in present:
             issues.append(f"Required directory missing: {dir_name}")
     
     if issues:
@@ -223,7 +356,24 @@ def validate_environment(skip_api_keys: bool = False) -> bool:
 @click.option('--validate-only', 
               is_flag=True, 
               help='Only validate input file and configuration')
-def main(input: Path, output: Path, config: Path, dry_run: bool, verbose: bool, validate_only: bool):
+@click.option('--batch', 
+              is_flag=True, 
+              help='Submit all prompts through the provider Batch API (cheaper, results within 24h)')
+@click.option('--cache-threshold', 
+              type=click.FloatRange(0.0, 1.0), 
+              default=None,
+              help='Enable the semantic response cache with this cosine similarity threshold')
+@click.option('--no-cache', 
+              is_flag=True, 
+              help='Bypass the response cache for this run')
+@click.option('--clear-cache', 
+              is_flag=True, 
+              help='Delete all cached responses before generating')
+@click.option('--fresh', 
+              is_flag=True, 
+              help='Ignore the checkpoint of an interrupted run and regenerate every topic')
+def main(input: Path, output: Path, config: Path, dry_run: bool, verbose: bool, validate_only: bool,
+         batch: bool, cache_threshold: Optional[float], no_cache: bool, clear_cache: bool, fresh: bool):
     """
     Generate RemNote flashcards from ML system design content.
     
@@ -244,12 +394,18 @@ def main(input: Path, output: Path, config: Path, dry_run: bool, verbose: bool,
         
         # Validate input only
         python main.py -i content/ml_system_design.yaml --validate-only
+        
+        # Large job through the discounted Batch API
+        python main.py -i content/ml_system_design.yaml --batch
     """
     # Configure logging level
+    configure_logging(verbose)
     if verbose:
-        logging.getLogger().setLevel(logging.DEBUG)
         logger.debug("Verbose logging enabled")
     
+    # Spinners and progress bars only help on an interactive terminal, and the log already shows progress
+    live = console.is_terminal and not verbose
+    
     # Show header
     console.print(Panel.fit(
         "[bold blue]RemNote Flashcard Generator[/bold blue]\n"
@@ -257,6 +413,7 @@ def main(input: Path, output: Path, config: Path, dry_run: bool, verbose: bool,
         border_style="blue"
     ))
     
+    llm_client = None
     try:        # Validate environment first (skip API keys for dry runs and validation-only)
         skip_api_validation = dry_run or validate_only
         if not validate_environment(skip_api_keys=skip_api_validation):
@@ -264,7 +421,7 @@ def main(input: Path, output: Path, config: Path, dry_run: bool, verbose: bool,
             raise click.Abort()
         
         # Load and validate configuration
-        with console.status("[bold green]Loading configuration..."):
+        with status("[bold green]Loading configuration...", live):
             config_data = load_config(config)
             console.print(f"✓ Configuration loaded from {config}")
         
@@ -273,12 +430,12 @@ def main(input: Path, output: Path, config: Path, dry_run: bool, verbose: bool,
         parser = YAMLParser(schema_path=schema_path)
         
         # Load and validate content
-        with console.status("[bold green]Loading and validating content..."):
+        with status("[bold green]Loading and validating content...", live):
             content = parser.load_content(input)
             console.print(f"✓ Loaded {len(content.topics)} topics from {input}")
             
-            # Count total concepts (including subtopics)
-            total_concepts = sum(1 + len(topic.subtopics) for topic in content.topics)
+            # Count total concepts (subtopics at any depth) and build the outline in one walk
+            total_concepts, structure = outline_topics(content.topics)
             console.print(f"✓ Found {total_concepts} total concepts to process")
         
         if validate_only:
@@ -288,24 +445,51 @@ def main(input: Path, output: Path, config: Path, dry_run: bool, verbose: bool,
         
         # Initialize LLM client
         if not dry_run:
-            with console.status("[bold green]Initializing LLM client..."):
+            with status("[bold green]Initializing LLM client...", live):
+                from .llm_client import create_llm_client
+                from .llm_cache import PromptCache, SemanticCache
+                
+                cache_config = config_data.get('cache', {})
+                if cache_threshold is not None:
+                    cache_config = {**cache_config, 'semantic': True, 'semantic_threshold': cache_threshold}
+                cache = None
+                if cache_config.get('enabled', True) or clear_cache:
+                    cache = PromptCache(
+                        directory=cache_config.get('directory', '~/.remnote_fc/cache'),
+                        max_entries=cache_config.get('max_entries', 1024),
+                        ttl_seconds=cache_config.get('ttl_seconds', 604800),
+                        always=cache_config.get('always', True)
+                    )
+                    if clear_cache:
+                        cache.clear()
+                        console.print("✓ Response cache cleared")
+                    if no_cache or not cache_config.get('enabled', True):
+                        cache.close()
+                        cache = None
+                semantic_cache = None
+                if cache_config.get('semantic', False) and not no_cache:
+                    semantic_cache = SemanticCache(
+                        threshold=cache_config.get('semantic_threshold', 0.92),
+                        ttl_seconds=cache_config.get('ttl_seconds', 604800),
+                        always=cache_config.get('always', True)
+                    )
                 llm_client = create_llm_client(
                     provider=config_data['llm']['provider'],
                     model=config_data['llm'].get('model'),
                     temperature=config_data['llm'].get('temperature', 0.3),
                     max_tokens=config_data['llm'].get('max_tokens', 2000),
                     retry_attempts=config_data['llm'].get('retry_attempts', 3),
-                    retry_delay=config_data['llm'].get('retry_delay', 2)
+                    retry_delay=config_data['llm'].get('retry_delay', 2),
+                    rpm=config_data['llm'].get('rpm'),
+                    tpm=config_data['llm'].get('tpm'),
+                    cache=cache,
+                    semantic_cache=semantic_cache
                 )
                 console.print(f"✓ LLM client initialized ({config_data['llm']['provider']})")
         else:
             llm_client = None
             console.print("✓ Dry run mode - LLM client skipped")
         
-        # Initialize card generator and formatter
-        generator = CardGenerator(llm_client) if llm_client else None
-        formatter = RemNoteFormatter()
-        
         if dry_run:
             # Dry run mode - just show what would be processed
             console.print(Panel(
@@ -320,57 +504,131 @@ def main(input: Path, output: Path, config: Path, dry_run: bool, verbose: bool,
                 border_style="yellow"
             ))
             
-            # Show topic structure
-            console.print("\n[bold]Topic Structure:[/bold]")
-            for i, topic in enumerate(content.topics, 1):
-                console.print(f"{i}. {topic.name}")
-                for j, subtopic in enumerate(topic.subtopics, 1):
-                    console.print(f"   {i}.{j}. {subtopic.name}")
-            
-            console.print("\n[green]✓ Dry run completed - no files created[/green]")
+            # Show topic structure and the completion note in a single write; topic names
+            # are plain Text so brackets in them are not read as markup
+            console.print(
+                Text.from_markup("\n[bold]Topic Structure:[/bold]"),
+                Text("\n".join(structure)),
+                Text.from_markup("\n[green]✓ Dry run completed - no files created[/green]"),
+                sep="\n"
+            )
             return
         
-        # Generate cards for all topics
-        all_cards: List[Flashcard] = []
+        from rich.progress import Progress
+        from .card_generator import CardGenerator, Flashcard
+        from .remnote_formatter import RemNoteFormatter
+        
+        # Initialize card generator and formatter
+        generator_config = {
+            **config_data['generation'],
+            'max_concurrency': config_data['llm'].get('max_concurrency', 16)
+        }
+        generator = CardGenerator(llm_client, generator_config)
+        formatter = RemNoteFormatter()
+        
+        # Generate cards for all topics. Each root topic's cards are formatted and appended
+        # to a partial file as soon as they are ready, so only running counts stay in memory
+        # and an interrupted run leaves the cards generated so far on disk
+        hierarchy = config_data['remnote']['include_hierarchy']
+        partial_path = output.with_suffix(output.suffix + '.partial')
+        checkpoint_file = checkpoint_path(input, output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        total_cards = 0
         
-        with Progress() as progress:
-            main_task = progress.add_task("[green]Generating cards...", total=len(content.topics))
+        with open(partial_path, 'w', encoding='utf-8', newline='\n', buffering=1 << 20) as body:
+            def _write_cards(topic, cards):
+                nonlocal total_cards
+                formatted = formatter.format_topic_cards(cards, hierarchy=hierarchy)
+                if formatted:
+                    body.write(formatted + "\n")
+                    body.flush()
+                total_cards += len(cards)
             
-            for topic in content.topics:
-                progress.update(main_task, description=f"[green]Processing: {topic.name[:40]}...")
-                
-                try:
-                    # Generate cards for main topic
-                    topic_cards = generator.generate_cards(topic)
-                    all_cards.extend(topic_cards)
+            if batch:
+                # One discounted batch job for every topic; blocks until the provider finishes it
+                with status("[bold green]Waiting for batch job to complete...", live):
+                    _write_cards(None, generator.generate_cards_batch(content.topics))
+            else:
+                # Redraw only when a topic finishes instead of on a background timer
+                with Progress(auto_refresh=False, disable=not live) as progress:
+                    # One step per topic or subtopic at any depth, advanced as each one finishes
+                    total_nodes = total_concepts
+                    main_task = progress.add_task("[green]Generating cards...", total=total_nodes)
                     
-                    # Generate cards for subtopics
-                    for subtopic in topic.subtopics:
-                        subtopic_cards = generator.generate_cards(subtopic, parent_context=topic.name)
-                        all_cards.extend(subtopic_cards)
+                    def _topic_done(topic, error):
+                        if error is not None:
+                            console.print(f"[yellow]⚠ Skipped topic '{topic.name}': {error}[/yellow]")
                     
-                    progress.update(main_task, advance=1)
+                    def _node_done(topic):
+                        progress.update(main_task, advance=1, description=f"[green]Finished: {topic.name[:40]}...",
+                                        refresh=True)
                     
-                except Exception as e:
-                    logger.error(f"Failed to generate cards for topic '{topic.name}': {e}")
-                    console.print(f"[yellow]⚠ Skipped topic '{topic.name}': {e}[/yellow]")
-                    progress.update(main_task, advance=1)
-                    continue
+                    if (config_data['generation'].get('pack_size') or 1) > 1:
+                        # Several topics per JSON request; packs run concurrently
+                        _write_cards(None, generator.generate_cards_packed(
+                            content.topics, on_node_done=_node_done
+                        ))
+                    else:
+                        # Root topics finished by an earlier, interrupted run are restored
+                        # from the checkpoint instead of being generated again
+                        if fresh:
+                            checkpoint_file.unlink(missing_ok=True)
+                        restored = load_checkpoint(checkpoint_file)
+                        topic_ids = [topic_checkpoint_id(input, index, topic)
+                                     for index, topic in enumerate(content.topics)]
+                        position = {tid: index for index, tid in enumerate(topic_ids)}
+                        # Callbacks receive the topic object; equal names must not collide
+                        index_of = {id(topic): index for index, topic in enumerate(content.topics)}
+                        restored = {tid: [Flashcard.from_record(record) for record in records]
+                                    for tid, records in restored.items() if tid in position}
+                        if restored:
+                            console.print(f"✓ Resuming: {len(restored)} topics restored from checkpoint")
+                        for tid, cards in restored.items():
+                            for card in cards:
+                                generator.generated_cards.add(card.source_hash)
+                            progress.update(main_task, advance=outline_topics([content.topics[position[tid]]])[0])
+                        pending = [topic for topic, tid in zip(content.topics, topic_ids) if tid not in restored]
+                        
+                        next_index = 0
+                        
+                        def _write_restored(until):
+                            # Keep output in topic order: write restored topics before index `until`
+                            nonlocal next_index
+                            for tid in topic_ids[next_index:until]:
+                                if tid in restored:
+                                    _write_cards(None, restored[tid])
+                            next_index = max(next_index, until)
+                        
+                        with open(checkpoint_file, 'a', encoding='utf-8', newline='\n') as checkpoint:
+                            def _topic_cards(topic, cards):
+                                index = index_of[id(topic)]
+                                tid = topic_ids[index]
+                                _write_restored(index + 1)
+                                _write_cards(topic, cards)
+                                checkpoint.write(json.dumps(
+                                    {"tid": tid, "ts": time.time(), "cards": [card.to_record() for card in cards]},
+                                    ensure_ascii=False
+                                ) + "\n")
+                                checkpoint.flush()
+                            
+                            # Generate every topic tree concurrently in one event loop run; in-flight
+                            # requests are bounded by llm.max_concurrency and the rate limiters
+                            generator.generate_cards_many(
+                                pending, on_topic_done=_topic_done, on_node_done=_node_done,
+                                on_topic_cards=_topic_cards
+                            )
+                        _write_restored(len(topic_ids))
+                    progress.update(main_task, completed=total_nodes, refresh=True)
         
-        console.print(f"✓ Generated {len(all_cards)} cards total")
-        
-        # Format cards for RemNote
-        with console.status("[bold green]Formatting for RemNote..."):
-            formatted_output = formatter.format_cards(
-                all_cards, 
-                hierarchy=config_data['remnote']['include_hierarchy']
-            )
-            console.print("✓ Cards formatted for RemNote import")
+        console.print(f"✓ Generated {total_cards} cards total")
         
-        # Save output
-        with console.status("[bold green]Saving output..."):
-            save_output(output, formatted_output, formatter.get_stats())
+        # Save output: statistics header first, then the formatted cards
+        with status("[bold green]Saving output...", live):
+            save_output(output, partial_path, formatter.get_stats(),
+                        durable=config_data['output'].get('durable_writes', False))
             console.print(f"✓ Output saved to {output}")
+        # The run is complete; a later run should regenerate rather than resume
+        checkpoint_file.unlink(missing_ok=True)
         
         # Show comprehensive statistics
         console.print("\n")
@@ -380,7 +638,7 @@ def main(input: Path, output: Path, config: Path, dry_run: bool, verbose: bool,
         console.print(Panel(
             f"[green]✓ Generation completed successfully![/green]\n\n"
             f"📁 Output saved to: [bold]{output}[/bold]\n"
-            f"📊 Total cards: [bold]{len(all_cards)}[/bold]\n\n"
+            f"📊 Total cards: [bold]{total_cards}[/bold]\n\n"
             f"[bold]Next steps:[/bold]\n"
             f"1. Open the output file\n"
             f"2. Copy the content (excluding header comments)\n"
@@ -402,6 +660,10 @@ def main(input: Path, output: Path, config: Path, dry_run: bool, verbose: bool,
             border_style="red"
         ))
         raise click.Abort()
+    finally:
+        # Release pooled HTTP connections
+        if llm_client is not None:
+            llm_client.close()
 
 
 if __name__ == "__main__":
@@ -5,14 +5,37 @@ This module loads and manages YAML-based prompt templates for different card typ
 providing a clean separation between prompt content and Python logic.
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple, List, Mapping
+from string import Formatter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
 import yaml
 from pathlib import Path
 import logging
+import os
+
+try:
+    # libyaml-backed parser, several times faster than the pure-Python one
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=64)
+def _load_yaml_cached(path: str, mtime_ns: int) -> Any:
+    """
+    Parse a YAML file, shared by every PromptLoader in the process.
+    
+    The modification time is part of the cache key, so an edited file is
+    parsed again on its next load. Callers must treat the result as read-only.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.load(f, Loader=SafeLoader)
+
+
 class PromptLoader:
     """
     Load and manage prompt templates from YAML files.
@@ -34,6 +57,8 @@ class PromptLoader:
         
         self.prompts_dir = Path(prompts_dir)
         self._cache: Dict[str, Dict[str, Any]] = {}
+        self._compiled: Dict[str, Optional[Tuple[List[str], List[Tuple[str, str]]]]] = {}
+        self._cacheable: Dict[str, str] = {}
         
         # Validate prompts directory exists
         if not self.prompts_dir.exists():
@@ -47,7 +72,8 @@ class PromptLoader:
             card_type: Type of card (concept, basic, cloze, descriptor)
             
         Returns:
-            Dictionary containing prompt template and configuration
+            Dictionary containing the stripped system and user prompts and a
+            read-only view of the configuration
             
         Raises:
             FileNotFoundError: If prompt file doesn't exist
@@ -59,12 +85,13 @@ class PromptLoader:
         
         prompt_file = self.prompts_dir / f"{card_type}_card.yaml"
         
-        if not prompt_file.exists():
+        try:
+            mtime_ns = prompt_file.stat().st_mtime_ns
+        except FileNotFoundError:
             raise FileNotFoundError(f"Prompt file not found: {prompt_file}")
         
         try:
-            with open(prompt_file, 'r', encoding='utf-8') as f:
-                prompt_data = yaml.safe_load(f)
+            prompt_data = _load_yaml_cached(str(prompt_file), mtime_ns)
             
             # Validate required fields
             required_fields = ['system_prompt', 'user_prompt', 'config']
@@ -72,6 +99,15 @@ class PromptLoader:
                 if field not in prompt_data:
                     raise ValueError(f"Missing required field '{field}' in {prompt_file}")
             
+            # Strip once here rather than in every getter; the parsed file is shared
+            # process-wide, so it is copied and its config exposed read-only
+            prompt_data = {
+                **prompt_data,
+                'system_prompt': prompt_data['system_prompt'].strip(),
+                'user_prompt': prompt_data['user_prompt'].strip(),
+                'config': MappingProxyType(prompt_data['config'] or {}),
+            }
+            
             # Cache the loaded prompt
             self._cache[card_type] = prompt_data
             logger.debug(f"Loaded prompt template for {card_type} cards")
@@ -85,18 +121,46 @@ class PromptLoader:
     
     def get_system_prompt(self, card_type: str) -> str:
         """Get system prompt for card type."""
-        prompt_data = self.load_prompt(card_type)
-        return prompt_data['system_prompt'].strip()
+        return self.load_prompt(card_type)['system_prompt']
     
     def get_user_prompt(self, card_type: str) -> str:
         """Get user prompt template for card type."""
-        prompt_data = self.load_prompt(card_type)
-        return prompt_data['user_prompt'].strip()
+        return self.load_prompt(card_type)['user_prompt']
     
-    def get_config(self, card_type: str) -> Dict[str, Any]:
-        """Get configuration for card type."""
-        prompt_data = self.load_prompt(card_type)
-        return prompt_data['config']
+    def get_config(self, card_type: str) -> Mapping[str, Any]:
+        """Get the read-only configuration for card type."""
+        return self.load_prompt(card_type)['config']
+    
+    def _compile(self, card_type: str) -> Optional[Tuple[List[str], List[Tuple[str, str]]]]:
+        """
+        Split a template into literal chunks and (placeholder, format spec) pairs.
+        
+        Returns ``(literals, keys)`` with ``len(literals) == len(keys) + 1``, so
+        formatting is a plain join. Templates using conversions or
+        attribute/index access return None and are formatted with
+        ``str.format_map`` instead.
+        """
+        if card_type in self._compiled:
+            return self._compiled[card_type]
+        
+        literals, keys = [], []
+        current = []
+        compiled = (literals, keys)
+        for literal_text, field_name, format_spec, conversion in Formatter().parse(self.get_user_prompt(card_type)):
+            current.append(literal_text)
+            if field_name is None:
+                continue
+            if conversion or not field_name.isidentifier() or '{' in format_spec:
+                compiled = None
+                break
+            literals.append(''.join(current))
+            keys.append((field_name, format_spec))
+            current = []
+        else:
+            literals.append(''.join(current))
+        
+        self._compiled[card_type] = compiled
+        return compiled
     
     def format_prompt(self, card_type: str, **kwargs) -> str:
         """
@@ -109,23 +173,117 @@ class PromptLoader:
         Returns:
             Formatted prompt string
         """
-        prompt_template = self.get_user_prompt(card_type)
+        compiled = self._compile(card_type)
         
         try:
-            return prompt_template.format(**kwargs)
+            if compiled is None:
+                return self.get_user_prompt(card_type).format_map(kwargs)
+            literals, keys = compiled
+            parts = [literals[0]]
+            for (key, spec), literal in zip(keys, literals[1:]):
+                value = kwargs[key]
+                parts.append(format(value, spec) if spec else str(value))
+                parts.append(literal)
+            return ''.join(parts)
         except KeyError as e:
             logger.error(f"Missing variable {e} for {card_type} prompt")
             raise ValueError(f"Missing required variable {e} for {card_type} prompt")
     
+    def get_static_prefix(self, card_type: str) -> str:
+        """
+        Get the part of a prompt template that precedes its first placeholder.
+        
+        Templates put their fixed instructions first, so this prefix is
+        identical for every topic and can be reused by provider prompt caching.
+        """
+        compiled = self._compile(card_type)
+        if compiled is not None:
+            return compiled[0][0]
+        literals = []
+        for literal_text, field_name, _, _ in Formatter().parse(self.get_user_prompt(card_type)):
+            literals.append(literal_text)
+            if field_name is not None:
+                break
+        return ''.join(literals)
+    
+    def get_cacheable_prefix(self, card_type: str) -> str:
+        """
+        Get the template's system prompt followed by its static prefix.
+        
+        This text is byte-identical for every topic, so it is sent ahead of
+        the per-topic remainder where provider prompt caching can reuse it.
+        """
+        prefix = self._cacheable.get(card_type)
+        if prefix is None:
+            prefix = f"{self.get_system_prompt(card_type)}\n\n{self.get_static_prefix(card_type)}"
+            self._cacheable[card_type] = prefix
+        return prefix
+    
+    def format_prompt_parts(self, card_type: str, **kwargs) -> Tuple[str, str]:
+        """
+        Format user prompt and split it into its static prefix and per-topic suffix.
+        
+        Args:
+            card_type: Type of card
+            **kwargs: Variables to substitute in prompt template
+            
+        Returns:
+            Tuple of (static prefix, formatted remainder); together they equal
+            the result of :meth:`format_prompt`
+        """
+        prompt = self.format_prompt(card_type, **kwargs)
+        prefix = self.get_static_prefix(card_type)
+        return prefix, prompt[len(prefix):]
+    
     def reload_prompts(self):
         """Clear cache and reload all prompts."""
         self._cache.clear()
+        self._compiled.clear()
+        self._cacheable.clear()
         logger.info("Prompt cache cleared - will reload on next access")
     
+    def warm_up(self) -> list[str]:
+        """
+        Load every available prompt template ahead of generation.
+        
+        The files are read and parsed on a small thread pool so the file
+        opens overlap, which matters on slow or virus-scanned filesystems;
+        validation then runs from the shared parse cache.
+        
+        Returns:
+            Names of prompt types that failed to load
+        """
+        card_types = self.list_available_prompts()
+        if len(card_types) > 1:
+            with ThreadPoolExecutor(max_workers=min(8, len(card_types))) as pool:
+                # Errors are ignored here; load_prompt below reports them per type
+                list(pool.map(self._preload, card_types))
+        
+        failed = []
+        for card_type in card_types:
+            try:
+                self.get_config(card_type)
+                self.get_user_prompt(card_type)
+            except (FileNotFoundError, ValueError) as e:
+                logger.warning(f"Could not preload {card_type} prompt: {e}")
+                failed.append(card_type)
+        return failed
+    
+    def _preload(self, card_type: str) -> None:
+        """Parse a prompt file into the shared cache, ignoring any error."""
+        try:
+            prompt_file = self.prompts_dir / f"{card_type}_card.yaml"
+            _load_yaml_cached(str(prompt_file), prompt_file.stat().st_mtime_ns)
+        except Exception:
+            pass
+    
     def list_available_prompts(self) -> list[str]:
         """List all available prompt types."""
-        prompt_files = list(self.prompts_dir.glob("*_card.yaml"))
-        return [f.stem.replace("_card", "") for f in prompt_files]
+        # One directory read; entry types come from the dirent, not a stat per file
+        suffix = "_card.yaml"
+        with os.scandir(self.prompts_dir) as entries:
+            return [entry.name[:-len(suffix)] for entry in entries
+                    if entry.name.endswith(suffix) and entry.is_file()]
 
 
 def main():
@@ -5,10 +5,13 @@ Converts generated flashcards to RemNote import format with full compatibility.
 Handles all card types, hierarchical structure, and special character management.
 """
 
-from typing import List, Dict, Optional, Set
+from typing import List, Dict, Optional, Set, Tuple
+import io
 import re
 from collections import defaultdict, Counter
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from operator import attrgetter
 
 # Import the card classes from card_generator
 try:
@@ -17,6 +20,91 @@ except ImportError:
     # Fallback for direct execution
     from card_generator import Flashcard, CardType, CardDirection
 
+# A well-formed cloze deletion such as {{hidden term}}
+_CLOZE_RE = re.compile(r'\{\{[^}]+\}\}')
+# A RemNote header line
+_HEADER_RE = re.compile(r'^#\s+', re.MULTILINE)
+# A concept separator that has not been backslash-escaped
+_UNESCAPED_CONCEPT_RE = re.compile(r'(?<!\\)::')
+
+# Space-based escaping (RemNote compatible method); Unicode look-alikes are not
+# recognized by RemNote, so each sequence is broken up with a space instead
+_ESCAPE_MAP = {
+    '::': ': :',
+    '>>': '> >',
+    '<<': '< <',
+    ';;': '; ;',
+    '<>': '< >',
+    '#[[': '# [[',  # Reference syntax
+    ']]': '] ]',
+}
+
+# Every escapable sequence contains one of these; clean text skips the scans
+_ESCAPE_TRIGGERS = frozenset(':;<>#]{')
+_ESCAPE_RE = re.compile('|'.join(re.escape(seq) for seq in sorted(_ESCAPE_MAP, key=len, reverse=True)))
+
+
+def _escape_match(match: re.Match) -> str:
+    """Replacement callback for ``_ESCAPE_RE``."""
+    return _ESCAPE_MAP[match.group(0)]
+
+
+@lru_cache(maxsize=4096)
+def _escape_text(text: str) -> Tuple[str, bool]:
+    """
+    Escape RemNote syntax in text, memoized for repeated titles and stems.
+    
+    Returns:
+        Tuple of (escaped text, whether anything was escaped)
+    """
+    # One scan over the text for every sequence at once
+    escaped_text, count = _ESCAPE_RE.subn(_escape_match, text)
+    changed = count > 0
+    while count:
+        # A sequence overlapping a replaced one survives a single pass (the "<>" in "<<>>")
+        escaped_text, count = _ESCAPE_RE.subn(_escape_match, escaped_text)
+    
+    # Handle cloze brackets more carefully
+    # Only escape if they're not part of valid cloze syntax
+    if '{{' in escaped_text and '}}' in escaped_text:
+        # Check if it's valid cloze syntax
+        if not _CLOZE_RE.search(escaped_text):
+            escaped_text = escaped_text.replace('{{', '{ {').replace('}}', '} }')
+            changed = True
+    
+    return escaped_text, changed
+
+
+# C-level field getters for tallying stats without a Python loop per card,
+# used from this batch size up; below it one fused Python loop is faster
+_MAP_COUNT_MIN_CARDS = 256
+_card_type_value = attrgetter('card_type.value')
+_direction_value = attrgetter('direction.value')
+_card_parent = attrgetter('parent')
+
+
+# Separator per card type for its default direction; other types fall back to basic
+_TYPE_SEPARATORS = {
+    CardType.CONCEPT: '::',      # Bidirectional
+    CardType.BASIC: '>>',        # Forward
+    CardType.DESCRIPTOR: ';;',   # Bidirectional
+}
+_DIRECTION_SEPARATORS = {
+    (CardType.CONCEPT, CardDirection.FORWARD): ':>',
+    (CardType.CONCEPT, CardDirection.BACKWARD): ':<',
+    (CardType.BASIC, CardDirection.BACKWARD): '<<',
+    (CardType.BASIC, CardDirection.BIDIRECTIONAL): '<>',
+    (CardType.DESCRIPTOR, CardDirection.FORWARD): ';>',
+    (CardType.DESCRIPTOR, CardDirection.BACKWARD): ';<',
+}
+# Complete (card type, direction) -> separator table; disabled cards never quiz
+_SEPARATORS = {
+    (card_type, direction): '=-' if direction is CardDirection.DISABLED
+    else _DIRECTION_SEPARATORS.get((card_type, direction), _TYPE_SEPARATORS.get(card_type, '>>'))
+    for card_type in CardType
+    for direction in CardDirection
+}
+
 
 @dataclass
 class FormattingStats:
@@ -55,7 +143,7 @@ class RemNoteFormatter:
     def __init__(self):
         """Initialize the formatter with empty statistics."""
         self.stats = FormattingStats()
-        self._reset_stats()
+        self._parents: Set[str] = set()
     
     def format_cards(self, cards: List[Flashcard], hierarchy: bool = True) -> str:
         """
@@ -90,6 +178,32 @@ class RemNoteFormatter:
         self._calculate_final_stats(cards)
         return formatted
     
+    def format_topic_cards(self, cards: List[Flashcard], hierarchy: bool = True) -> str:
+        """
+        Format one topic's flashcards and add them to the running statistics.
+        
+        Unlike :meth:`format_cards`, statistics are not reset, so this can be
+        called once per topic as its cards arrive and the chunks written out
+        one after another. Use a fresh formatter for each output.
+        
+        Args:
+            cards: Flashcards of one root topic and its subtopics
+            hierarchy: Whether to preserve hierarchical structure
+            
+        Returns:
+            String formatted for RemNote import, without a trailing newline
+        """
+        if not cards:
+            return ""
+        
+        if hierarchy:
+            formatted = self._format_hierarchical(cards)
+        else:
+            formatted = self._format_flat(cards)
+        
+        self._accumulate_stats(cards)
+        return formatted
+    
     def _format_hierarchical(self, cards: List[Flashcard]) -> str:
         """
         Format cards with hierarchical structure preserved.
@@ -101,52 +215,71 @@ class RemNoteFormatter:
         root_cards = []
         
         for card in cards:
-            if card.parent:
-                hierarchy[card.parent].append(card)
+            parent = card.parent
+            if parent:
+                hierarchy[parent].append(card)
             else:
                 root_cards.append(card)
         
-        output_lines = []
+        # Bound once; these are called for every card below
+        buf = io.StringIO()
+        write = buf.write
+        format_card = self._format_card
+        
+        # Parents whose children have been written; each group appears exactly once
+        emitted = set()
         
         # Process root level cards
         for card in root_cards:
-            formatted_card = self._format_card(card)
-            output_lines.append(f"# {formatted_card}")
+            formatted_card = format_card(card)
+            write(f"# {formatted_card}\n")
             
-            # Add child cards with proper indentation
-            if card.front in hierarchy or card.back in hierarchy:
-                # Try to find children by front or back content
-                children = hierarchy.get(card.front, []) + hierarchy.get(card.back, [])
-                for child in children:
-                    child_formatted = self._format_card(child)
-                    output_lines.append(f"    # {child_formatted}")
-        
-        # Process remaining hierarchical cards
-        processed_parents = set()
+            # Add child cards with proper indentation, found by front or back content
+            for key in (card.front, card.back):
+                if key in emitted:
+                    continue
+                children = hierarchy.get(key)
+                if children:
+                    for child in children:
+                        child_formatted = format_card(child)
+                        write(f"    # {child_formatted}\n")
+                    emitted.add(key)
+        
+        # Process remaining hierarchical cards under a plain parent heading
         for parent, children in hierarchy.items():
-            if parent not in processed_parents:
-                # Add parent if not already processed
-                output_lines.append(f"# {parent}")
-                for child in children:
-                    child_formatted = self._format_card(child)
-                    output_lines.append(f"    # {child_formatted}")
-                processed_parents.add(parent)
-        
-        return "\n".join(output_lines)
+            if parent in emitted:
+                continue
+            write(f"# {parent}\n")
+            for child in children:
+                child_formatted = format_card(child)
+                write(f"    # {child_formatted}\n")
+        
+        return self._getvalue(buf)
     
     def _format_flat(self, cards: List[Flashcard]) -> str:
         """Format cards in flat structure without hierarchy."""
-        output_lines = []
+        buf = io.StringIO()
+        write = buf.write
+        format_card = self._format_card
         
         for card in cards:
-            formatted_card = self._format_card(card)
+            formatted_card = format_card(card)
             # Add tags if present
-            if card.tags:
-                tags_str = " ".join(f"#{tag}" for tag in card.tags)
+            tags = card.tags
+            if tags:
+                tags_str = " ".join(f"#{tag}" for tag in tags)
                 formatted_card = f"{formatted_card} {tags_str}"
             
-            output_lines.append(f"# {formatted_card}")
-        return "\n".join(output_lines)
+            write(f"# {formatted_card}\n")
+        return self._getvalue(buf)
+    
+    @staticmethod
+    def _getvalue(buf: io.StringIO) -> str:
+        """Return a line buffer's contents without the final newline."""
+        # Truncating in place avoids copying the whole text to slice one character off
+        if buf.tell():
+            buf.truncate(buf.tell() - 1)
+        return buf.getvalue()
     
     def _format_card(self, card: Flashcard) -> str:
         """
@@ -158,85 +291,40 @@ class RemNoteFormatter:
         Returns:
             Formatted string according to RemNote syntax
         """
-        # Escape special characters in content
-        front = self._escape_special_chars(card.front)
-        back = self._escape_special_chars(card.back)
-        
-        # Handle disabled cards first
-        if card.direction == CardDirection.DISABLED:
-            return f"{front} =- {back}"
-        
-        # Format based on card type and direction
-        if card.card_type == CardType.CONCEPT:
-            if card.direction == CardDirection.FORWARD:
-                formatted = f"{front} :> {back}"
-            elif card.direction == CardDirection.BACKWARD:
-                formatted = f"{front} :< {back}"
-            else:  # BIDIRECTIONAL or default
-                formatted = f"{front} :: {back}"
-            
-        elif card.card_type == CardType.BASIC:
-            if card.direction == CardDirection.BACKWARD:
-                formatted = f"{front} << {back}"
-            elif card.direction == CardDirection.BIDIRECTIONAL:
-                formatted = f"{front} <> {back}"
-            else:  # FORWARD or default
-                formatted = f"{front} >> {back}"
-                
-        elif card.card_type == CardType.CLOZE:
-            # Cloze cards use the front text with {{}} syntax
-            formatted = self._format_cloze(card)
-            
-        elif card.card_type == CardType.DESCRIPTOR:
-            if card.direction == CardDirection.BACKWARD:
-                formatted = f"{front} ;< {back}"
-            elif card.direction == CardDirection.FORWARD:
-                formatted = f"{front} ;> {back}"
-            else:  # BIDIRECTIONAL or default
-                formatted = f"{front} ;; {back}"
-            
-        elif card.card_type == CardType.MULTILINE_CONCEPT:
-            formatted = self._format_multiline_concept(card)
-            
-        elif card.card_type == CardType.LIST_ANSWER:
-            formatted = self._format_list_answer(card)
-            
-        elif card.card_type == CardType.MULTIPLE_CHOICE:
-            formatted = self._format_multiple_choice(card)
-            
-        else:
-            # Fallback to basic format
-            formatted = f"{front} >> {back}"
+        card_type = card.card_type
+        direction = card.direction
         
-        return formatted
+        # Types with their own layout escape what they use; disabled cards always
+        # take the plain "front =- back" form
+        special = self._special_formatters.get(card_type)
+        if special is not None and direction is not CardDirection.DISABLED:
+            return special(self, card)
+        
+        # Escape special characters in content
+        escape = self._escape_special_chars
+        front = escape(card.front)
+        back = escape(card.back)
+        return f"{front} {_SEPARATORS[card_type, direction]} {back}"
     
     def _format_cloze(self, card: Flashcard) -> str:
         """
         Format cloze cards with proper bracket syntax.
         
-        Handles multiple cloze deletions and nested brackets.
+        RemNote uses {{text}} for cloze deletions, so the front is written as is:
+        escaping would break the deletions, and text without valid cloze syntax
+        is simply imported as regular text.
         """
-        text = card.front
-        
-        # Ensure proper cloze syntax
-        # RemNote uses {{text}} for cloze deletions
-        cloze_pattern = r'\{\{([^}]+)\}\}'
-          # Validate cloze syntax
-        if not re.search(cloze_pattern, text):
-            # If no valid cloze syntax found, treat as regular text
-            return text
-        
-        return text
+        return card.front
     
     def _format_multiline_concept(self, card: Flashcard) -> str:
         """Format multi-line concept cards with proper delimiters."""
         front = self._escape_special_chars(card.front)
         
-        # Check if card has the use_triple_delimiter attribute for triple delimiter format
-        if hasattr(card, 'use_triple_delimiter') and card.use_triple_delimiter:
+        if card.use_triple_delimiter:
             # Use triple delimiter format: Term :::
             return f"{front} :::"
-        else:            # Use double delimiter + newline format
+        else:
+            # Use double delimiter + newline format
             back = self._escape_special_chars(card.back)
             # Replace \\n with actual line breaks for RemNote
             back_formatted = back.replace('\\n', '\n    ')
@@ -246,9 +334,11 @@ class RemNoteFormatter:
         """Format list answer cards using >>1. syntax."""
         front = self._escape_special_chars(card.front)
         
-        if hasattr(card, 'list_items') and card.list_items:            # Use RemNote's >>1. format for list answers with actual items
+        list_items = card.list_items
+        if list_items:
+            # Use RemNote's >>1. format for list answers with actual items
             lines = [f"{front} >>1."]
-            for item in card.list_items:
+            for item in list_items:
                 escaped_item = self._escape_special_chars(item)
                 lines.append(f"    {escaped_item}")
             return '\n'.join(lines)
@@ -260,10 +350,11 @@ class RemNoteFormatter:
         """Format multiple choice cards using >>A) syntax."""
         front = self._escape_special_chars(card.front)
         
-        if hasattr(card, 'list_items') and card.list_items and len(card.list_items) > 1:
+        list_items = card.list_items
+        if list_items and len(list_items) > 1:
             # Use RemNote's >>A) format for multiple choice with actual options
             lines = [f"{front} >>A)"]
-            for item in card.list_items:
+            for item in list_items:
                 escaped_item = self._escape_special_chars(item)
                 lines.append(f"    {escaped_item}")
             return '\n'.join(lines)
@@ -271,6 +362,14 @@ class RemNoteFormatter:
             # Fallback to basic format if no valid multiple choice setup
             return f"{front} >> {self._escape_special_chars(card.back)}"
     
+    # Card types formatted by a dedicated method rather than a separator
+    _special_formatters = {
+        CardType.CLOZE: _format_cloze,  # Front text with {{}} syntax
+        CardType.MULTILINE_CONCEPT: _format_multiline_concept,
+        CardType.LIST_ANSWER: _format_list_answer,
+        CardType.MULTIPLE_CHOICE: _format_multiple_choice,
+    }
+    
     def _escape_special_chars(self, text: str) -> str:
         """
         Escape characters that interfere with RemNote syntax.
@@ -288,75 +387,83 @@ class RemNoteFormatter:
         Returns:
             Text with special characters properly escaped
         """
-        if not text:
+        # Clean text is returned before the cache so it does not crowd out real entries
+        if not text or _ESCAPE_TRIGGERS.isdisjoint(text):
             return text
         
-        # Count escaped characters for stats
-        original_length = len(text)
-        
-        # Use space-based escaping (RemNote compatible method)
-        # Don't use Unicode replacements - RemNote won't recognize them
-        replacements = {
-            '::': ': :',    # Add space to break syntax
-            '>>': '> >',    # Add space to break syntax
-            '<<': '< <',    # Add space to break syntax
-            ';;': '; ;',    # Add space to break syntax
-            '<>': '< >',    # Add space to break syntax
-            '#[[': '# [[',  # Add space to break reference syntax
-            ']]': '] ]',    # Add space to break reference syntax
-        }
-        
-        escaped_text = text
-        for original, replacement in replacements.items():
-            escaped_text = escaped_text.replace(original, replacement)
+        escaped_text, changed = _escape_text(text)
         
-        # Handle cloze brackets more carefully
-        # Only escape if they're not part of valid cloze syntax
-        if '{{' in escaped_text and '}}' in escaped_text:
-            # Check if it's valid cloze syntax
-            cloze_pattern = r'\{\{([^}]+)\}\}'
-            if not re.search(cloze_pattern, escaped_text):
-                escaped_text = escaped_text.replace('{{', '{ {').replace('}}', '} }')
-        
-        # Update stats
-        if len(escaped_text) != original_length:
+        # Update stats, counted per call so cache hits still register
+        if changed:
             self.stats.special_chars_escaped += 1
         
         return escaped_text
     
     def _calculate_final_stats(self, cards: List[Flashcard]) -> None:
         """Calculate final statistics for the formatting process."""
-        self.stats.total_cards = len(cards)
-        
-        # Count by type
-        type_counter = Counter(card.card_type.value for card in cards)
-        self.stats.cards_by_type = dict(type_counter)
-        
-        # Count by direction
-        direction_counter = Counter(card.direction.value for card in cards)
-        self.stats.cards_by_direction = dict(direction_counter)
-        
-        # Calculate hierarchical levels
-        unique_parents = set(card.parent for card in cards if card.parent)
-        self.stats.hierarchical_levels = len(unique_parents)
+        # Start the counts over; special_chars_escaped was already counted while formatting
+        stats = self.stats
+        stats.total_cards = 0
+        stats.cards_by_type.clear()
+        stats.cards_by_direction.clear()
+        self._parents.clear()
+        self._accumulate_stats(cards)
+    
+    def _accumulate_stats(self, cards: List[Flashcard]) -> None:
+        """Add a chunk of formatted cards to the running statistics."""
+        stats = self.stats
+        stats.total_cards += len(cards)
+        by_type = stats.cards_by_type
+        by_direction = stats.cards_by_direction
+        parents = self._parents
+        
+        if len(cards) < _MAP_COUNT_MIN_CARDS:
+            # Per-topic chunks are small, where building Counters costs more than it saves
+            for card in cards:
+                card_type = card.card_type.value
+                by_type[card_type] = by_type.get(card_type, 0) + 1
+                direction = card.direction.value
+                by_direction[direction] = by_direction.get(direction, 0) + 1
+                parent = card.parent
+                if parent:
+                    parents.add(parent)
+        else:
+            # Counter over map() counts in C, which beats the fused loop on large batches;
+            # only the few distinct keys are merged by hand
+            for counts, totals in ((Counter(map(_card_type_value, cards)), by_type),
+                                   (Counter(map(_direction_value, cards)), by_direction)):
+                for key, count in counts.items():
+                    totals[key] = totals.get(key, 0) + count
+            parents.update(filter(None, map(_card_parent, cards)))
+        stats.hierarchical_levels = len(parents)
     
     def _reset_stats(self) -> None:
         """Reset statistics for new formatting operation."""
-        self.stats = FormattingStats()
+        # Cleared in place rather than reallocated on every format_cards call
+        stats = self.stats
+        stats.total_cards = 0
+        stats.cards_by_type.clear()
+        stats.cards_by_direction.clear()
+        stats.hierarchical_levels = 0
+        stats.special_chars_escaped = 0
+        self._parents.clear()
     
     def get_stats(self) -> FormattingStats:
         """
         Get formatting statistics.
         
         Returns:
-            FormattingStats object with detailed information
+            Snapshot of the statistics; later formatting does not change it
             
         Example:
             >>> stats = formatter.get_stats()
             >>> print(f"Total cards: {stats.total_cards}")
             >>> print(f"By type: {stats.cards_by_type}")
         """
-        return self.stats
+        # A copy, since the formatter resets its own counters in place
+        stats = self.stats
+        return replace(stats, cards_by_type=dict(stats.cards_by_type),
+                       cards_by_direction=dict(stats.cards_by_direction))
     
     def generate_import_header(self, title: str = "Generated Flashcards") -> str:
         """
@@ -368,15 +475,15 @@ class RemNoteFormatter:
         Returns:
             Formatted header string
         """
-        header = f"# {title}\n"
-        header += f"Generated {self.stats.total_cards} flashcards\n"
+        parts = [f"# {title}\n", f"Generated {self.stats.total_cards} flashcards\n"]
         if self.stats.cards_by_type:
-            header += "Card types: " + ", ".join(
+            card_types = ", ".join(
                 f"{card_type}({count})" 
                 for card_type, count in self.stats.cards_by_type.items()
-            ) + "\n"
-        header += "\n"
-        return header
+            )
+            parts.append(f"Card types: {card_types}\n")
+        parts.append("\n")
+        return "".join(parts)
     
     def validate_remnote_format(self, formatted_text: str) -> Dict[str, bool]:
         """
@@ -389,11 +496,11 @@ class RemNoteFormatter:
             Dictionary with validation results
         """
         validation_results = {
-            "has_headers": bool(re.search(r'^#\s+', formatted_text, re.MULTILINE)),
-            "proper_concept_syntax": bool(re.search(r'::', formatted_text)),
-            "proper_basic_syntax": bool(re.search(r'>>', formatted_text)),
-            "proper_descriptor_syntax": bool(re.search(r';;', formatted_text)),
-            "no_unescaped_syntax": not bool(re.search(r'(?<!\\)::', formatted_text)),
+            "has_headers": bool(_HEADER_RE.search(formatted_text)),
+            "proper_concept_syntax": '::' in formatted_text,
+            "proper_basic_syntax": '>>' in formatted_text,
+            "proper_descriptor_syntax": ';;' in formatted_text,
+            "no_unescaped_syntax": not _UNESCAPED_CONCEPT_RE.search(formatted_text),
             "valid_cloze_syntax": self._validate_cloze_syntax(formatted_text),
         }
         
@@ -402,8 +509,7 @@ class RemNoteFormatter:
     def _validate_cloze_syntax(self, text: str) -> bool:
         """Validate cloze deletion syntax."""
         # Check for properly formed cloze deletions
-        cloze_pattern = r'\{\{[^}]+\}\}'
-        cloze_matches = re.findall(cloze_pattern, text)
+        cloze_matches = _CLOZE_RE.findall(text)
         
         # Check for unmatched brackets
         open_brackets = text.count('{{')
@@ -6,15 +6,14 @@ ML content, ensuring data integrity before LLM processing.
 """
 
 from typing import Dict, List, Any, Optional
+from functools import cached_property
 import yaml
-import jsonschema
 from pathlib import Path
 from pydantic import BaseModel, Field, field_validator
 import logging
 from rich.console import Console
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 console = Console()
 
@@ -54,13 +53,48 @@ class Topic(BaseModel):
             raise ValueError("Topic content must be at least 10 characters")
         return v.strip()
     
-    @field_validator('difficulty')
+    @field_validator('difficulty', mode='before')
     @classmethod
     def validate_difficulty(cls, v):
-        """Validate difficulty level."""
-        if v and v not in ['beginner', 'intermediate', 'advanced']:
+        """Validate and normalize difficulty level, defaulting to intermediate."""
+        if v is None:
+            return "intermediate"
+        if not isinstance(v, str):
+            raise ValueError("Difficulty must be 'beginner', 'intermediate', or 'advanced'")
+        v = v.strip().lower() or "intermediate"
+        if v not in ['beginner', 'intermediate', 'advanced']:
             raise ValueError("Difficulty must be 'beginner', 'intermediate', or 'advanced'")
         return v
+    
+    # Prompt-ready views of the topic, computed once per topic. They assume the
+    # topic is not modified after it has been handed to the card generator.
+    
+    @cached_property
+    def content_500(self) -> str:
+        """Content truncated to 500 characters for short prompts."""
+        return self.content if len(self.content) <= 500 else self.content[:500] + "..."
+    
+    @cached_property
+    def content_300(self) -> str:
+        """Content truncated to 300 characters for short prompts."""
+        return self.content if len(self.content) <= 300 else self.content[:300] + "..."
+    
+    @cached_property
+    def examples_joined(self) -> str:
+        """Comma-separated examples, or "None" when there are none."""
+        return ", ".join(self.examples) if self.examples else "None"
+    
+    @cached_property
+    def key_concepts_joined(self) -> str:
+        """Comma-separated key concepts, or "None" when there are none."""
+        return ", ".join(self.key_concepts) if self.key_concepts else "None"
+    
+    @cached_property
+    def examples_bullets(self) -> str:
+        """First four examples as a bulleted list, falling back to the content."""
+        if not self.examples:
+            return self.content
+        return '\n'.join(f"- {example}" for example in self.examples[:4])
 
 
 class MLContent(BaseModel):
@@ -166,6 +200,7 @@ class YAMLParser:
         
         # Validate against schema if available
         if self.schema:
+            import jsonschema  # Deferred: only needed when a schema is configured
             try:
                 jsonschema.validate(raw_data, self.schema)
                 logger.info("Content passed schema validation")
@@ -420,4 +455,5 @@ def main():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     main()
@@ -5,20 +5,29 @@ This module contains fundamental tests covering critical paths and edge cases
 for the flashcard generation system, updated for the latest formatter implementation.
 """
 
+import asyncio
+import json
+import os
+import sys
 import pytest
 import tempfile
+import threading
 import yaml
+from dataclasses import asdict, replace
 from pathlib import Path
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
 # Import with fallback for both test and direct execution
 try:
     import sys
     sys.path.append(str(Path(__file__).parent.parent / "src"))
     from yaml_parser import YAMLParser, MLContent, Topic
-    from card_generator import CardGenerator, Flashcard, CardType, CardDirection
+    from card_generator import CardGenerator, Flashcard, CardType, CardDirection, HashFilter
     from remnote_formatter import RemNoteFormatter
-    from llm_client import LLMClient, OpenAIClient, AnthropicClient, create_llm_client, LLMError, LLMConfig, LLMProvider
+    from llm_client import LLMClient, OpenAIClient, AnthropicClient, create_llm_client, LLMError, RateLimitError, LLMConfig, LLMProvider, _get_encoding, _count_tokens, SYSTEM_PROMPT, _rate_limits, _api_key
+    from llm_cache import PromptCache, SemanticCache
+    from prompt_loader import PromptLoader
+    from config_manager import ConfigurationManager, get_api_key, reset_env_cache, load_default_config
 except ImportError as e:
     print(f"Import error: {e}")    # Ensure we still have the classes available for tests
     sys.path.append(str(Path(__file__).parent.parent / "src"))
@@ -144,6 +153,15 @@ class TestYAMLParser:
                 self.parser.load_content(temp_path)
         finally:
             temp_path.unlink()
+            
+    def test_topic_difficulty_validation(self):
+        """Test difficulty normalization and rejection of non-string values."""
+        from pydantic import ValidationError
+        
+        assert Topic(name="Kafka", content="Distributed commit log", difficulty=" Advanced ").difficulty == "advanced"
+        assert Topic(name="Kafka", content="Distributed commit log", difficulty=None).difficulty == "intermediate"
+        with pytest.raises(ValidationError, match="Difficulty must be"):
+            Topic(name="Kafka", content="Distributed commit log", difficulty=1)
 
 
 class TestCardGenerator:
@@ -156,7 +174,7 @@ class TestCardGenerator:
         
     def test_generate_concept_card(self):
         """Test generation of concept cards."""
-        self.mock_llm.generate.return_value = "Lambda Architecture :: Data processing pattern combining batch and stream processing"
+        self.mock_llm.agenerate.return_value = "Lambda Architecture :: Data processing pattern combining batch and stream processing"
         
         topic = Topic(
             name="Lambda Architecture",
@@ -169,7 +187,7 @@ class TestCardGenerator:
         assert len(cards) > 0
         
         # Check that LLM was called
-        assert self.mock_llm.generate.called
+        assert self.mock_llm.agenerate.called
         
     def test_generate_multiple_card_types(self):
         """Test generation of multiple card types for a single topic."""
@@ -179,7 +197,7 @@ class TestCardGenerator:
             "What is Lambda Architecture? >> A data processing pattern",
             "Lambda Architecture uses {{batch}} and {{stream}} processing"
         ]
-        self.mock_llm.generate.side_effect = responses
+        self.mock_llm.agenerate.side_effect = responses
         
         topic = Topic(
             name="Lambda Architecture",
@@ -195,7 +213,7 @@ class TestCardGenerator:
     def test_duplicate_detection(self):
         """Test that duplicate cards are detected and avoided."""
         # Return the same response twice
-        self.mock_llm.generate.return_value = "Lambda Architecture :: Same definition"
+        self.mock_llm.agenerate.return_value = "Lambda Architecture :: Same definition"
         
         topic = Topic(
             name="Lambda Architecture",
@@ -211,7 +229,7 @@ class TestCardGenerator:
         
     def test_error_handling_llm_failure(self):
         """Test handling of LLM API failures."""
-        self.mock_llm.generate.side_effect = Exception("API Error")
+        self.mock_llm.agenerate.side_effect = Exception("API Error")
         
         topic = Topic(
             name="Test Topic",
@@ -228,13 +246,348 @@ class TestCardGenerator:
             content="Minimal content"  # Must be at least 10 characters for validation
         )
         
-        self.mock_llm.generate.return_value = "Empty Topic :: Minimal definition"
+        self.mock_llm.agenerate.return_value = "Empty Topic :: Minimal definition"
         
         cards = self.generator.generate_cards(topic)
         
         # Should still generate at least one card
         assert len(cards) > 0
 
+    def test_max_concurrency_limits_in_flight_calls(self):
+        """Test that concurrent LLM calls never exceed max_concurrency."""
+        import asyncio
+        in_flight = 0
+        peak = 0
+
+        async def slow_generate(prompt, temperature=None, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return "Lambda Architecture :: Data processing pattern"
+
+        self.mock_llm.agenerate.side_effect = slow_generate
+        generator = CardGenerator(self.mock_llm, {'max_concurrency': 2})
+        topic = Topic(
+            name="Lambda Architecture",
+            content="Detailed content about lambda architecture...",
+            key_concepts=["batch processing", "stream processing"],
+            examples=["Netflix", "LinkedIn", "Uber"]
+        )
+
+        generator.generate_cards(topic)
+
+        assert self.mock_llm.agenerate.call_count > 2
+        assert peak == 2
+
+    def test_subtopic_tree_processed_once_in_order(self):
+        """Test that nested subtopics are each generated once, parents first."""
+        async def echo_topic(prompt, temperature=None, **kwargs):
+            name = prompt.split("**Topic:** ", 1)[1].split("\n", 1)[0]
+            return f"{name} :: Definition of {name}"
+
+        self.mock_llm.agenerate.side_effect = echo_topic
+        leaf = Topic(name="Leaf", content="Leaf topic content")
+        child = Topic(name="Child", content="Child topic content", subtopics=[leaf])
+        sibling = Topic(name="Sibling", content="Sibling topic content")
+        root = Topic(name="Root", content="Root topic content", subtopics=[child, sibling])
+
+        cards = self.generator.generate_cards(root)
+
+        concept_fronts = [card.front for card in cards if card.card_type == CardType.CONCEPT]
+        assert concept_fronts == ["Root", "Child", "Leaf", "Sibling"]
+        assert self.generator.generation_stats["topics_processed"] == 4
+        assert [card.parent for card in cards if card.card_type == CardType.CONCEPT] == [None, "Root", "Child", "Root"]
+
+    def test_prompt_prefix_is_topic_independent(self):
+        """Test that every template starts with a static, cacheable instruction block."""
+        loader = self.generator.prompt_loader
+        kwargs = dict(context_info=" (part of Parent)", topic_name="Unique Topic Name",
+                      content="Some content", num_cards=2, examples="- a", key_concepts="b",
+                      card_sections="- c", topics_json="[]")
+        for card_type in loader.list_available_prompts():
+            prefix, suffix = loader.format_prompt_parts(card_type, **kwargs)
+            assert prefix + suffix == loader.format_prompt(card_type, **kwargs)
+            assert len(prefix) > len(suffix) / 2
+            assert "Unique Topic Name" not in prefix
+
+    def test_prompt_files_parsed_once_per_mtime(self, tmp_path):
+        """Test that prompt YAML is parsed once per process and again after the file changes."""
+        prompt_file = tmp_path / "basic_card.yaml"
+        prompt_file.write_text("system_prompt: s\nuser_prompt: first\nconfig: {}\n", encoding='utf-8')
+        
+        with patch('yaml.load', wraps=yaml.load) as load:
+            assert PromptLoader(tmp_path).get_user_prompt("basic") == "first"
+            assert PromptLoader(tmp_path).get_user_prompt("basic") == "first"
+            assert load.call_count == 1
+            
+            prompt_file.write_text("system_prompt: s\nuser_prompt: second\nconfig: {}\n", encoding='utf-8')
+            os.utime(prompt_file, ns=(0, prompt_file.stat().st_mtime_ns + 1_000_000))
+            assert PromptLoader(tmp_path).get_user_prompt("basic") == "second"
+            assert load.call_count == 2
+    
+    def test_loaded_prompt_is_stripped_and_config_read_only(self, tmp_path):
+        """Test that prompt text is stripped on load and the shared config cannot be mutated."""
+        (tmp_path / "basic_card.yaml").write_text(
+            "system_prompt: '  s  '\nuser_prompt: |\n  body\n\nconfig:\n  max_cards: 3\n", encoding='utf-8'
+        )
+        loader = PromptLoader(tmp_path)
+        
+        assert loader.get_system_prompt("basic") == "s"
+        assert loader.get_user_prompt("basic") == "body"
+        with pytest.raises(TypeError):
+            loader.get_config("basic")["max_cards"] = 10
+        assert PromptLoader(tmp_path).get_config("basic")["max_cards"] == 3
+    
+    def test_warm_up_preloads_in_parallel_and_reports_failures(self, tmp_path):
+        """Test that warm-up parses every template once and names the broken ones."""
+        for name in ("basic", "cloze"):
+            (tmp_path / f"{name}_card.yaml").write_text(
+                f"system_prompt: s\nuser_prompt: {name}\nconfig: {{}}\n", encoding='utf-8'
+            )
+        (tmp_path / "broken_card.yaml").write_text("system_prompt: [unclosed\n", encoding='utf-8')
+        loader = PromptLoader(tmp_path)
+        
+        with patch('yaml.load', wraps=yaml.load) as load:
+            assert loader.warm_up() == ["broken"]
+            assert loader.get_user_prompt("cloze") == "cloze"
+        # Valid files are parsed once; the broken one is retried by load_prompt
+        assert load.call_count == 4
+    
+    def test_compiled_template_applies_format_specs(self, tmp_path):
+        """Test that precompiled templates honour format specs and report missing fields."""
+        (tmp_path / "basic_card.yaml").write_text(
+            "system_prompt: s\nuser_prompt: 'Make {num_cards:02d} cards on {topic_name!r}'\nconfig: {}\n"
+            "", encoding='utf-8'
+        )
+        (tmp_path / "cloze_card.yaml").write_text(
+            "system_prompt: s\nuser_prompt: 'Make {num_cards:>3} cards on {topic_name}'\nconfig: {}\n",
+            encoding='utf-8'
+        )
+        loader = PromptLoader(tmp_path)
+        
+        assert loader.format_prompt("cloze", num_cards=2, topic_name="Kafka") == "Make   2 cards on Kafka"
+        assert loader._compile("cloze") is not None
+        # Conversions still go through str.format
+        assert loader.format_prompt("basic", num_cards=2, topic_name="Kafka") == "Make 02 cards on 'Kafka'"
+        with pytest.raises(ValueError, match="topic_name"):
+            loader.format_prompt("cloze", num_cards=2)
+    
+    def test_request_prefix_carries_template_system_prompt(self):
+        """Test that the template system prompt leads the cacheable prefix of every request."""
+        loader = self.generator.prompt_loader
+        first = self.generator._build_basic_prompt(Topic(name="Kafka", content="Distributed commit log"))
+        second = self.generator._build_basic_prompt(
+            Topic(name="Feature Store", content="Serving features consistently"), "Data Platform"
+        )
+        
+        assert first.prefix == second.prefix
+        assert first.prefix.startswith(loader.get_system_prompt("basic"))
+        assert first.prompt.startswith(first.prefix) and "Kafka" not in first.prefix
+    
+    def test_generate_cards_batch(self):
+        """Test that batch generation submits all prompts at once and maps results back."""
+        def fake_batch(requests, poll_interval=30.0):
+            results = {}
+            for request in requests:
+                index, kind = request["custom_id"].split("-", 1)
+                if kind == "concept":
+                    results[request["custom_id"]] = f"Topic {index} :: Definition {index}"
+            return results
+
+        self.mock_llm.run_batch.side_effect = fake_batch
+        child = Topic(name="Child", content="Child topic content")
+        root = Topic(name="Root", content="Root topic content", subtopics=[child])
+
+        cards = self.generator.generate_cards_batch([root])
+
+        assert self.mock_llm.run_batch.call_count == 1
+        assert not self.mock_llm.agenerate.called
+        custom_ids = [r["custom_id"] for r in self.mock_llm.run_batch.call_args.args[0]]
+        assert len(custom_ids) == len(set(custom_ids))
+        assert [card.front for card in cards] == ["Topic 0", "Topic 1"]
+        assert cards[1].parent == "Root"
+
+    def test_generate_cards_many_streams_topics_in_order(self):
+        """Test that each root topic's cards reach on_topic_cards in topic order, not completion order."""
+        async def fake_agenerate(prompt, **kwargs):
+            if "Slow" in prompt:
+                await asyncio.sleep(0.05)
+            return "Term :: Definition for " + ("slow" if "Slow" in prompt else "fast")
+        
+        self.mock_llm.agenerate.side_effect = fake_agenerate
+        topics = [Topic(name="Slow", content="Slow topic content"), Topic(name="Fast", content="Fast topic content")]
+        received = []
+        
+        cards = self.generator.generate_cards_many(
+            topics, on_topic_cards=lambda topic, produced: received.append((topic.name, len(produced)))
+        )
+        
+        assert cards == []
+        assert [name for name, _ in received] == ["Slow", "Fast"]
+        assert all(count > 0 for _, count in received)
+    
+    def test_generate_cards_packed(self):
+        """Test that packed generation sends several topics per request and falls back per topic."""
+        packs = []
+        
+        async def fake_agenerate(prompt, **kwargs):
+            if '"results"' in prompt:
+                # Answer for the first topic of each pack only
+                packs.append(prompt)
+                return ('{"results": [{"id": 0, "concept": {"term": "Packed", '
+                        f'"definition": "From pack {len(packs)}"}}}}]}}')
+            return '{"concept": {"term": "Single", "definition": "From a per-topic call"}}'
+        
+        self.mock_llm.agenerate.side_effect = fake_agenerate
+        generator = CardGenerator(self.mock_llm, {'pack_size': 2, 'card_types': {
+            'basic': False, 'cloze': False, 'descriptor': False, 'multiple_choice': False,
+            'multiline': False, 'list_answer': False}})
+        children = [Topic(name=f"Child {i}", content=f"Child topic content {i}") for i in range(2)]
+        root = Topic(name="Root", content="Root topic content", subtopics=children)
+        
+        cards = generator.generate_cards_packed([root])
+        
+        # Two packs for three topics, plus one per-topic call for the topic left out
+        assert self.mock_llm.agenerate.call_count == 3
+        assert [(card.front, card.tags[0]) for card in cards] == [
+            ("Packed", "Root"), ("Single", "Child 0"), ("Packed", "Child 1")
+        ]
+        assert cards[2].parent == "Root"
+
+    def test_flashcard_record_round_trip(self):
+        """Test that cards survive the checkpoint's JSON record format unchanged."""
+        card = Flashcard(
+            card_type=CardType.MULTIPLE_CHOICE,
+            front="Which log?",
+            back="",
+            parent="Streaming",
+            tags=["Kafka"],
+            direction=CardDirection.BIDIRECTIONAL,
+            list_items=["Kafka", "Redis", "S3"]
+        )
+        
+        record = json.loads(json.dumps(card.to_record()))
+        
+        assert record["card_type"] == "multiple_choice"
+        assert Flashcard.from_record(record) == card
+    
+    def test_hash_filter_switches_to_bitmap(self):
+        """Test that the dedup filter keeps membership after leaving exact mode."""
+        seen = HashFilter(exact_limit=2)
+        for source_hash in ("0000000a", "0000000b", "0000000c"):
+            seen.add(source_hash)
+        
+        assert len(seen) == 3
+        assert "0000000a" in seen and "0000000c" in seen
+        assert "0000000d" not in seen
+        seen.add("0000000d")
+        assert "0000000d" in seen
+        
+        seen.clear()
+        assert "0000000a" not in seen
+
+    def test_multi_output_single_call(self):
+        """Test that multi_output builds every LLM card type from one JSON response."""
+        self.mock_llm.agenerate.return_value = """```json
+        {"concept": {"term": "Lambda Architecture", "definition": "Batch plus stream processing"},
+         "basic": [{"question": "What does the speed layer do?", "answer": "Processes recent data"}],
+         "cloze": ["Lambda combines {{batch}} and {{stream}} layers"],
+         "descriptor": [{"attribute": "Latency", "value": "Low for the speed layer"}],
+         "multiple_choice": {"question": "Who popularised it?", "options": ["Nathan Marz", "Jay Kreps", "Martin Fowler"]}}
+        ```"""
+        generator = CardGenerator(self.mock_llm, {'multi_output': True})
+        topic = Topic(
+            name="Lambda Architecture",
+            content="Lambda architecture is a data processing architecture...",
+            key_concepts=["batch layer", "speed layer"],
+            examples=["Netflix", "LinkedIn", "Twitter"]
+        )
+
+        cards = generator.generate_cards(topic)
+
+        assert self.mock_llm.agenerate.call_count == 1
+        assert self.mock_llm.agenerate.call_args.kwargs['response_format'] == {"type": "json_object"}
+        llm_types = {card.card_type for card in cards} - {CardType.LIST_ANSWER}
+        assert llm_types == {CardType.CONCEPT, CardType.BASIC, CardType.CLOZE,
+                             CardType.DESCRIPTOR, CardType.MULTIPLE_CHOICE}
+
+    def test_multi_output_falls_back_on_invalid_json(self):
+        """Test that an unparseable combined response falls back to per-type prompts."""
+        self.mock_llm.agenerate.return_value = "Lambda Architecture :: Data processing pattern"
+        generator = CardGenerator(self.mock_llm, {'multi_output': True})
+        topic = Topic(
+            name="Lambda Architecture",
+            content="Lambda architecture is a data processing architecture..."
+        )
+
+        cards = generator.generate_cards(topic)
+
+        assert self.mock_llm.agenerate.call_count > 1
+        assert any(card.card_type == CardType.CONCEPT for card in cards)
+
+    def test_generate_cards_many_isolates_failing_topics(self):
+        """Test that one failing root topic is reported and skipped while others still produce cards."""
+        self.mock_llm.agenerate.return_value = "Term :: Definition"
+        generator = CardGenerator(self.mock_llm)
+        good = Topic(name="Good Topic", content="Content about the good topic")
+        bad = Topic(name="Bad Topic", content="Content about the bad topic")
+        done = []
+        
+        original = generator._agenerate_topic_cards
+        
+        async def failing_topic(topic, parent_context=None):
+            if topic.name == "Bad Topic":
+                raise RuntimeError("boom")
+            return await original(topic, parent_context)
+        
+        generator._agenerate_topic_cards = failing_topic
+        cards = generator.generate_cards_many([bad, good], on_topic_done=lambda t, e: done.append((t.name, e)))
+        
+        assert cards and all(card.tags[0] == "Good Topic" for card in cards)
+        assert sorted(name for name, _ in done) == ["Bad Topic", "Good Topic"]
+        assert isinstance(dict(done)["Bad Topic"], RuntimeError)
+        assert dict(done)["Good Topic"] is None
+    
+    def test_generate_cards_many_reports_each_node(self):
+        """Test that every topic and subtopic is reported once its own cards are generated."""
+        self.mock_llm.agenerate.return_value = "Term :: Definition"
+        generator = CardGenerator(self.mock_llm)
+        child = Topic(name="Child Topic", content="Content about the child topic")
+        root = Topic(name="Root Topic", content="Content about the root topic", subtopics=[child])
+        other = Topic(name="Other Topic", content="Content about another topic")
+        nodes = []
+        
+        generator.generate_cards_many([root, other], on_node_done=lambda t: nodes.append(t.name))
+        
+        assert sorted(nodes) == ["Child Topic", "Other Topic", "Root Topic"]
+    
+    def test_stream_parses_lines_and_stops_at_max_cards(self):
+        """Test that streamed basic cards are parsed across chunks and the stream is closed early."""
+        chunks_sent = []
+
+        async def fake_stream(prompt, temperature=None, **kwargs):
+            for chunk in ["What is X? >> A ", "tool\nWhat is Y", "? >> B\nWhat is Z? >> C\n",
+                          "What is W? >> D\n", "What is V? >> E\n"]:
+                chunks_sent.append(chunk)
+                yield chunk
+
+        self.mock_llm.agenerate_stream = fake_stream
+        generator = CardGenerator(self.mock_llm, {
+            'stream': True,
+            'card_types': {'concept': False, 'cloze': False, 'descriptor': False}
+        })
+        topic = Topic(name="Streaming", content="Token streaming")
+
+        cards = generator.generate_cards(topic)
+
+        basic = [card for card in cards if card.card_type == CardType.BASIC]
+        assert [card.front for card in basic] == ["What is X?", "What is Y?", "What is Z?"]
+        assert basic[0].back == "A tool"
+        assert len(chunks_sent) == 3
+        self.mock_llm.agenerate.assert_not_called()
+
 
 class TestRemNoteFormatter:
     """Test suite for basic RemNote formatting functionality (non-overlapping with test_formatter_features.py)."""
@@ -260,6 +613,18 @@ Uses {{batch}} and {{stream}} processing
         assert 'proper_concept_syntax' in validation_result
         assert 'proper_basic_syntax' in validation_result
         
+    def test_format_validation_results(self):
+        """Test the individual checks of RemNote format validation."""
+        result = self.formatter.validate_remnote_format(
+            "# Kafka :: Distributed log\n    # Retention ;; 7 days\n    # Uses {{partitions}} for scale"
+        )
+        
+        assert result["has_headers"] and result["proper_concept_syntax"] and result["proper_descriptor_syntax"]
+        assert not result["proper_basic_syntax"]
+        assert not result["no_unescaped_syntax"]
+        assert result["valid_cloze_syntax"]
+        assert not self.formatter.validate_remnote_format("Uses {{broken")["valid_cloze_syntax"]
+        
     def test_hierarchical_formatting(self):
         """Test preservation of hierarchical structure."""
         cards = [
@@ -287,6 +652,140 @@ Uses {{batch}} and {{stream}} processing
         # Should preserve indentation for child elements
         lines = formatted.split('\n')
         assert any(line.startswith('    ') for line in lines)  # Should have indented lines
+    
+    def test_hierarchical_formatting_writes_children_once(self):
+        """Test that children attached to a root card are not repeated under a bare heading."""
+        cards = [
+            Flashcard(card_type=CardType.CONCEPT, front="Kafka", back="Distributed log"),
+            Flashcard(card_type=CardType.DESCRIPTOR, front="Retention", back="7 days", parent="Kafka"),
+            Flashcard(card_type=CardType.BASIC, front="Why?", back="Scale", parent="Feature Store"),
+        ]
+        
+        lines = self.formatter.format_cards(cards, hierarchy=True).split("\n")
+        
+        assert lines == ["# Kafka :> Distributed log", "    # Retention ;> 7 days",
+                         "# Feature Store", "    # Why? >> Scale"]
+    
+    def test_format_topic_cards_accumulates_stats(self):
+        """Test that per-topic formatting keeps running totals across calls."""
+        first = [Flashcard(card_type=CardType.CONCEPT, front="Kafka", back="Distributed log"),
+                 Flashcard(card_type=CardType.BASIC, front="Why?", back="Replay", parent="Kafka")]
+        second = [Flashcard(card_type=CardType.BASIC, front="What?", back="Store", parent="Feature Store")]
+        
+        chunks = [self.formatter.format_topic_cards(first), self.formatter.format_topic_cards(second)]
+        stats = self.formatter.get_stats()
+        
+        assert all(chunks)
+        assert stats.total_cards == 3
+        assert stats.cards_by_type == {"concept": 1, "basic": 2}
+        assert stats.hierarchical_levels == 2
+        
+    def test_formatted_output_and_header_layout(self):
+        """Test line layout of flat output and the import header."""
+        cards = [Flashcard(card_type=CardType.CONCEPT, front="Kafka", back="Distributed log", tags=["streaming"]),
+                 Flashcard(card_type=CardType.BASIC, front="Why?", back="Replay")]
+        
+        formatted = self.formatter.format_cards(cards, hierarchy=False)
+        header = self.formatter.generate_import_header("Streaming")
+        
+        assert formatted.split("\n") == ["# Kafka :> Distributed log #streaming", "# Why? >> Replay"]
+        assert header == "# Streaming\nGenerated 2 flashcards\nCard types: concept(1), basic(1)\n\n"
+        
+    def test_format_cards_stats_restart_each_call(self):
+        """Test that format_cards counts only the cards of the latest call."""
+        self.formatter.format_cards([Flashcard(card_type=CardType.BASIC, front="Old", back="Card", parent="Old")])
+        self.formatter.format_cards([
+            Flashcard(card_type=CardType.CONCEPT, front="Kafka", back="Log"),
+            Flashcard(card_type=CardType.DESCRIPTOR, front="Retention", back="7 days", parent="Kafka"),
+            Flashcard(card_type=CardType.DESCRIPTOR, front="Ordering", back="Per partition", parent="Kafka",
+                      direction=CardDirection.BACKWARD),
+        ])
+        stats = self.formatter.get_stats()
+        
+        assert stats is not self.formatter.stats  # Internal counters are reset in place, not shared
+        assert stats.total_cards == 3
+        assert stats.cards_by_type == {"concept": 1, "descriptor": 2}
+        assert stats.cards_by_direction == {"forward": 2, "backward": 1}
+        assert stats.hierarchical_levels == 1
+        
+    def test_stats_match_for_small_and_large_batches(self):
+        """Test that the loop and Counter tallies produce the same statistics."""
+        cards = [Flashcard(card_type=CardType.DESCRIPTOR, front=f"Field {i}", back="Value",
+                           parent=f"Topic {i % 3}" if i % 2 else None) for i in range(300)]
+        
+        self.formatter.format_cards(cards[:10], hierarchy=False)
+        small = self.formatter.get_stats()
+        self.formatter.format_cards(cards, hierarchy=False)
+        large = self.formatter.get_stats()
+        
+        assert small.cards_by_type == {"descriptor": 10} and small.hierarchical_levels == 3  # Snapshot kept
+        assert large.cards_by_type == {"descriptor": 300} and large.cards_by_direction == {"forward": 300}
+        assert large.hierarchical_levels == 3
+        
+    def test_card_separators_by_type_and_direction(self):
+        """Test the separator chosen for each card type and direction."""
+        def fmt(card_type, direction):
+            return self.formatter._format_card(Flashcard(card_type=card_type, front="A", back="B", direction=direction))
+        
+        assert fmt(CardType.CONCEPT, CardDirection.BIDIRECTIONAL) == "A :: B"
+        assert fmt(CardType.BASIC, CardDirection.BIDIRECTIONAL) == "A <> B"
+        assert fmt(CardType.DESCRIPTOR, CardDirection.BACKWARD) == "A ;< B"
+        assert fmt(CardType.MULTILINE_BASIC, CardDirection.BACKWARD) == "A >> B"
+        assert fmt(CardType.CLOZE, CardDirection.DISABLED) == "A =- B"
+        
+    def test_list_and_choice_cards_use_item_lines(self):
+        """Test list, multiple choice and triple-delimiter layouts."""
+        choice = Flashcard(card_type=CardType.MULTIPLE_CHOICE, front="Best log?", back="", list_items=["Kafka", "FTP"])
+        single = Flashcard(card_type=CardType.MULTIPLE_CHOICE, front="Best log?", back="Kafka", list_items=["Kafka"])
+        listed = Flashcard(card_type=CardType.LIST_ANSWER, front="Steps", back="", list_items=["Ingest", "Serve"])
+        triple = Flashcard(card_type=CardType.MULTILINE_CONCEPT, front="Kafka", back="", use_triple_delimiter=True)
+        
+        assert self.formatter._format_card(choice) == "Best log? >>A)\n    Kafka\n    FTP"
+        assert self.formatter._format_card(single) == "Best log? >> Kafka"
+        assert self.formatter._format_card(listed) == "Steps >>1.\n    Ingest\n    Serve"
+        assert self.formatter._format_card(triple) == "Kafka :::"
+        
+    def test_cloze_card_written_without_escaping(self):
+        """Test that cloze text keeps its syntax and is not counted as escaped."""
+        card = Flashcard(card_type=CardType.CLOZE, front="Kafka :: a {{distributed log}}", back="ignored >> back")
+        
+        assert self.formatter._format_card(card) == "Kafka :: a {{distributed log}}"
+        assert self.formatter.get_stats().special_chars_escaped == 0
+        
+    def test_escape_special_chars_single_pass(self):
+        """Test that escaping breaks every separator, including overlapping ones."""
+        escape = self.formatter._escape_special_chars
+        
+        assert escape("See #[[Kafka]] :: log") == "See # [[Kafka] ] : : log"
+        assert escape("<<>>") == "< < > >"
+        # Runs of three or more are broken up completely (the old replace chain left ": ::")
+        assert escape(":::") == ": : :"
+        assert escape("]]]") == "] ] ]"
+        assert escape(">>>") == "> > >"
+        assert escape(";;;") == "; ; ;"
+        assert escape("plain text") == "plain text"
+        assert escape("{{a} }}") == "{ {a} } }"
+        assert self.formatter.get_stats().special_chars_escaped == 7
+        
+    def test_escape_special_chars_counts_cached_repeats(self):
+        """Test that repeated text is escaped from the cache but still counted."""
+        text = "Producer >> Broker :: Consumer (repeat check)"
+        
+        other = RemNoteFormatter()
+        first = self.formatter._escape_special_chars(text)
+        second = other._escape_special_chars(text)
+        
+        assert first == second == "Producer > > Broker : : Consumer (repeat check)"
+        assert self.formatter.get_stats().special_chars_escaped == 1
+        assert other.get_stats().special_chars_escaped == 1
+        
+    def test_escape_special_chars_returns_clean_text_unchanged(self):
+        """Test that text without separator characters is returned as is."""
+        text = "Kafka keeps an ordered, replayable log (7 days by default)."
+        
+        assert self.formatter._escape_special_chars(text) is text
+        assert self.formatter._escape_special_chars("a: b > c") == "a: b > c"
+        assert self.formatter.get_stats().special_chars_escaped == 0
 
 
 class TestLLMClient:
@@ -299,6 +798,22 @@ class TestLLMClient:
             client = create_llm_client("anthropic")
             assert isinstance(client, AnthropicClient)
             
+    @patch('anthropic.Anthropic')
+    def test_api_key_resolved_once_per_provider(self, mock_anthropic):
+        """Test that the environment is read once and missing keys are not cached."""
+        _api_key.cache_clear()
+        try:
+            with patch.dict('os.environ', {}, clear=True):
+                with pytest.raises(LLMError, match="Anthropic API key not found"):
+                    create_llm_client("anthropic")
+            with patch.dict('os.environ', {'ANTHROPIC_API_KEY': 'first_key'}):
+                assert create_llm_client("anthropic").config.api_key == "first_key"
+            with patch.dict('os.environ', {'ANTHROPIC_API_KEY': 'second_key'}):
+                assert create_llm_client("anthropic").config.api_key == "first_key"
+                assert create_llm_client("anthropic", api_key="explicit").config.api_key == "explicit"
+        finally:
+            _api_key.cache_clear()
+    
     def test_invalid_provider(self):
         """Test handling of invalid LLM provider."""
         with pytest.raises(ValueError, match="is not a valid LLMProvider"):
@@ -344,6 +859,655 @@ class TestLLMClient:
             assert response == "Test response"
             assert mock_client.messages.create.call_count == 2
 
+    @patch('anthropic.Anthropic')
+    def test_anthropic_generate_stream_yields_chunks(self, mock_anthropic):
+        """Test that the sync stream yields text chunks and records usage."""
+        stream = mock_anthropic.return_value.messages.stream.return_value.__enter__.return_value
+        stream.text_stream = iter(["What is ", "Kafka? :: ", "A log"])
+        stream.get_final_message.return_value = Mock(usage=Mock(input_tokens=4, output_tokens=6))
+        config = LLMConfig(
+            provider=LLMProvider.ANTHROPIC,
+            model="claude-3-sonnet-20240229",
+            api_key="test_key"
+        )
+        client = AnthropicClient(config)
+        
+        chunks = list(client.generate_stream("Explain Kafka"))
+        
+        assert chunks == ["What is ", "Kafka? :: ", "A log"]
+        assert client.total_tokens_used == 10
+        assert client.request_count == 1
+    
+    @patch('anthropic.Anthropic')
+    def test_anthropic_rate_limit_honors_retry_after(self, mock_anthropic):
+        """Test that SDK rate limit errors are typed and their Retry-After header is used."""
+        import anthropic
+        rate_limited = anthropic.RateLimitError.__new__(anthropic.RateLimitError)
+        rate_limited.response = Mock(headers={'retry-after-ms': '250'})
+        mock_response = Mock()
+        mock_response.content = [Mock(text="Test response")]
+        mock_response.usage = Mock(input_tokens=10, output_tokens=20)
+        mock_anthropic.return_value.messages.create.side_effect = [rate_limited, mock_response]
+        config = LLMConfig(
+            provider=LLMProvider.ANTHROPIC,
+            model="claude-3-sonnet-20240229",
+            api_key="test_key",
+            retry_delay=5.0
+        )
+        client = AnthropicClient(config)
+        
+        with patch('time.sleep') as mock_sleep, patch('random.uniform', return_value=0.1):
+            response = client.generate("Test prompt")
+        
+        assert response == "Test response"
+        mock_sleep.assert_called_once_with(0.25)
+        assert isinstance(client._translate_error(rate_limited), RateLimitError)
+        assert not isinstance(client._translate_error(Exception("rate_limit in message")), RateLimitError)
+    
+    @patch('anthropic.Anthropic')
+    def test_backoff_delay_uses_capped_full_jitter(self, mock_anthropic):
+        """Test that retry delays are drawn below a capped exponential ceiling."""
+        config = LLMConfig(
+            provider=LLMProvider.ANTHROPIC,
+            model="claude-3-sonnet-20240229",
+            api_key="test_key",
+            retry_delay=2.0
+        )
+        client = AnthropicClient(config)
+        
+        with patch('random.uniform', return_value=1.5) as mock_uniform:
+            assert client._backoff_delay(2, Exception("boom")) == 1.5
+            mock_uniform.assert_called_with(0, 8.0)
+            client._backoff_delay(10, Exception("boom"))
+            mock_uniform.assert_called_with(0, 60.0)
+            assert client._backoff_delay(0, RateLimitError("slow down", retry_after=30.0)) == 30.0
+    
+    @patch('anthropic.AsyncAnthropic')
+    @patch('anthropic.Anthropic')
+    def test_anthropic_generate_many_uses_async_client(self, mock_anthropic, mock_async_anthropic):
+        """Test that generate_many fans out through the async SDK and keeps prompt order."""
+        async def fake_create(**kwargs):
+            await asyncio.sleep(0.01 if "first" in kwargs['messages'][0]['content'] else 0)
+            response = Mock()
+            response.content = [Mock(text=f"reply to {kwargs['messages'][0]['content']}")]
+            response.usage = Mock(input_tokens=1, output_tokens=1)
+            return response
+        
+        mock_async_anthropic.return_value.messages.create = fake_create
+        config = LLMConfig(
+            provider=LLMProvider.ANTHROPIC,
+            model="claude-3-sonnet-20240229",
+            api_key="test_key"
+        )
+        client = AnthropicClient(config)
+        
+        responses = client.generate_many(["first prompt", "second prompt"], max_concurrency=2)
+        
+        assert responses == ["reply to first prompt", "reply to second prompt"]
+        assert client.request_count == 2
+        mock_anthropic.return_value.messages.create.assert_not_called()
+    
+    @patch('tiktoken.encoding_for_model')
+    @patch('openai.OpenAI')
+    def test_openai_clients_share_cached_encoding(self, mock_openai, mock_encoding_for_model):
+        """Test that the tokenizer is loaded once per model, not once per client."""
+        _get_encoding.cache_clear()
+        config = LLMConfig(
+            provider=LLMProvider.OPENAI,
+            model="gpt-4",
+            api_key="test_key"
+        )
+        
+        try:
+            first = OpenAIClient(config)
+            second = OpenAIClient(config)
+        finally:
+            _get_encoding.cache_clear()
+        
+        assert first.encoding is second.encoding
+        mock_encoding_for_model.assert_called_once_with("gpt-4")
+    
+    @patch('tiktoken.encoding_for_model')
+    @patch('openai.OpenAI')
+    def test_openai_count_tokens_memoizes_repeated_text(self, mock_openai, mock_encoding_for_model):
+        """Test that counting the same text twice encodes it only once."""
+        encode = mock_encoding_for_model.return_value.encode
+        encode.return_value = [1, 2, 3]
+        _get_encoding.cache_clear()
+        _count_tokens.cache_clear()
+        config = LLMConfig(
+            provider=LLMProvider.OPENAI,
+            model="gpt-4",
+            api_key="test_key"
+        )
+        client = OpenAIClient(config)
+        
+        try:
+            first = client.count_tokens("Explain feature stores in two sentences.")
+            second = client.count_tokens("Explain feature stores in two sentences.")
+        finally:
+            _get_encoding.cache_clear()
+            _count_tokens.cache_clear()
+        
+        assert first == second == 3
+        encoded = [call.args[0] for call in encode.call_args_list]
+        assert encoded.count("Explain feature stores in two sentences.") == 1
+    
+    @patch('anthropic.Anthropic')
+    def test_completion_budget_reserves_system_prompt_tokens(self, mock_anthropic):
+        """Test that max_tokens leaves room for the system prompt and message overhead."""
+        mock_response = Mock()
+        mock_response.content = [Mock(text="Test response")]
+        mock_response.usage = Mock(input_tokens=1, output_tokens=1)
+        mock_anthropic.return_value.messages.create.return_value = mock_response
+        config = LLMConfig(
+            provider=LLMProvider.ANTHROPIC,
+            model="claude-3-sonnet-20240229",
+            api_key="test_key",
+            max_tokens=1000
+        )
+        client = AnthropicClient(config)
+        
+        client.generate("Explain batch inference")
+        
+        sent = mock_anthropic.return_value.messages.create.call_args.kwargs
+        expected = (1000 - client.count_tokens("Explain batch inference")
+                    - client.count_tokens(SYSTEM_PROMPT) - 8)
+        assert sent['max_tokens'] == expected
+        assert sent['system'] == SYSTEM_PROMPT
+    
+    @patch('anthropic.Anthropic')
+    def test_rate_limits_apply_only_when_configured(self, mock_anthropic):
+        """Test RPM/TPM resolution and that requests are charged prompt plus completion budget."""
+        haiku = LLMConfig(provider=LLMProvider.ANTHROPIC, model="claude-3-haiku-20240307", api_key="k")
+        custom = LLMConfig(provider=LLMProvider.ANTHROPIC, model="claude-3-haiku-20240307",
+                           api_key="k", rpm=0, tpm=90000)
+        
+        assert _rate_limits(haiku) == (None, None)
+        assert _rate_limits(custom) == (None, 90000)
+        assert AnthropicClient(haiku)._rpm_bucket.rate_per_minute is None
+        
+        client = AnthropicClient(custom)
+        with patch.object(client._tpm_bucket, 'wait') as tpm_wait, \
+             patch.object(client._rpm_bucket, 'wait') as rpm_wait:
+            client._handle_rate_limiting(100)
+        
+        rpm_wait.assert_called_once_with(1)
+        tpm_wait.assert_called_once_with(100 + client._completion_budget(100))
+    
+    @patch('anthropic.Anthropic')
+    def test_client_shares_pooled_http_client_and_closes_it(self, mock_anthropic):
+        """Test that the SDK gets one pooled HTTP client which the context manager closes."""
+        fake_httpx = Mock()
+        config = LLMConfig(
+            provider=LLMProvider.ANTHROPIC,
+            model="claude-3-sonnet-20240229",
+            api_key="test_key"
+        )
+        
+        with patch.dict(sys.modules, {'httpx': fake_httpx}):
+            with AnthropicClient(config) as client:
+                http_client = fake_httpx.Client.return_value
+                assert mock_anthropic.call_args.kwargs['http_client'] is http_client
+                assert fake_httpx.Limits.call_args.kwargs == {
+                    "max_keepalive_connections": 32, "max_connections": 64
+                }
+        
+        http_client.close.assert_called_once()
+        client.close()
+        http_client.close.assert_called_once()
+    
+    @patch('tiktoken.encoding_for_model')
+    @patch('openai.OpenAI')
+    def test_openai_count_tokens_many_uses_encode_batch(self, mock_openai, mock_encoding_for_model):
+        """Test that many texts are tokenized in one encode_batch call."""
+        encoding = mock_encoding_for_model.return_value
+        encoding.encode.return_value = [1]
+        encoding.encode_batch.return_value = [[1, 2], [1, 2, 3, 4]]
+        _get_encoding.cache_clear()
+        config = LLMConfig(
+            provider=LLMProvider.OPENAI,
+            model="gpt-4",
+            api_key="test_key"
+        )
+        
+        try:
+            client = OpenAIClient(config)
+            counts = client.count_tokens_many(["short", "a bit longer"])
+        finally:
+            _get_encoding.cache_clear()
+            _count_tokens.cache_clear()
+        
+        assert counts == [2, 4]
+        assert encoding.encode_batch.call_args.args[0] == ["short", "a bit longer"]
+    
+    @patch('tiktoken.encoding_for_model')
+    @patch('openai.OpenAI')
+    def test_openai_batch_jsonl_round_trip(self, mock_openai, mock_encoding_for_model):
+        """Test that the OpenAI batch file is valid JSONL and its output is parsed back."""
+        mock_encoding_for_model.return_value.encode.return_value = [1, 2]
+        _get_encoding.cache_clear()
+        openai_client = mock_openai.return_value
+        openai_client.files.create.return_value = Mock(id="file_1")
+        openai_client.batches.create.return_value = Mock(id="batch_1")
+        openai_client.batches.retrieve.return_value = Mock(status="completed", output_file_id="file_2")
+        openai_client.files.content.return_value = Mock(text=(
+            '{"custom_id": "0-basic", "response": {"status_code": 200, "body": {"usage": {"total_tokens": 7},'
+            ' "choices": [{"message": {"content": "Q \u00e9 >> A"}}]}}}\n'
+            '{"custom_id": "0-cloze", "response": {"status_code": 500}, "error": "boom"}\n'
+        ))
+        config = LLMConfig(provider=LLMProvider.OPENAI, model="gpt-4", api_key="test_key")
+        
+        try:
+            client = OpenAIClient(config)
+            results = client.run_batch([
+                {"custom_id": "0-basic", "prompt": "caf\u00e9 prompt", "temperature": 0.3},
+                {"custom_id": "0-cloze", "prompt": "cloze prompt", "temperature": 0.3}
+            ], poll_interval=0)
+        finally:
+            _get_encoding.cache_clear()
+            _count_tokens.cache_clear()
+        
+        assert results == {"0-basic": "Q \u00e9 >> A"}
+        assert client.total_tokens_used == 7
+        _, payload = openai_client.files.create.call_args.kwargs['file']
+        records = [json.loads(line) for line in payload.decode('utf-8').splitlines()]
+        assert [record['custom_id'] for record in records] == ["0-basic", "0-cloze"]
+        assert records[0]['body']['messages'][-1]['content'].endswith("caf\u00e9 prompt")
+    
+    @patch('tiktoken.encoding_for_model')
+    @patch('openai.OpenAI')
+    def test_openai_tracks_cached_prompt_tokens(self, mock_openai, mock_encoding_for_model):
+        """Test that prompt_tokens_details.cached_tokens is accumulated and reported."""
+        mock_encoding_for_model.return_value.encode.return_value = [1, 2, 3]
+        mock_response = Mock()
+        mock_response.choices = [Mock(message=Mock(content="Test response"))]
+        mock_response.usage = Mock(total_tokens=1200, prompt_tokens_details=Mock(cached_tokens=1024))
+        mock_openai.return_value.chat.completions.create.return_value = mock_response
+        _get_encoding.cache_clear()
+        config = LLMConfig(
+            provider=LLMProvider.OPENAI,
+            model="gpt-4",
+            api_key="test_key"
+        )
+        
+        try:
+            client = OpenAIClient(config)
+            client.generate("Explain model registries")
+        finally:
+            _get_encoding.cache_clear()
+            _count_tokens.cache_clear()
+        
+        info = client.get_model_info()
+        assert info['total_tokens_used'] == 1200
+        assert info['cached_tokens'] == 1024
+    
+    @patch('tiktoken.encoding_for_model')
+    @patch('openai.AsyncOpenAI')
+    @patch('openai.OpenAI')
+    def test_openai_streams_are_closed_when_consumer_stops_early(self, mock_openai, mock_async_openai,
+                                                                 mock_encoding_for_model):
+        """Test that closing a stream generator early also closes the SDK stream."""
+        mock_encoding_for_model.return_value.encode.return_value = [1, 2, 3]
+        chunks = [Mock(choices=[Mock(delta=Mock(content=text))]) for text in ["Kafka :: ", "A log\n", "More"]]
+        
+        class FakeAsyncStream:
+            close = AsyncMock()
+            
+            async def __aiter__(self):
+                for chunk in chunks:
+                    yield chunk
+        
+        async_stream = FakeAsyncStream()
+        mock_async_openai.return_value.chat.completions.create = AsyncMock(return_value=async_stream)
+        sync_stream = MagicMock()
+        sync_stream.__iter__.return_value = iter(chunks)
+        mock_openai.return_value.chat.completions.create.return_value = sync_stream
+        _get_encoding.cache_clear()
+        config = LLMConfig(
+            provider=LLMProvider.OPENAI,
+            model="gpt-4",
+            api_key="test_key"
+        )
+        
+        async def read_first_chunk(client):
+            stream = client.agenerate_stream("Explain Kafka")
+            first = await stream.__anext__()
+            await stream.aclose()
+            return first
+        
+        try:
+            client = OpenAIClient(config)
+            assert asyncio.run(read_first_chunk(client)) == "Kafka :: "
+            stream = client.generate_stream("Explain Kafka")
+            assert next(stream) == "Kafka :: "
+            stream.close()
+        finally:
+            _get_encoding.cache_clear()
+            _count_tokens.cache_clear()
+        
+        async_stream.close.assert_awaited_once()
+        sync_stream.close.assert_called_once()
+    
+    def test_openai_messages_put_static_prefix_first(self):
+        """Test that the static prefix leads a single user message after the system prompt."""
+        messages = OpenAIClient._messages("Rules: be concise.\nTopic: Kafka")
+        
+        assert messages == [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": "Rules: be concise.\nTopic: Kafka"}
+        ]
+    
+    @patch('anthropic.Anthropic')
+    def test_generate_multi_packs_prompts_into_one_request(self, mock_anthropic):
+        """Test that several prompts share one request and fall back when the reply is malformed."""
+        config = LLMConfig(
+            provider=LLMProvider.ANTHROPIC,
+            model="claude-3-sonnet-20240229",
+            api_key="test_key"
+        )
+        client = AnthropicClient(config)
+        sent = []
+        
+        async def fake_agenerate(prompt, temperature=None, response_format=None, cache_prefix=None):
+            sent.append(prompt)
+            if response_format:
+                return '{"responses": ["card A", "card B"]}' if len(sent) == 1 else '{"responses": []}'
+            return f"single {prompt}"
+        
+        with patch.object(client, 'agenerate', side_effect=fake_agenerate):
+            assert client.generate_multi(["topic A", "topic B"]) == ["card A", "card B"]
+            assert len(sent) == 1
+            assert "### Request 2\ntopic B" in sent[0]
+            
+            assert client.generate_multi(["topic A", "topic B"]) == ["single topic A", "single topic B"]
+            assert len(sent) == 4
+    
+    @patch('anthropic.Anthropic')
+    def test_anthropic_run_batch_collects_succeeded_results(self, mock_anthropic):
+        """Test that an Anthropic message batch is submitted, polled and its successes returned."""
+        batches = mock_anthropic.return_value.messages.batches
+        batches.create.return_value = Mock(id="msgbatch_1")
+        batches.retrieve.side_effect = [
+            Mock(processing_status="in_progress"),
+            Mock(processing_status="ended")
+        ]
+        succeeded = Mock(custom_id="0-basic")
+        succeeded.result.type = "succeeded"
+        succeeded.result.message.content = [Mock(text="Q :: A")]
+        succeeded.result.message.usage = Mock(input_tokens=3, output_tokens=2)
+        errored = Mock(custom_id="0-cloze")
+        errored.result.type = "errored"
+        batches.results.return_value = iter([succeeded, errored])
+        
+        config = LLMConfig(
+            provider=LLMProvider.ANTHROPIC,
+            model="claude-3-sonnet-20240229",
+            api_key="test_key"
+        )
+        client = AnthropicClient(config)
+        
+        results = client.run_batch(
+            [
+                {"custom_id": "0-basic", "prompt": "basic prompt", "temperature": 0.3},
+                {"custom_id": "0-cloze", "prompt": "cloze prompt", "temperature": 0.3}
+            ],
+            poll_interval=0
+        )
+        
+        assert results == {"0-basic": "Q :: A"}
+        assert client.total_tokens_used == 5
+        submitted = batches.create.call_args.kwargs['requests']
+        assert [request['custom_id'] for request in submitted] == ["0-basic", "0-cloze"]
+        assert submitted[0]['params']['messages'][0]['content'] == "basic prompt"
+
+
+class TestPromptCache:
+    """Test suite for the LLM response cache."""
+    
+    def test_lru_eviction(self):
+        """Test that the in-memory cache evicts the least recently used entry."""
+        cache = PromptCache(max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        
+        assert cache.get("a") == "1"
+        assert cache.get("b") is None
+        assert cache.get("c") == "3"
+    
+    def test_key_covers_system_prompt(self):
+        """Test that changing the system prompt changes the cache key."""
+        base = PromptCache.make_key("gpt-4", 0.0, "Define caching")
+        
+        assert PromptCache.make_key("gpt-4", 0.0, "Define caching", system="Be brief.") != base
+        assert PromptCache.make_key("gpt-4", 0.0, "Define caching", system="Be brief.") == \
+            PromptCache.make_key("gpt-4", 0.0, "Define caching", system="Be brief.")
+        assert PromptCache.make_key("gpt-4", 0.0, "Define caching", system="Be verbose.") != \
+            PromptCache.make_key("gpt-4", 0.0, "Define caching", system="Be brief.")
+    
+    def test_disk_persistence_and_ttl(self):
+        """Test that entries survive a new cache instance and expire after the TTL."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            key = PromptCache.make_key("gpt-4", 0.0, "Define caching")
+            cache = PromptCache(temp_dir)
+            cache.set(key, "Caching :: Reusing results")
+            cache.close()
+            
+            reopened = PromptCache(temp_dir)
+            assert reopened.get(key) == "Caching :: Reusing results"
+            reopened.close()
+            
+            with patch('llm_cache.time.time', return_value=0.0):
+                expiring = PromptCache(temp_dir, ttl_seconds=10)
+                expiring.set(key, "fresh")
+            with patch('llm_cache.time.time', return_value=20.0):
+                assert expiring.get(key) is None
+            expiring.close()
+    
+    @patch('anthropic.Anthropic')
+    def test_client_serves_deterministic_prompts_from_cache(self, mock_anthropic):
+        """Test that temperature 0 requests hit the API only once."""
+        mock_client = Mock()
+        mock_anthropic.return_value = mock_client
+        mock_response = Mock()
+        mock_response.content = [Mock(text="Cached response")]
+        mock_response.usage = Mock(input_tokens=10, output_tokens=20)
+        mock_client.messages.create.return_value = mock_response
+        
+        config = LLMConfig(
+            provider=LLMProvider.ANTHROPIC,
+            model="claude-3-sonnet-20240229",
+            api_key="test_key"
+        )
+        client = AnthropicClient(config, PromptCache())
+        
+        assert client.generate("Test prompt", temperature=0) == "Cached response"
+        assert client.generate("Test prompt", temperature=0) == "Cached response"
+        client.generate("Test prompt", temperature=0.5)
+        
+        assert mock_client.messages.create.call_count == 2
+        info = client.get_model_info()
+        assert (info['cache_hits'], info['cache_misses']) == (1, 1)
+    
+    @patch('anthropic.AsyncAnthropic')
+    @patch('anthropic.Anthropic')
+    def test_semantic_cache_keys_on_topic_text_and_scope(self, mock_anthropic, mock_async_anthropic):
+        """Test that real templates are compared without their static prefix, per card type and parent."""
+        semantic = Mock(spec=SemanticCache)
+        semantic.should_cache.return_value = True
+        semantic.get.return_value = "What is an overview? >> A summary"
+        config = LLMConfig(provider=LLMProvider.ANTHROPIC, model="claude-3-sonnet-20240229", api_key="test_key")
+        generator = CardGenerator(AnthropicClient(config, semantic_cache=semantic))
+        topic = Topic(name="Overview", content="How the ingestion layer batches events.")
+        
+        for parent in ("Kafka", "Feature Store"):
+            asyncio.run(generator._generate_llm_cards("basic", topic, parent))
+        asyncio.run(generator._generate_llm_cards("descriptor", topic, "Kafka"))
+        
+        (kafka, _), (store, _), (descriptor, _) = (c.args for c in semantic.get.call_args_list)
+        prefix = generator.prompt_loader.get_cacheable_prefix("basic")
+        _, text = semantic.get.call_args_list[0].args
+        assert len(prefix) > 1000 and len(text) < 300
+        assert "**Topic:** Overview" in text and "ingestion layer" in text
+        assert len({kafka, store, descriptor}) == 3
+    
+    @patch('anthropic.AsyncAnthropic')
+    @patch('anthropic.Anthropic')
+    def test_stream_semantic_lookup_runs_off_the_event_loop(self, mock_anthropic, mock_async_anthropic):
+        """Test that a streamed request embeds its prompt in a worker thread, not on the loop."""
+        lookup_threads = []
+        semantic = Mock(spec=SemanticCache)
+        semantic.should_cache.return_value = True
+        semantic.get.side_effect = lambda namespace, text: lookup_threads.append(threading.get_ident()) or "Kafka :: A log"
+        config = LLMConfig(provider=LLMProvider.ANTHROPIC, model="claude-3-sonnet-20240229", api_key="test_key")
+        client = AnthropicClient(config, semantic_cache=semantic)
+        
+        async def read_stream():
+            return threading.get_ident(), [chunk async for chunk in client.agenerate_stream("Explain Kafka")]
+        
+        loop_thread, chunks = asyncio.run(read_stream())
+        
+        assert chunks == ["Kafka :: A log"]
+        assert len(lookup_threads) == 1 and lookup_threads[0] != loop_thread
+        
+    def test_semantic_cache_topic_guard(self):
+        """Test topic extraction used to gate semantic hits and the missing dependency error."""
+        prompt = "Create 1 concept flashcard:\n\n**Topic:** Lambda Architecture\n**Content:** ..."
+        assert SemanticCache.topic_of(prompt) == "Lambda Architecture"
+        assert SemanticCache.topic_of("No topic line here") is None
+        
+        try:
+            import hnswlib, sentence_transformers  # noqa: F401
+        except ImportError:
+            with pytest.raises(ImportError, match="sentence-transformers and hnswlib"):
+                SemanticCache()
+
+
+class TestConfigurationManager:
+    """Test suite for configuration loading."""
+    
+    def test_load_config_reparses_only_after_edit(self):
+        """Test that repeated loads reuse the parsed YAML until the file changes."""
+        manager = ConfigurationManager()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            base = Path(__file__).parent.parent.joinpath("config", "config.yaml").read_text()
+            config_path = Path(temp_dir) / "config.yaml"
+            config_path.write_text(base.replace("temperature: 0.3", "temperature: 0.2"))
+            
+            with patch('yaml.load', wraps=yaml.load) as yaml_load:
+                first = manager.load_config(config_path)
+                second = manager.load_config(config_path)
+                assert yaml_load.call_count == 1
+                assert first.llm.temperature == second.llm.temperature == 0.2
+                
+                config_path.write_text(base.replace("temperature: 0.3", "temperature: 0.7"))
+                os.utime(config_path, ns=(0, config_path.stat().st_mtime_ns + 1_000_000))
+                assert manager.load_config(config_path).llm.temperature == 0.7
+                assert yaml_load.call_count == 2
+    
+    def test_invalid_config_reports_schema_error(self):
+        """Test that the precompiled validator rejects configs missing required sections."""
+        manager = ConfigurationManager()
+        assert manager._validator is not None
+        assert ConfigurationManager()._validator is manager._validator  # compiled once per process
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_path = Path(temp_dir) / "config.yaml"
+            config_path.write_text("llm:\n  provider: openai\n")
+            
+            with pytest.raises(ValueError, match="Configuration validation failed"):
+                manager.load_config(config_path)
+    
+    def test_typed_config_fills_missing_sections_with_defaults(self):
+        """Test that missing sections and keys fall back to the dataclass defaults."""
+        config = ConfigurationManager()._create_typed_config({
+            'llm': {'provider': 'openai', 'rpm': 120},
+            'generation': {'card_types': {'cloze': False}, 'unknown_key': 1}
+        })
+        assert config.llm.provider == 'openai'
+        assert config.llm.rpm == 120
+        assert config.llm.max_tokens == 2000
+        assert config.generation.card_types.cloze is False
+        assert config.generation.card_types.concept is True
+        assert config.cache.directory == "~/.remnote_fc/cache"
+    
+    def test_typed_config_is_a_dataclass_and_requires_provider(self):
+        """Test that AppConfig keeps dataclass equality and replace, and a missing provider is an error."""
+        manager = ConfigurationManager()
+        config = manager._create_typed_config({'llm': {'provider': 'openai'}})
+        
+        assert type(config)(config.llm) == config  # Positional construction and __eq__
+        assert replace(config, output=replace(config.output, include_stats=False)).output.include_stats is False
+        assert asdict(config)['llm']['provider'] == 'openai'
+        with pytest.raises(ValueError, match="Failed to create typed configuration"):
+            manager._create_typed_config({'llm': {'model': 'gpt-4'}})
+    
+    def test_validate_config_stops_at_first_error_unless_all_requested(self):
+        """Test short-circuiting validation and the full error report."""
+        manager = ConfigurationManager()
+        config = manager._create_typed_config({
+            'llm': {'provider': 'other', 'temperature': 5},
+            'generation': {'cards_per_concept': {'min': 6, 'max': 2}}
+        })
+        
+        with pytest.raises(ValueError) as first_only:
+            manager.validate_config(config)
+        assert str(first_only.value).count("\n- ") == 1
+        
+        with pytest.raises(ValueError) as every_error:
+            manager.validate_config(config, all_errors=True)
+        assert str(every_error.value).count("\n- ") == 3
+        
+        assert manager.validate_config(load_default_config())
+    
+    def test_save_config_round_trips(self):
+        """Test that saved configs load back unchanged, via the template and the yaml fallback."""
+        manager = ConfigurationManager()
+        config = manager._create_typed_config({
+            'llm': {'provider': 'openai', 'model': 'gpt-4', 'temperature': 0.2, 'max_tokens': 1500},
+            'remnote': {'default_folder': 'Notes: "ML" {draft} – ü'},
+            'generation': {},
+            'output': {},
+            'prompts': {'system_prompt': "Line one\nLine 'two'\n"}
+        })
+        tiny_rpm = manager._create_typed_config({'llm': {'provider': 'openai', 'rpm': 1e-05}})
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for original in (config, tiny_rpm):
+                output_path = Path(temp_dir) / "saved.yaml"
+                manager.save_config(original, output_path)
+                with open(output_path, encoding='utf-8') as f:
+                    saved = yaml.safe_load(f)
+                reloaded = manager._create_typed_config(saved)
+                for section in ('llm', 'remnote', 'generation', 'output', 'cache', 'prompts'):
+                    assert getattr(reloaded, section) == getattr(original, section)
+    
+    def test_env_lookups_cached_until_reset(self, monkeypatch):
+        """Test that environment values are read once and refreshed by reset_env_cache."""
+        monkeypatch.setenv("OPENAI_API_KEY", "first-key")
+        reset_env_cache()
+        assert get_api_key("OpenAI") == "first-key"
+        
+        monkeypatch.setenv("OPENAI_API_KEY", "second-key")
+        assert get_api_key("openai") == "first-key"
+        reset_env_cache()
+        assert get_api_key("openai") == "second-key"
+        reset_env_cache()
+    
+    def test_env_overrides_are_converted(self, monkeypatch):
+        """Test that environment overrides are applied with their declared types."""
+        monkeypatch.setenv("REMNOTE_LLM_TEMPERATURE", "0.9")
+        monkeypatch.setenv("REMNOTE_LLM_RETRY_ATTEMPTS", "5")
+        reset_env_cache()
+        try:
+            raw_config = {'llm': {'provider': 'openai'}}
+            ConfigurationManager()._apply_env_overrides(raw_config)
+            assert raw_config['llm']['temperature'] == 0.9
+            assert raw_config['llm']['retry_attempts'] == 5
+        finally:
+            reset_env_cache()
+
 
 class TestErrorHandling:
     """Test suite for error handling across components."""
@@ -360,7 +1524,7 @@ class TestErrorHandling:
     def test_network_timeout_simulation(self):
         """Test handling of network timeouts."""
         mock_llm = Mock(spec=LLMClient)
-        mock_llm.generate.side_effect = TimeoutError("Network timeout")
+        mock_llm.agenerate.side_effect = TimeoutError("Network timeout")
         
         generator = CardGenerator(mock_llm)
         topic = Topic(name="Test", content="Test content")
@@ -382,7 +1546,7 @@ class TestErrorHandling:
         )
         
         mock_llm = Mock(spec=LLMClient)
-        mock_llm.generate.return_value = "Test :: Response"
+        mock_llm.agenerate.return_value = "Test :: Response"
         
         generator = CardGenerator(mock_llm)
         
@@ -440,7 +1604,7 @@ class TestIntegration:
             content = parser.load_content(temp_path)
               # Generate cards (with mock LLM)
             mock_llm = Mock(spec=LLMClient)
-            mock_llm.generate.return_value = "Test Topic :: Test definition"
+            mock_llm.agenerate.return_value = "Test Topic :: Test definition"
             
             generator = CardGenerator(mock_llm)
             cards = generator.generate_cards(content.topics[0])
@@ -550,3 +1714,64 @@ def sample_cards():
 if __name__ == "__main__":
     # Run tests directly
     pytest.main([__file__])
+
+
+class TestCLI:
+    """Test suite for the command line entry point."""
+    
+    def test_resume_after_interrupt_with_duplicate_root_names(self, tmp_path, monkeypatch):
+        """Test that an interrupted run resumes every root topic, even when names repeat."""
+        from click.testing import CliRunner
+        from src import main as cli
+        
+        project = Path(__file__).parent.parent
+        for name in ("config", "content", "output"):
+            (tmp_path / name).mkdir()
+        config = yaml.safe_load((project / "config" / "config.yaml").read_text(encoding="utf-8"))
+        config["cache"]["enabled"] = False
+        config["generation"]["multi_output"] = True  # One request per topic
+        config["generation"]["pack_size"] = None  # The CLI does not schema-check the config
+        (tmp_path / "config" / "config.yaml").write_text(yaml.safe_dump(config), encoding="utf-8")
+        topics = [{"name": "Overview", "content": f"Notes on the {system} retention policy."}
+                  for system in ("Kafka", "Redis")]
+        input_path = tmp_path / "content" / "topics.yaml"
+        input_path.write_text(yaml.safe_dump({"ml_system_design": {"metadata": {"subject": "Test"},
+                                                                   "topics": topics}}), encoding="utf-8")
+        output_path = tmp_path / "output" / "cards.txt"
+        
+        interrupt = True
+        
+        async def fake_agenerate(prompt, **kwargs):
+            system = "Kafka" if "Kafka retention" in prompt else "Redis"
+            if system == "Redis" and interrupt:
+                await asyncio.sleep(0.05)  # Let the Kafka topic be checkpointed first
+                raise KeyboardInterrupt
+            return json.dumps({"concept": {"term": f"{system} retention", "definition": "How long data is kept"}})
+        
+        llm = Mock(spec=LLMClient)
+        llm.agenerate.side_effect = fake_agenerate
+        llm.get_model_info.return_value = {}
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test_key")
+        monkeypatch.setattr(cli, "configure_logging", lambda verbose=False: None)
+        args = ["-i", str(input_path), "-o", str(output_path), "-c", str(tmp_path / "config" / "config.yaml")]
+        
+        with patch("src.llm_client.create_llm_client", return_value=llm):
+            # Click reports Ctrl-C as "Aborted!" with exit code 1
+            interrupted = CliRunner().invoke(cli.main, args, catch_exceptions=False)
+            assert interrupted.exit_code == 1 and "Aborted!" in interrupted.output
+            checkpoint = cli.checkpoint_path(input_path, output_path)
+            assert len(checkpoint.read_text(encoding="utf-8").splitlines()) == 1
+            assert not output_path.exists()
+            
+            interrupt = False
+            llm.agenerate.reset_mock()
+            result = CliRunner().invoke(cli.main, args, catch_exceptions=False)
+        
+        assert result.exit_code == 0, result.output
+        assert llm.agenerate.await_count == 1  # Only the Redis topic was generated again
+        text = output_path.read_text(encoding="utf-8")
+        assert text.count("Kafka retention") == 1 and text.count("Redis retention") == 1
+        assert text.index("Kafka retention") < text.index("Redis retention")
+        assert not checkpoint.exists()
+        assert not output_path.with_suffix(".txt.partial").exists()